@@ -1,11 +1,15 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, send_from_directory
 import dbscript as dbscript
-from tcp_client import communicate_with_controller,stop_process
+from tcp_client import start_process,pause_process,stop_process,get_controller_metrics,scheduler
 import data as data
 from threading import Thread, Event
 import threading
 import time
 import CameraConnection as cs
+import part_trace
+import part_state
+import image_writer
+import camera_pool
 import json
 from event_bus import result_event_queue 
 import os
@@ -436,7 +440,8 @@ def start_sequence():
     # print("✅ Cleaned Parameter Dictionary:", param_dict)
 
     # Step 3: Start communication with parameter-based commands
-    threading.Thread(target=communicate_with_controller, args=(param_dict,)).start()
+    # (warm restart when the controller session and cameras are still up from a pause)
+    threading.Thread(target=start_process, args=(param_dict,)).start()
 
     return jsonify({"status": "success"})
 
@@ -444,18 +449,31 @@ def start_sequence():
 
 @app.route('/stop', methods=['POST'])
 def stop_sequence():
+    # Pause: cameras and controller session stay connected for a fast restart
     try:
         
-        threading.Thread(target=stop_process).start()
+        threading.Thread(target=pause_process).start()
         return jsonify({"status": "success"})
     except Exception as e:
         print(f"❌ Stop process error: {e}")
         return jsonify({"status": "failure", "error": str(e)}), 500
 
 
+@app.route('/shutdown', methods=['POST'])
+def shutdown_sequence():
+    # Full stop: cameras disconnected, controller socket closed
+    try:
+        threading.Thread(target=stop_process).start()
+        return jsonify({"status": "success"})
+    except Exception as e:
+        print(f"❌ Shutdown error: {e}")
+        return jsonify({"status": "failure", "error": str(e)}), 500
+
+
 
 @app.route('/camera-status')
 def camera_status():
+    # served from the camera health cache (camera_health.py), no SDK call per request
     status = {
         'cam1': cs.isConnectedCamera1(),
         'cam2': cs.isConnectedCamera2(),
@@ -465,6 +483,44 @@ def camera_status():
     return jsonify(status)
 
 
+@app.route('/camera-pool')
+def camera_pool_status():
+    # backend per camera, streaming flag and frame-ring counters (hardware-triggered mode)
+    return jsonify(camera_pool.pool.status())
+
+
+@app.route('/controller-metrics')
+def controller_metrics():
+    # queue_wait / send per class (verdict, ack, param) and ACK round-trip, in ms
+    return jsonify(get_controller_metrics())
+
+
+@app.route('/image-writer')
+def image_writer_status():
+    # background archive: queue depth, drops/spills and write time per frame
+    return jsonify(image_writer.get_writer_metrics())
+
+
+@app.route('/part-trace')
+def part_trace_summary():
+    # p50/p95/p99 per span (C1.capture, C2.inspect, verdict, cycle, ...) over recent parts
+    recent = request.args.get('recent', default=part_trace.TRACE_RECENT, type=int)
+    return jsonify(part_trace.get_trace_summary(recent))
+
+
+@app.route('/part-state')
+def part_state_status():
+    # live parts with per-station state (pending/waiting/running/ok/nok/unknown) + recent finished
+    finished = request.args.get('finished', default=20, type=int)
+    return jsonify(part_state.get_part_states(finished))
+
+
+@app.route('/scheduler-status')
+def scheduler_status():
+    # parts in flight and per-station queue depth / lateness of the station workers
+    return jsonify(scheduler.status())
+
+
 
 cam_events = {
     "cam1": Event(),
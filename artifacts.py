@@ -0,0 +1,49 @@
+# artifacts.py
+# How much visual output the inspection modules produce (defect.py, station_2/3/4_defect.py and
+# the station wrappers). One process-wide level, from PRAVI_ARTIFACTS or set_level():
+#
+#   off      verdicts only: nothing is drawn, copied for drawing or written (no cam*_bmp update;
+#            the error fallbacks still save the raw frame so a failed part can be looked at)
+#   verdict  the annotated result images the UI shows and their backups (production default)
+#   debug    verdict + intermediate images (contours.bmp, 02_binary_threshold_ID.bmp,
+#            08_id_flash_contours.bmp, ...) and the extra canvases built while tuning
+#
+# Hot paths ask annotate() / debug() before building a canvas, so a disabled artifact costs
+# nothing, not even the copy.
+
+import os
+
+ARTIFACT_LEVELS = ("off", "verdict", "debug")
+DEFAULT_ARTIFACT_LEVEL = "verdict"
+
+_level = DEFAULT_ARTIFACT_LEVEL
+
+
+def set_level(level: str) -> str:
+    global _level
+    level = (level or DEFAULT_ARTIFACT_LEVEL).strip().lower()
+    if level not in ARTIFACT_LEVELS:
+        print(f"⚠️ Unknown artifact level {level!r}, using {DEFAULT_ARTIFACT_LEVEL!r}")
+        level = DEFAULT_ARTIFACT_LEVEL
+    if level != _level:
+        print(f"🖼️ Artifact level: {level}")
+    _level = level
+    return _level
+
+
+def level() -> str:
+    return _level
+
+
+def annotate() -> bool:
+    """Result images are drawn and written (verdict and debug)."""
+    return _level != "off"
+
+
+def debug() -> bool:
+    """Intermediate / tuning images are built and written."""
+    return _level == "debug"
+
+
+if os.environ.get("PRAVI_ARTIFACTS"):
+    set_level(os.environ["PRAVI_ARTIFACTS"])
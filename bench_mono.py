@@ -0,0 +1,97 @@
+# bench_mono.py
+# Per-part inspection time and peak memory with single-channel frames vs the same frames as
+# 3-channel BGR (what station1 used to turn every mono frame into before processing).
+#
+#   python bench_mono.py --images D:\bench_images --params params.json --parts 20
+#
+# --images   folder with cam1..cam4 (or input_backup_camN) sub-folders, read as mono
+# --params   JSON {S1: {...}, S2: {...}} for dt.python_parameters (recipe values)
+# Each part runs tcp_client.ReadPythonResult for C1..C4 (the production inspection path)
+# with the DB stubbed out. Peak memory is the tracemalloc peak of the Python/numpy heap
+# during one part (frames included), so BGR frames show up at 3x.
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import camera_pool
+import data as dt
+import part_state as ps
+import tcp_client as tc
+from bench_throughput import install_no_db
+from frame_utils import to_bgr
+
+STATIONS = ["C1", "C2", "C3", "C4"]
+
+
+def _run_part(frames: dict, i: int, colour: bool) -> tuple:
+    state = ps.PartState(STATIONS)
+    ctx = {"current_part_inserted": False, "inserted_s_no": None, "trace": None}
+    parts = {}
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    for st in STATIONS:
+        cam_id = f"cam{st[-1]}"
+        mono = frames[cam_id][i % len(frames[cam_id])]
+        dt.Frames[f"Cam{st[-1]}frame"] = to_bgr(mono) if colour else mono.copy()
+        t = time.perf_counter()
+        tc.ReadPythonResult(cam_id=cam_id, station=st, active_stations=STATIONS, ctx=ctx, state=state)
+        parts[st] = (time.perf_counter() - t) * 1000.0
+    total_ms = (time.perf_counter() - t0) * 1000.0
+    peak_mb = (tracemalloc.get_traced_memory()[1] - base) / 1e6
+    state.finish("BENCH")
+    return total_ms, peak_mb, parts
+
+
+def _summary(runs: list) -> dict:
+    totals = sorted(r[0] for r in runs)
+    per_station = {st: round(statistics.median(r[2][st] for r in runs), 2) for st in STATIONS}
+    return {
+        "part_ms_p50": round(statistics.median(totals), 2),
+        "part_ms_max": round(totals[-1], 2),
+        "peak_mb_max": round(max(r[1] for r in runs), 1),
+        "station_ms_p50": per_station,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mono vs BGR frames through the station inspection")
+    ap.add_argument("--images", default="", help="mock frame folder (camN / input_backup_camN sub-folders)")
+    ap.add_argument("--params", default="", help="JSON {S1: {...}, ...} for dt.python_parameters")
+    ap.add_argument("--parts", type=int, default=10)
+    ap.add_argument("--json", default="", help="also write the report to this file")
+    args = ap.parse_args()
+
+    install_no_db()
+    camera_pool.use_mock_cameras(args.images or None, preload=True)
+    frames = {}
+    for name in camera_pool.pool.names():
+        camera_pool.pool.connect(name)     # ReadPythonResult skips disconnected cameras
+        frames[name] = camera_pool.pool.get(name).frames
+    if args.params:
+        with open(args.params) as fh:
+            for station, values in json.load(fh).items():
+                dt.python_parameters.setdefault(station, {}).update(values)
+
+    tracemalloc.start()
+    report = {}
+    for label, colour in (("bgr (before)", True), ("mono (after)", False)):
+        _run_part(frames, 0, colour)       # warm-up: imports, first-call allocations
+        report[label] = _summary([_run_part(frames, i, colour) for i in range(args.parts)])
+    tracemalloc.stop()
+
+    print("\n========== Mono vs BGR per part ==========")
+    for label, r in report.items():
+        print(f"{label:<14} part p50 {r['part_ms_p50']:>8} ms  max {r['part_ms_max']:>8} ms  "
+              f"peak {r['peak_mb_max']:>7} MB  stations {r['station_ms_p50']}")
+    print("==========================================")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"report": report, "args": vars(args)}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# bench_station1.py
+# Station 1 stage timings with and without a shared FrameAnalysis, and a check that both give
+# the same measurements and verdicts (exit code 1 on any difference).
+#
+#   python bench_station1.py --images D:\bench_images\cam1 --repeat 5
+#   python bench_station1.py --images a.bmp b.bmp --orifice --json s1.json
+#
+# "separate" calls every defect.* stage without an analysis, so each one converts, thresholds
+# and finds contours on its own (the behaviour before FrameAnalysis); "shared" passes one
+# FrameAnalysis per frame through all of them, as station1.main does. Stage prints are muted.
+# tests/test_frame_analysis.py runs the same comparison (plus ring masks) on synthetic frames.
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+
+import defect as dt
+from frame_utils import FrameAnalysis, normalize_frame
+
+IMAGE_EXTS = (".bmp", ".png", ".jpg", ".tif", ".tiff")
+
+
+def _image_paths(items: list) -> list:
+    paths = []
+    for item in items:
+        if os.path.isdir(item):
+            paths += sorted(p for p in glob.glob(os.path.join(item, "**", "*"), recursive=True)
+                            if p.lower().endswith(IMAGE_EXTS))
+        else:
+            paths.append(item)
+    return paths
+
+
+def _inspect(frame, shared: bool, orifice: bool, p2m: float) -> dict:
+    """The station 1 PISTON path (flash thresholds 0), reduced to comparable values."""
+    analysis = FrameAnalysis(frame) if shared else None
+    processed = dt.preprocess_image(frame, analysis=analysis)
+    if len(processed["sorted_contours"]) < 2:
+        return {"error": "not enough contours"}
+    dims = dt.id_od_dimension(frame, processed["sorted_contours"], pixel_to_micron_id=p2m,
+                              pixel_to_micron_od=p2m, analysis=analysis)
+    flash = dt.flash_detection(frame, dims["id_contour"], dims["od_contour"], 0, 0, 0, 0, analysis=analysis)
+    out = {k: dims[k] for k in ("diameter_id_px", "diameter_od_px", "center_x_od", "center_y_od",
+                                "center_x_id", "center_y_id", "radius_od", "radius_id",
+                                "od_profile", "id_profile")}
+    out.update({"flash": flash["Defect_Result"], "position": flash["defect_position"]})
+    if orifice:
+        o = dt.measure_orifice(frame, 0.0, 1e9, p2m, analysis=analysis)
+        out.update({"orifice_mm": o["orifice_diameter_mm"], "orifice_center": (o.get("center_x"), o.get("center_y"))})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Station 1: separate vs shared FrameAnalysis")
+    ap.add_argument("--images", nargs="+", required=True, help="image files and/or folders (cam1 frames)")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per image and mode")
+    ap.add_argument("--orifice", action="store_true", help="include measure_orifice (PISTON with orifice limits)")
+    ap.add_argument("--pixel-to-micron", type=float, default=10.0)
+    ap.add_argument("--json", default="", help="also write the report to this file")
+    args = ap.parse_args()
+
+    paths = _image_paths(args.images)
+    if not paths:
+        print("❌ No images found")
+        sys.exit(2)
+
+    timing = dt.ENABLE_TIMING
+    dt.ENABLE_TIMING = False
+    times = {"separate": [], "shared": []}
+    mismatches = []
+    try:
+        for path in paths:
+            frame = normalize_frame(cv2.imread(path, cv2.IMREAD_UNCHANGED))
+            if frame is None:
+                print(f"⚠️ Could not read {path}")
+                continue
+            results = {}
+            for mode in ("separate", "shared"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for _ in range(args.repeat):
+                        t0 = time.perf_counter()
+                        results[mode] = _inspect(frame, mode == "shared", args.orifice, args.pixel_to_micron)
+                        times[mode].append((time.perf_counter() - t0) * 1000.0)
+            if results["separate"] != results["shared"]:
+                mismatches.append({"image": path, **results})
+                print(f"❌ {path}: separate {results['separate']} != shared {results['shared']}")
+    finally:
+        dt.ENABLE_TIMING = timing
+
+    report = {mode: {"p50_ms": round(statistics.median(v), 2), "max_ms": round(max(v), 2), "n": len(v)}
+              for mode, v in times.items() if v}
+    print(f"\n========== Station 1 stages ({len(paths)} images x {args.repeat}) ==========")
+    for mode, r in report.items():
+        print(f"  {mode:<9} p50 {r['p50_ms']:>9} ms  max {r['max_ms']:>9} ms  (n={r['n']})")
+    print(f"  identical results: {'yes' if not mismatches else f'NO ({len(mismatches)} images)'}")
+    print("=============================================================")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"report": report, "mismatches": mismatches, "args": vars(args)}, fh, indent=2, default=str)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# bench_throughput.py
+# End-to-end throughput benchmark: controller_sim -> tcp_client.communicate_with_controller
+# -> run_part_pipeline -> station chain, with the four cameras replaced by mock frames.
+#
+#   python bench_throughput.py --ppm 90 --duration 60 --no-db --stations fixed:40
+#   python bench_throughput.py --ppm 60 --images D:\bench_images --params params.json --no-db
+#
+# --images   folder with cam1..cam4 (or input_backup_cam1..4) sub-folders, searched recursively,
+#            or one folder used for all cameras; without it a blank mono frame is used.
+# --stations real        run station1/2/_3/_4.main on the mock frames (needs --params or the DB)
+#            fixed:<ms>  skip image processing, return OK after <ms> per station
+# --no-db    keep the SQL Server out of the loop (inserts/updates/parameter loads are no-ops)
+#
+# Reports sustained parts/minute, dropped triggers and $OK#/$NOK# latency percentiles as seen
+# by the simulated controller, plus tcp_client.get_controller_metrics().
+
+import argparse
+import json
+import threading
+import time
+
+import camera_pool
+import dbscript as DB
+import data as dt
+import part_trace as pt
+import tcp_client as tc
+from controller_sim import ControllerSimulator
+
+
+def install_mock_cameras(folder: str, capture_ms: float):
+    """Put camera_pool MockCameras (preloaded, so disk reads stay out of the timings) behind every station."""
+    camera_pool.use_mock_cameras(folder or None, latency_ms=capture_ms, preload=True)
+
+
+def install_no_db():
+    DB.load_python_parameters = lambda recipe_id: None
+    DB.insert_workpartdetail_1st_Station = lambda *a, **k: 0
+    DB.update_workpartdetail_2nd_Station = lambda *a, **k: None
+    DB.update_workpartdetail_3rd_Station = lambda *a, **k: None
+    DB.update_workpartdetail_4th_Station = lambda *a, **k: None
+    DB.update_defect_count = lambda *a, **k: None
+
+
+def install_fixed_stations(ms: float):
+    """Station mains that only sleep `ms` and report OK (measures the pipeline itself)."""
+    def _sleep():
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def s1(**kw):
+        _sleep()
+        return ("r", "OK", "NA", "OK", "NA", "OK", "NA", "OK", "NA", "NA", "NA", "OK", "")
+
+    def s2(**kw):
+        _sleep()
+        return ("r", "OK", "", "NA", "", "NA", "")
+
+    def s34(**kw):
+        _sleep()
+        return {"id": {"status": "OK", "count": 0}, "od": {"status": "OK", "count": 0}}
+
+    tc.Station1_detection.main = s1
+    tc.Station2_detection.main = s2
+    tc.Station3_detection.main = s34
+    tc.Station4_detection.main = s34
+
+
+def _print_report(sim_stats: dict, link: dict, spans: dict, expected_ppm: float):
+    print("\n========== Throughput benchmark ==========")
+    print(f"Run time           : {sim_stats['elapsed_s']:.1f} s")
+    print(f"Triggers ($C1#)    : {sim_stats['triggers']}  (target {expected_ppm:.1f} ppm)")
+    print(f"Verdicts           : {sim_stats['verdicts']}  (OK {sim_stats['ok']} / NOK {sim_stats['nok']})")
+    print(f"Sustained rate     : {sim_stats['parts_per_min']:.2f} parts/min")
+    print(f"Debounced triggers : {sim_stats['suppressed']}")
+    print(f"Dropped triggers   : {sim_stats['dropped']}  (+{sim_stats['in_flight']} still in flight)")
+    if sim_stats["unexpected_verdicts"]:
+        print(f"Unexpected verdicts: {sim_stats['unexpected_verdicts']}")
+    lat = sim_stats["latency_ms"]
+    print(f"Verdict latency ms : p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print("Controller link    :")
+    for name, value in sorted(link.items()):
+        if name not in ("scheduler", "frame_rings"):
+            print(f"  {name:<20} {value}")
+    sched = link.get("scheduler") or {}
+    if sched:
+        print("Capture start error :")
+        for st, v in sched["stations"].items():
+            e = v["start_error"]
+            if e["count"]:
+                print(f"  {st:<20} p50 <= {e['p50_us']}us  p99 <= {e['p99_us']}us  max {e['max_us']}us")
+    for name, ring in (link.get("frame_rings") or {}).items():
+        print(f"Frame ring {name:<9}: taken {ring['taken']}/{ring['received']}  overwritten {ring['overwritten']}"
+              f"  dropped {ring['dropped']}  timeouts {ring['timeouts']}  allocations {ring['allocations']}")
+    print("Per-part spans (ms) :")
+    for name, v in spans.items():
+        print(f"  {name:<20} p50 {v['p50_ms']:>9}  p95 {v['p95_ms']:>9}  p99 {v['p99_ms']:>9}  (n={v['count']})")
+    print("==========================================")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end throughput benchmark against controller_sim")
+    ap.add_argument("--ppm", type=float, default=60.0)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--burst-every", type=int, default=0)
+    ap.add_argument("--burst-size", type=int, default=2)
+    ap.add_argument("--burst-gap-ms", type=float, default=50.0)
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of triggering")
+    ap.add_argument("--drain", type=float, default=10.0, help="max seconds to wait for in-flight parts")
+    ap.add_argument("--images", default="", help="mock frame folder (camN / input_backup_camN sub-folders optional)")
+    ap.add_argument("--capture-ms", type=float, default=0.0, help="simulated capture time per frame")
+    ap.add_argument("--stations", default="real", help="'real' or 'fixed:<ms>'")
+    ap.add_argument("--params", default="", help="JSON {S1: {...}, S2: {...}} for dt.python_parameters")
+    ap.add_argument("--delays", default="", help="CAM1..CAM4 delays in seconds, e.g. 0.2,0.5,0.5,0.5")
+    ap.add_argument("--trigger-mode", choices=["offset", "controller"], default="offset",
+                    help="fire C2..C4 on time offsets or on the simulator's $C2#..$C4#")
+    ap.add_argument("--acquisition", choices=["software", "hardware"], default="software",
+                    help="per-part grab, or mock cameras streaming into the frame ring")
+    ap.add_argument("--station-delays", default="", help="simulated travel C1->C2, C2->C3, C3->C4 in s")
+    ap.add_argument("--no-db", action="store_true")
+    ap.add_argument("--flask", action="store_true", help="keep the /trigger/<cam> notifications")
+    ap.add_argument("--json", default="", help="also write the report to this file")
+    args = ap.parse_args()
+
+    install_mock_cameras(args.images, args.capture_ms)
+    if args.no_db:
+        install_no_db()
+    if args.stations.startswith("fixed"):
+        _, _, ms = args.stations.partition(":")
+        install_fixed_stations(float(ms or 0))
+    if not args.flask:
+        tc.trigger_flask_camera = lambda cam_id: None
+    if args.params:
+        with open(args.params) as fh:
+            for station, values in json.load(fh).items():
+                dt.python_parameters.setdefault(station, {}).update(values)
+    dt.python_parameters["S1"]["TRIGGER_MODE"] = args.trigger_mode
+    dt.python_parameters["S1"]["ACQUISITION_MODE"] = args.acquisition
+    if args.delays:
+        for n, value in enumerate(args.delays.split(","), start=1):
+            dt.python_parameters[f"S{n}"][f"CAM{n}DELAY"] = float(value)
+
+    sim = ControllerSimulator(port=0, ppm=args.ppm, jitter=args.jitter,
+                              burst_every=args.burst_every, burst_size=args.burst_size,
+                              burst_gap_ms=args.burst_gap_ms,
+                              verdict_timeout=args.drain,
+                              debounce_ms=tc._get_c1_debounce_sec() * 1000.0,
+                              station_delays=[float(d) for d in args.station_delays.split(",") if d]
+                              ).start()
+    tc.CONTROLLER_IP, tc.CONTROLLER_PORT = sim.host, sim.port
+
+    param_dict = {f"S{n}:Camera{n}Enable": "1" for n in range(1, 5)}
+    session = threading.Thread(target=tc.start_process, args=(param_dict,), daemon=True)
+    session.start()
+
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        print("⛔️ Interrupted — collecting results")
+
+    # let parts already on the line finish before stopping
+    sim.hold()
+    deadline = time.monotonic() + args.drain
+    while sim.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    stats = sim.stats()
+    # the controller's $STP# only pauses the line now; shut the session down explicitly
+    sim.send_stop()
+    tc.stop_process()
+    session.join(10.0)
+    link = tc.get_controller_metrics()
+    link["scheduler"] = tc.scheduler.status()
+    link["frame_rings"] = {name: cam["ring"] for name, cam in camera_pool.pool.status().items() if "ring" in cam}
+    spans = pt.get_trace_summary(recent=0)["spans"]
+    sim.close()
+
+    _print_report(stats, link, spans, args.ppm)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"controller": stats, "link": link, "spans": spans, "args": vars(args)}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# camera_health.py
+# Cached connection state per camera, so the part pipeline and the /camera-status route never
+# go to the SDK just to ask "is it connected?".
+#
+# The cache is fed by events from camera_pool (connect/disconnect results, every captured or
+# streamed frame, capture/grab errors) and by a slow poll thread that asks the SDK only for
+# cameras that have not delivered a frame since the last poll. An error wakes the poll at once,
+# so a lost camera is noticed within one SDK round-trip rather than one poll period.
+# Reads (is_connected / snapshot) take no SDK call and no lock.
+#
+# A camera that drops after it was connected is reconnected in the background (pool.reconnect
+# on its own thread, so one dead camera never holds up the poll or the other stations), with
+# RECONNECT_BACKOFF_SEC between attempts. Cameras disconnected on purpose are left alone, and
+# no attempt starts while an earlier connect of the same camera is still running (pool.connecting).
+
+import threading
+import time
+
+HEALTH_POLL_SEC = 2.0       # SDK IsConnected() poll period for cameras without recent frames
+RECONNECT_BACKOFF_SEC = (0.5, 1.0, 2.0, 5.0, 10.0)   # wait before attempt 1, 2, ...; last repeats
+
+
+class CameraState:
+    __slots__ = ("connected", "watched", "last_frame", "last_poll", "errors", "last_error",
+                 "error_at", "reconnect_attempts", "next_retry", "reconnecting", "changed_at")
+
+    def __init__(self):
+        self.connected = False
+        self.watched = False            # connected once and not deliberately disconnected since
+        self.last_frame = None          # time.time() of the last frame delivered
+        self.last_poll = None           # time.time() of the last SDK check
+        self.errors = 0
+        self.last_error = ""
+        self.error_at = None
+        self.reconnect_attempts = 0     # connect attempts since the camera was last connected
+        self.next_retry = 0.0           # time.time() of the next background reconnect
+        self.reconnecting = False
+        self.changed_at = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            "connected": self.connected,
+            "last_frame": self.last_frame,
+            "last_poll": self.last_poll,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "reconnect_attempts": self.reconnect_attempts,
+            "reconnecting": self.reconnecting,
+            "changed_at": self.changed_at,
+        }
+
+
+class CameraHealth:
+    def __init__(self, pool, poll_sec: float = HEALTH_POLL_SEC, auto_reconnect: bool = True):
+        self.pool = pool
+        self.poll_sec = poll_sec
+        self.auto_reconnect = auto_reconnect
+        self._states = {}
+        self._lock = threading.Lock()       # writers only
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _state(self, name: str) -> CameraState:
+        st = self._states.get(name)
+        if st is None:
+            with self._lock:
+                st = self._states.setdefault(name, CameraState())
+        return st
+
+    def _set_connected(self, name: str, connected: bool, why: str = ""):
+        st = self._state(name)
+        if st.connected == connected:
+            return
+        st.connected = connected
+        st.changed_at = time.time()
+        if connected:
+            st.reconnect_attempts = 0
+            print(f"📷 {name.upper()} connected")
+        else:
+            print(f"⚠️ {name.upper()} lost{': ' + why if why else ''}")
+            if st.watched:
+                st.next_retry = time.time() + RECONNECT_BACKOFF_SEC[0]
+                self._wake.set()
+
+    # ---- reads (hot path) ----
+    def is_connected(self, name: str) -> bool:
+        st = self._states.get(name)
+        return st is not None and st.connected
+
+    def snapshot(self) -> dict:
+        return {name: st.as_dict() for name, st in list(self._states.items())}
+
+    # ---- events from camera_pool ----
+    def note_connect(self, name: str, ok: bool):
+        st = self._state(name)
+        if ok:
+            st.watched = True
+        else:
+            st.reconnect_attempts += 1
+            delay = RECONNECT_BACKOFF_SEC[min(st.reconnect_attempts, len(RECONNECT_BACKOFF_SEC) - 1)]
+            st.next_retry = time.time() + delay
+        self._set_connected(name, ok, "connect failed")
+
+    def watch(self, name: str):
+        """Keep reconnecting `name` in the background even though it never came up (enabled at arming)."""
+        st = self._state(name)
+        st.watched = True
+        self._wake.set()
+
+    def note_disconnect(self, name: str):
+        self._state(name).watched = False
+        self._set_connected(name, False, "disconnected")
+
+    def note_frame(self, name: str):
+        st = self._state(name)
+        st.last_frame = time.time()
+        if not st.connected:
+            self._set_connected(name, True)
+
+    def note_error(self, name: str, error):
+        st = self._state(name)
+        with self._lock:
+            st.errors += 1
+        st.last_error = str(error)
+        st.error_at = time.time()
+        self._wake.set()                    # verify with the SDK now, not at the next poll
+
+    def forget(self):
+        """Backend switched (use_mock_cameras / use_neo_cameras): start from a clean slate."""
+        with self._lock:
+            self._states = {}
+
+    # ---- poll thread ----
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="camera-health", daemon=True)
+            self._thread.start()
+
+    def probe(self, name: str) -> bool:
+        """Ask the SDK now and update the cache (arming, or when a frame went missing)."""
+        st = self._state(name)
+        try:
+            connected = bool(self.pool.get(name).is_connected())
+        except Exception as exc:
+            st.last_error = str(exc)
+            connected = False
+        st.last_poll = time.time()
+        self._set_connected(name, connected, "SDK reports disconnected")
+        return connected
+
+    def _reconnect(self, name: str, st: CameraState):
+        try:
+            self.pool.reconnect(name)
+        except Exception as exc:
+            st.last_error = str(exc)
+            self.note_connect(name, False)
+        finally:
+            st.reconnecting = False
+            self._wake.set()
+
+    def _next_wait(self) -> float:
+        wait = self.poll_sec
+        now = time.time()
+        for st in list(self._states.values()):
+            if st.watched and not st.connected and not st.reconnecting:
+                wait = min(wait, st.next_retry - now)
+        return max(0.05, wait)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+            now = time.time()
+            for name in self.pool.names():
+                st = self._state(name)
+                if not st.watched:          # never connected, or disconnected on purpose
+                    continue
+                if not st.connected:
+                    if self.pool.connecting(name):
+                        # the first attempt is still inside Connect(): it reports when it returns
+                        st.next_retry = max(st.next_retry, now + RECONNECT_BACKOFF_SEC[0])
+                        continue
+                    if self.auto_reconnect and not st.reconnecting and now >= st.next_retry:
+                        st.reconnecting = True
+                        threading.Thread(target=self._reconnect, args=(name, st),
+                                         name=f"{name}-reconnect", daemon=True).start()
+                    continue
+                # a frame since the last poll (and since the last error) proves the camera is there
+                if st.connected and st.last_frame is not None and now - st.last_frame < self.poll_sec \
+                        and (st.error_at is None or st.last_frame > st.error_at):
+                    continue
+                self.probe(name)
@@ -0,0 +1,719 @@
+# camera_pool.py
+# One interface for every station camera, whatever is behind it.
+#
+#   NeoCamera  : Baumer camera through neoapi (imported on first connect, so this module and
+#                everything importing it also load on a machine without the SDK)
+#   MockCamera : replays BMP/PNG files from a folder (e.g. the input_backup_camN/<date>/<hour>
+#                archives) with a configurable capture latency — the whole pipeline can run and
+#                be profiled on a Linux box without hardware
+#
+# CameraPool holds the cameras by name ("cam1".."cam4"). CAMERA_CONFIG lists the real cameras;
+# a fifth station is one more entry there, not another copy of every function.
+#
+# Acquisition is either a software grab per part (capture()) or hardware-triggered streaming:
+# start_stream() puts the camera on its trigger line and a grab thread fills a pre-allocated
+# frame_ring.FrameRing; the station then take()s the frame that arrived in its part's window.
+# MockCamera emulates the same ring: line_pulse() stands in for the trigger edge.
+#
+# Camera features (exposure, gain, pixel format, packet size, ROI, binning) come from the recipe
+# (StationParameterDetail, see RECIPE_FEATURES) through configure(). Each camera remembers the
+# values it last wrote, so switching recipes only writes the GenICam features that changed.
+# A sensor ROI / binning makes frames smaller; geometry() tells the stations where the frame
+# sits on the sensor (frame_utils.FrameGeometry).
+#
+# Backend at import: PRAVI_CAMERA_BACKEND=mock uses MockCameras fed from PRAVI_MOCK_IMAGES
+# (latency PRAVI_MOCK_LATENCY_MS); anything else uses the real cameras. use_mock_cameras() /
+# use_neo_cameras() switch at runtime (the pool must be disconnected first).
+
+import glob
+import os
+import queue
+import threading
+import time
+
+from camera_health import CameraHealth
+from frame_ring import DEFAULT_SLOTS, FrameRing
+from frame_utils import FULL_FRAME, FrameGeometry, normalize_frame
+from image_writer import archive
+
+IMAGE_EXTS = (".bmp", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+INPUT_IMAGE_DIR = r"D:\PIM_25-09-25\Pravi_Flask\static\Cam1InputImages"
+
+# name -> settings of the physical camera (trigger_source used in hardware-triggered mode:
+# "Line1".."Line3" wired to the controller, or "Software" for TriggerSoftware on line_pulse())
+CAMERA_CONFIG = {
+    "cam1": {"serial": "700012114996", "exposure_us": 1200, "trigger_source": "Line1"},   # 700009456892 700011425074
+    "cam2": {"serial": "700009729305", "exposure_us": 1000, "trigger_source": "Line1"},
+    "cam3": {"serial": "700009600803", "exposure_us": 5000, "trigger_source": "Line1"},
+    "cam4": {"serial": "700009600797", "exposure_us": 8000, "trigger_source": "Line1"},
+}
+
+GRAB_TIMEOUT_MS = 200               # grab thread wakes this often to notice stop_stream()
+CONNECT_TIMEOUT_SEC = 10.0          # per camera; connect_many() returns after the slowest or this
+DISCONNECT_TIMEOUT_SEC = 5.0
+
+MOCK_FRAME_SHAPE = (2048, 2448)     # blank mono frame when a mock camera has no images
+
+# recipe parameter (StationParameterDetail "Sn:<key>") -> GenICam feature on that station's
+# camera. 0 / empty in the recipe keeps the value the camera has (the previous recipe's), except
+# exposure, which goes back to CAMERA_CONFIG exposure_us, and ROI and binning: without them the
+# recipe gets the whole sensor, unbinned.
+# ROI values are in binned pixels. Pixel-valued recipe parameters (offsets, burr/contour limits)
+# and PIXELTOMICRON stay full-sensor values; the stations scale them through FrameGeometry.
+RECIPE_FEATURES = {
+    "CameraExposure": "ExposureTime",        # µs; bounds the line rate
+    "CameraGain": "Gain",                    # dB
+    "CameraPixelFormat": "PixelFormat",      # e.g. "Mono8"
+    "CameraPacketSize": "GevSCPSPacketSize",
+    "CameraROIWidth": "Width",
+    "CameraROIHeight": "Height",
+    "CameraROIOffsetX": "OffsetX",
+    "CameraROIOffsetY": "OffsetY",
+    "CameraBinning": "BinningHorizontal",    # 1, 2, 4 (BinningVertical follows)
+}
+STRING_FEATURES = ("PixelFormat",)
+FLOAT_FEATURES = ("ExposureTime", "Gain")
+ROI_FEATURES = ("Width", "Height", "OffsetX", "OffsetY")
+BINNING_FEATURES = ("BinningHorizontal", "BinningVertical")
+# change the image format only while the camera is not streaming, in this order
+FORMAT_FEATURES = BINNING_FEATURES + ("PixelFormat", "Width", "Height", "OffsetX", "OffsetY")
+
+
+class _StreamingCamera:
+    """Grab thread + FrameRing shared by the backends; subclasses provide _arm/_disarm/_grab."""
+
+    ring = None
+    health = None               # set by CameraPool: frames / grab errors feed the health cache
+    _streaming = False
+    _grab_thread = None
+
+    def start_stream(self, slots: int = DEFAULT_SLOTS) -> bool:
+        """Switch to hardware-triggered acquisition into a ring of `slots` buffers."""
+        if self._streaming:
+            self.ring.clear()          # re-arm: frames from before are stale
+            return True
+        try:
+            self._arm(slots)
+        except Exception as exc:
+            print(f'{self.name.upper()} could not arm the trigger:', exc)
+            return False
+        if self.ring is None or self.ring.slots != slots:
+            self.ring = FrameRing(slots, name=self.name)
+        self.ring.clear()
+        self._streaming = True
+        self._grab_thread = threading.Thread(target=self._grab_loop, name=f"{self.name}-grab", daemon=True)
+        self._grab_thread.start()
+        print(f"🎞️ {self.name.upper()} streaming on its trigger ({slots} buffers)")
+        return True
+
+    def stop_stream(self):
+        if not self._streaming:
+            return
+        self._streaming = False
+        if self._grab_thread is not None:
+            self._grab_thread.join(1.0 + GRAB_TIMEOUT_MS / 1000.0)
+        try:
+            self._disarm()
+        except Exception as exc:
+            print(f'{self.name.upper()} trigger off error:', exc)
+
+    @property
+    def streaming(self) -> bool:
+        return self._streaming
+
+    def _grab_loop(self):
+        while self._streaming:
+            try:
+                grabbed = self._grab(GRAB_TIMEOUT_MS)
+            except Exception as exc:
+                print(f'{self.name.upper()} grab error:', exc)
+                if self.health is not None:
+                    self.health.note_error(self.name, exc)
+                time.sleep(0.1)
+                continue
+            if grabbed is None:
+                continue
+            img, frame_id, camera_ts = grabbed
+            self.ring.put(img, frame_id, camera_ts)
+            if self.health is not None:
+                self.health.note_frame(self.name)
+            self._archive(img)
+
+    def take(self, lo: float, hi: float):
+        """Leased RingFrame for the trigger that arrived in [lo, hi] (perf_counter), or None."""
+        if not self._streaming:
+            return None
+        return self.ring.take(lo, hi, timeout=max(0.0, hi - time.perf_counter()))
+
+    def _archive(self, img):
+        pass
+
+    # ---- features ----
+    _features = None            # feature -> value last written (cleared on connect)
+    _requested = None           # feature -> value asked for (last recipe + later writes), reapplied on reconnect
+    exposure_us = None          # CAMERA_CONFIG exposure, used when a recipe sets none
+
+    def configure(self, features: dict, full_frame: bool = False) -> list:
+        """
+        Write `features` ({GenICam name: value}) that differ from what this camera last wrote;
+        returns the names written. Format features are written with the stream stopped.
+        full_frame=True (a recipe): binning / ROI features it does not set go back to 1 and the
+        whole sensor, so an ROI from the previous recipe does not linger, and ExposureTime goes
+        back to the configured exposure_us.
+        """
+        if self._features is None:
+            self._features = {}
+        features = dict(features)
+        if full_frame:
+            if self.exposure_us is not None:
+                features.setdefault("ExposureTime", float(self.exposure_us))
+            self._fill_full_frame(features)
+            self._requested = dict(features)        # a recipe replaces the previous one
+        else:
+            self._requested = {**(self._requested or {}), **features}
+        changed = {k: v for k, v in features.items() if self._features.get(k) != v}
+        if not changed:
+            return []
+        slots = None
+        if self._streaming and any(k in FORMAT_FEATURES for k in changed):
+            slots = self.ring.slots
+            self.stop_stream()
+        if any(k in ROI_FEATURES or k in BINNING_FEATURES for k in changed):
+            # offsets to 0 first, so neither a larger window nor a larger offset is rejected;
+            # then binning and size, then the offsets again (kept ones included)
+            for k in ("OffsetX", "OffsetY"):
+                target = changed.get(k, self._features.get(k))
+                if self._features.get(k) != 0 and self._write_feature(k, 0):
+                    self._features[k] = 0
+                if target:
+                    changed[k] = target
+        order = [k for k in FORMAT_FEATURES if k in changed] + \
+                [k for k in changed if k not in FORMAT_FEATURES]
+        written = []
+        for k in order:
+            if self._features.get(k) == changed[k]:
+                continue
+            if self._write_feature(k, changed[k]):
+                self._features[k] = changed[k]
+                written.append(k)
+        if slots:
+            self.start_stream(slots)
+        if written:
+            print(f"⚙️ {self.name.upper()} " + ", ".join(f"{k}={self._features[k]}" for k in written))
+        return written
+
+    def _fill_full_frame(self, features: dict):
+        bh = features.setdefault("BinningHorizontal", 1)
+        bv = features.setdefault("BinningVertical", bh)
+        try:
+            sensor_w, sensor_h = self._sensor_size()
+        except Exception as exc:
+            print(f'{self.name.upper()} sensor size unknown, ROI left as it is:', exc)
+            return
+        ox = features.setdefault("OffsetX", 0)
+        oy = features.setdefault("OffsetY", 0)
+        features.setdefault("Width", sensor_w // bh - ox)
+        features.setdefault("Height", sensor_h // bv - oy)
+
+    def features(self) -> dict:
+        return dict(self._features or {})
+
+    def requested(self) -> dict:
+        return dict(self._requested or {})
+
+    def geometry(self) -> FrameGeometry:
+        """Sensor ROI / binning of the frames this camera delivers now."""
+        f = self._features or {}
+        if not f:
+            return FULL_FRAME
+        return FrameGeometry(f.get("OffsetX", 0), f.get("OffsetY", 0), f.get("BinningHorizontal", 1))
+
+
+class NeoCamera(_StreamingCamera):
+    """Baumer camera. capture() returns the array and queues the latest/backup images for the archive writer."""
+
+    def __init__(self, name: str, serial: str, exposure_us: float | None = None,
+                 image_dir: str = INPUT_IMAGE_DIR, save_images: bool = True,
+                 trigger_source: str = "Line1"):
+        self.name = name
+        self.serial = serial
+        self.exposure_us = exposure_us
+        self.trigger_source = trigger_source
+        self.latest_path = os.path.join(image_dir, f"{name}.bmp")
+        self.backup_dir = os.path.join(image_dir, f"input_backup_{name}")
+        self.save_images = save_images
+        self._cam = None
+        self._neoapi = None
+        self._sensor = None             # (SensorWidth, SensorHeight), read once
+
+    def _sdk(self):
+        if self._neoapi is None:
+            import neoapi   # only needed once a real camera is used
+            self._neoapi = neoapi
+        return self._neoapi
+
+    def connect(self) -> bool:
+        try:
+            neoapi = self._sdk()
+            if self._cam is None:
+                self._cam = neoapi.Cam()
+            self._cam.Connect(self.serial)
+            self._features = {}            # unknown after a (re)connect: write everything once
+            if self.exposure_us is not None:
+                self.configure({"ExposureTime": float(self.exposure_us)})
+            print(f'{self.name.upper()} Connected!')
+            return True
+        except Exception as exc:   # neoapi.NeoException included
+            print(f'{self.name.upper()} error:', exc)
+            return False
+
+    def is_connected(self) -> bool:
+        try:
+            return self._cam is not None and bool(self._cam.IsConnected())
+        except Exception as exc:
+            print(f'{self.name.upper()} error:', exc)
+            return False
+
+    def capture(self):
+        """Grab one frame; None on error. Archiving runs on image_writer.archive, not here."""
+        if self._cam is None:
+            print(f'{self.name.upper()} capture error: not connected')
+            return None
+        try:
+            start_time = time.perf_counter()
+            img = self.to_array(self.acquire())
+            self._archive(img)
+            print(f'Time taken to capture Image for {self.name.upper()}: '
+                  f'{(time.perf_counter() - start_time) * 1000:.3f} ms')
+            return img
+        except Exception as exc:
+            print(f'{self.name.upper()} capture error: ', exc)
+            return None
+
+    def acquire(self):
+        """Raw SDK image: the acquisition step of capture() (no conversion, no archive)."""
+        return self._cam.GetImage()
+
+    def to_array(self, image):
+        return normalize_frame(image.GetNPArray())   # Mono8 (h, w, 1) -> (h, w) view
+
+    def _archive(self, img):
+        # img is a view of an SDK buffer (or a ring slot) that is reused once the neoapi.Image
+        # is released, so the writer always gets its own copy
+        if not self.save_images:
+            return
+        # timestamped copy in the dated/hourly backup folder + the latest image
+        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        backup_dir = os.path.join(self.backup_dir, time.strftime("%Y-%m-%d"), time.strftime("%H"))
+        archive.submit(img, [os.path.join(backup_dir, f"{self.name}_{timestamp}.png"),
+                             self.latest_path], copy=True)
+
+    def _write_feature(self, name: str, value) -> bool:
+        try:
+            feature = getattr(self._cam.f, name)
+            if isinstance(value, str):
+                feature.SetString(value)
+            else:
+                feature.Set(value)
+            return True
+        except Exception as exc:
+            print(f'{self.name.upper()} could not set {name}={value}:', exc)
+            return False
+
+    def _sensor_size(self):
+        if self._sensor is None:
+            f = self._cam.f
+            self._sensor = (int(f.SensorWidth.Get()), int(f.SensorHeight.Get()))
+        return self._sensor
+
+    # ---- hardware trigger ----
+    def _arm(self, slots):
+        f = self._cam.f
+        f.TriggerMode.SetString("On")
+        f.TriggerSource.SetString(self.trigger_source)
+        if self.trigger_source != "Software":
+            f.TriggerActivation.SetString("RisingEdge")
+        self._cam.SetImageBufferCount(slots)
+
+    def _disarm(self):
+        self._cam.f.TriggerMode.SetString("Off")
+
+    def _grab(self, timeout_ms):
+        image = self._cam.GetImage(timeout_ms)
+        if image.IsEmpty():
+            return None
+        return normalize_frame(image.GetNPArray()), image.GetImageID(), image.GetTimestamp()
+
+    def line_pulse(self):
+        """Trigger edge from software; a wired trigger line needs nothing here."""
+        if self._streaming and self.trigger_source == "Software":
+            self._cam.f.TriggerSoftware.Execute()
+
+    def disconnect(self):
+        if self._cam is None:
+            return
+        self.stop_stream()
+        try:
+            self._cam.Disconnect()
+        except Exception as exc:
+            print(f'{self.name.upper()} disconnect error: ', exc)
+
+
+class MockCamera(_StreamingCamera):
+    """
+    Replays image files in name order (looping). `folder` is searched recursively, so an
+    input_backup_camN/<date>/<hour> archive works as is. latency_ms simulates exposure +
+    transfer; preload=True decodes every file once so disk I/O stays out of the timings.
+    In streaming mode every line_pulse() delivers one frame into the ring latency_ms later,
+    stamped with a frame counter and the pulse time (ns) as camera timestamp.
+    """
+
+    def __init__(self, name: str, folder: str | None = None, latency_ms: float = 0.0,
+                 preload: bool = False, grayscale: bool = True):
+        self.name = name
+        self.folder = folder
+        self.latency_ms = float(latency_ms)
+        self.grayscale = grayscale
+        self.paths = _image_files(folder) if folder else []
+        self.frames = None
+        self.captured = 0
+        self.feature_writes = 0
+        self._connected = False
+        self._lock = threading.Lock()
+        self._index = 0
+        self._pulses = queue.Queue()
+        self._frame_id = 0
+        if folder and not self.paths:
+            print(f"⚠️ {name}: no images in {folder} — using a blank frame")
+        if preload or not self.paths:
+            self.frames = [self._read(p) for p in self.paths] or [_blank_frame()]
+
+    def _read(self, path):
+        import cv2
+        return cv2.imread(path, cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR)
+
+    def connect(self) -> bool:
+        self._connected = True
+        print(f"{self.name.upper()} Connected! (mock, {len(self.frames or self.paths)} images)")
+        return True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def capture(self):
+        if not self._connected:
+            print(f"{self.name.upper()} capture error: not connected")
+            return None
+        return self.to_array(self.acquire())
+
+    def acquire(self):
+        start = time.perf_counter()
+        frame = self._next_frame(copy=False)
+        # sleep only what is left of the simulated latency after the file read
+        left = self.latency_ms / 1000.0 - (time.perf_counter() - start)
+        if left > 0:
+            time.sleep(left)
+        return frame
+
+    def to_array(self, frame):
+        return frame.copy()      # like the SDK buffer -> owned array
+
+    def _next_frame(self, copy: bool = True):
+        with self._lock:
+            i = self._index
+            self._index += 1
+            self.captured += 1
+        if self.frames is not None:
+            frame = self._apply_roi(self.frames[i % len(self.frames)])
+            return frame.copy() if copy else frame
+        return self._apply_roi(self._read(self.paths[i % len(self.paths)]))
+
+    # ---- emulated hardware trigger ----
+    def _arm(self, slots):
+        if not self._connected:
+            raise RuntimeError("not connected")
+        while not self._pulses.empty():
+            self._pulses.get_nowait()
+
+    def _disarm(self):
+        pass
+
+    def line_pulse(self):
+        """The trigger edge: one frame arrives in the ring latency_ms from now."""
+        if self._streaming:
+            self._pulses.put(time.perf_counter_ns())
+
+    def _grab(self, timeout_ms):
+        try:
+            pulse_ns = self._pulses.get(timeout=timeout_ms / 1000.0)
+        except queue.Empty:
+            return None
+        left = pulse_ns / 1e9 + self.latency_ms / 1000.0 - time.perf_counter()
+        if left > 0:
+            time.sleep(left)
+        self._frame_id += 1
+        return self._next_frame(copy=False), self._frame_id, pulse_ns
+
+    def _write_feature(self, name: str, value) -> bool:
+        self.feature_writes += 1
+        return True
+
+    def _sensor_size(self):
+        if self.frames:
+            h, w = self.frames[0].shape[:2]
+            return w, h
+        return MOCK_FRAME_SHAPE[1], MOCK_FRAME_SHAPE[0]
+
+    def _apply_roi(self, frame):
+        # what the sensor would deliver: decimate for binning, then cut the ROI
+        f = self._features
+        if not f:
+            return frame
+        bh, bv = f.get("BinningHorizontal", 1), f.get("BinningVertical", 1)
+        if bh > 1 or bv > 1:
+            frame = frame[::bv, ::bh]
+        ox, oy = f.get("OffsetX", 0), f.get("OffsetY", 0)
+        w, h = f.get("Width"), f.get("Height")
+        if ox == 0 and oy == 0 and (w or 1 << 30) >= frame.shape[1] and (h or 1 << 30) >= frame.shape[0]:
+            return frame
+        return frame[oy:oy + h if h else None, ox:ox + w if w else None]
+
+    def disconnect(self):
+        self.stop_stream()
+        self._connected = False
+
+
+def recipe_features(param_dict: dict, station: str) -> dict:
+    """{GenICam feature: value} for `station` ("S1".."S4") from a recipe param_dict ("S1:CameraGain")."""
+    features = {}
+    for key, feature in RECIPE_FEATURES.items():
+        raw = param_dict.get(f"{station}:{key}")
+        if raw is None or str(raw).strip() in ("", "0", "0.0"):
+            continue
+        try:
+            if feature in STRING_FEATURES:
+                features[feature] = str(raw).strip()
+            elif feature in FLOAT_FEATURES:
+                features[feature] = float(raw)
+            else:
+                features[feature] = int(float(raw))
+        except (TypeError, ValueError):
+            print(f"⚠️ {station}:{key}={raw!r} is not a valid {feature} — ignored")
+    if "BinningHorizontal" in features:
+        features["BinningVertical"] = features["BinningHorizontal"]
+    return features
+
+
+def _image_files(folder: str) -> list:
+    return sorted(p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True)
+                  if p.lower().endswith(IMAGE_EXTS))
+
+
+def _blank_frame():
+    import numpy as np
+    return np.zeros(MOCK_FRAME_SHAPE, dtype=np.uint8)
+
+
+def _mock_folder(root: str, name: str) -> str:
+    # root/camN, root/input_backup_camN, or root itself for every camera
+    for sub in (name, f"input_backup_{name}"):
+        path = os.path.join(root, sub)
+        if os.path.isdir(path):
+            return path
+    return root
+
+
+class CameraPool:
+    """
+    Cameras by name. is_connected() answers from the CameraHealth cache (no SDK call); the
+    cache follows connect/capture/disconnect here and a slow SDK poll (camera_health.py).
+    Connect and reconnect of one camera are serialized by its connect lock: a Connect() that
+    outlived connect_many()'s timeout is never joined by a second one on the same neoapi.Cam.
+    """
+
+    def __init__(self):
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._connect_locks = {}
+        self.health = CameraHealth(self)
+
+    def add(self, camera):
+        camera.health = self.health
+        with self._lock:
+            self._cameras[camera.name] = camera
+        return camera
+
+    def get(self, name: str):
+        return self._cameras[name]
+
+    def names(self) -> list:
+        with self._lock:
+            return list(self._cameras)
+
+    def _connect_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._connect_locks.setdefault(name, threading.Lock())
+
+    def connecting(self, name: str) -> bool:
+        """A connect / reconnect of `name` is running (possibly hung in the SDK)."""
+        return self._connect_lock(name).locked()
+
+    def connect(self, name: str) -> bool:
+        ok = False
+        with self._connect_lock(name):
+            try:
+                ok = self.get(name).connect()
+            except Exception as exc:
+                print(f'{name.upper()} error:', exc)
+            self.health.note_connect(name, ok)
+        self.health.start()
+        return ok
+
+    def _parallel(self, fn, names, timeout: float, what: str) -> dict:
+        # one thread per camera: total time is the slowest camera, not the sum; a camera that
+        # hangs past `timeout` is reported False and left to finish on its own (daemon thread)
+        results = {name: False for name in names}
+
+        def run(name):
+            try:
+                results[name] = bool(fn(name))
+            except Exception as exc:
+                print(f'{name.upper()} {what} error:', exc)
+
+        threads = [threading.Thread(target=run, args=(name,), name=f"{name}-{what}", daemon=True)
+                   for name in names]
+        for t in threads:
+            t.start()
+        deadline = time.monotonic() + timeout
+        for name, t in zip(names, threads):
+            t.join(max(0.0, deadline - time.monotonic()))
+            if t.is_alive():
+                print(f"⏱️ {name.upper()} {what} still running after {timeout:.0f} s — continuing without it")
+        return dict(results)
+
+    def connect_many(self, names, timeout: float = CONNECT_TIMEOUT_SEC) -> dict:
+        """Connect `names` concurrently; cameras the SDK reports connected are reused as they are."""
+        results = self._parallel(lambda name: self.probe(name) or self.connect(name),
+                                 list(names), timeout, "connect")
+        for name, ok in results.items():
+            if not ok:
+                # enabled but down: retry in the background (the monitor waits for a connect
+                # that is still running past the timeout instead of starting a second one)
+                self.health.watch(name)
+        self.health.start()
+        return results
+
+    def reconnect(self, name: str) -> bool:
+        """Background reconnect of a dropped camera: recipe features rewritten, trigger stream re-armed."""
+        lock = self._connect_lock(name)
+        if not lock.acquire(blocking=False):
+            print(f"⏳ {name.upper()} connect still running — reconnect skipped")
+            return False
+        try:
+            camera = self.get(name)
+            if camera.is_connected():
+                self.health.note_connect(name, True)
+                return True
+            slots = camera.ring.slots if camera.streaming else None
+            requested = camera.requested()   # connect() forgets what was written
+            camera.stop_stream()
+            print(f"🔄 {name.upper()} reconnecting")
+            try:
+                ok = camera.connect()
+                if ok and requested:
+                    # recipe exposure, gain, ROI and binning back before frames flow again
+                    camera.configure(requested)
+            except Exception as exc:
+                print(f'{name.upper()} error:', exc)
+                ok = False
+            self.health.note_connect(name, ok)
+            if ok and slots:
+                camera.start_stream(slots)
+            return ok
+        finally:
+            lock.release()
+
+    def is_connected(self, name: str) -> bool:
+        """Cached state, O(1); use probe() to ask the SDK."""
+        return self.health.is_connected(name)
+
+    def probe(self, name: str) -> bool:
+        return name in self._cameras and self.health.probe(name)
+
+    def capture(self, name: str):
+        """Frame from camera `name`, or None when it failed."""
+        img = self.get(name).capture()
+        if img is None:
+            self.health.note_error(name, "capture failed")
+        else:
+            self.health.note_frame(name)
+        return img
+
+    def configure(self, name: str, features: dict, full_frame: bool = False) -> list:
+        return self.get(name).configure(features, full_frame)
+
+    def geometry(self, name: str) -> FrameGeometry:
+        camera = self._cameras.get(name)
+        return camera.geometry() if camera is not None else FULL_FRAME
+
+    def start_stream(self, name: str, slots: int = DEFAULT_SLOTS) -> bool:
+        return self.get(name).start_stream(slots)
+
+    def stop_stream(self, name: str):
+        self.get(name).stop_stream()
+
+    def _disconnect(self, name: str) -> bool:
+        self.health.note_disconnect(name)      # first, so the monitor does not reconnect it
+        self.get(name).disconnect()
+        return True
+
+    def disconnect_all(self, timeout: float = DISCONNECT_TIMEOUT_SEC) -> dict:
+        """Disconnect every camera concurrently; one failing camera does not skip the others."""
+        return self._parallel(self._disconnect, self.names(), timeout, "disconnect")
+
+    def replace_all(self, cameras):
+        cameras = list(cameras)
+        for camera in cameras:
+            camera.health = self.health
+        with self._lock:
+            self._cameras = {c.name: c for c in cameras}
+        self.health.forget()
+
+    def status(self) -> dict:
+        status = {}
+        health = self.health.snapshot()
+        for name in self.names():
+            camera = self.get(name)
+            status[name] = {"backend": type(camera).__name__,
+                            "connected": self.is_connected(name),
+                            "streaming": camera.streaming,
+                            "features": camera.features(),
+                            "health": health.get(name)}
+            if camera.ring is not None:
+                status[name]["ring"] = camera.ring.status()
+        return status
+
+
+pool = CameraPool()
+
+
+def use_neo_cameras():
+    pool.replace_all(NeoCamera(name, cfg["serial"], cfg.get("exposure_us"),
+                               trigger_source=cfg.get("trigger_source", "Line1"))
+                     for name, cfg in CAMERA_CONFIG.items())
+
+
+def use_mock_cameras(root: str | None = None, latency_ms: float = 0.0, preload: bool = False):
+    """Mock every configured camera; images from root/camN, root/input_backup_camN or root."""
+    pool.replace_all(MockCamera(name, _mock_folder(root, name) if root else None,
+                                latency_ms=latency_ms, preload=preload)
+                     for name in CAMERA_CONFIG)
+    print(f"🧪 Mock cameras: {root or 'blank frames'} ({latency_ms} ms per capture)")
+
+
+if os.environ.get("PRAVI_CAMERA_BACKEND", "").lower() == "mock":
+    use_mock_cameras(os.environ.get("PRAVI_MOCK_IMAGES") or None,
+                     float(os.environ.get("PRAVI_MOCK_LATENCY_MS", "0") or 0))
+else:
+    use_neo_cameras()
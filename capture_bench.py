@@ -0,0 +1,164 @@
+# capture_bench.py
+# Capture regression baseline per camera: raw acquisition, NumPy conversion and archive write
+# timed separately, sequential (one camera after the other, as the old measure_* helpers did)
+# and concurrent (all cameras at once, one thread each).
+#
+#   python capture_bench.py --iterations 50                      # real cameras (neoapi)
+#   python capture_bench.py --mock --images D:\bench_images --latency-ms 20
+#   python capture_bench.py --cameras cam3,cam4 --mode sequential --csv cap.csv --json cap.json
+#
+# Stages (ms, per camera and frame):
+#   acquire : GetImage() / mock frame fetch, no conversion
+#   convert : GetNPArray() + normalize_frame() (mock: copy out of the replay buffer)
+#   archive : synchronous PNG backup + BMP latest write into --out-dir, what the archive
+#             writer thread does per frame (off the trigger path in production)
+#   total   : the three together
+# "round" is one capture of every selected camera (sum in sequential mode, slowest in
+# concurrent mode). Run it with the line stopped: it connects and disconnects the cameras.
+
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import cv2
+
+import camera_pool
+
+STAGES = ("acquire", "convert", "archive", "total")
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _capture_once(camera, out_dir: str, archive: bool) -> dict:
+    t0 = time.perf_counter()
+    raw = camera.acquire()
+    t1 = time.perf_counter()
+    img = camera.to_array(raw)
+    t2 = time.perf_counter()
+    if archive:
+        cv2.imwrite(os.path.join(out_dir, f"{camera.name}_backup.png"), img)
+        cv2.imwrite(os.path.join(out_dir, f"{camera.name}.bmp"), img)
+    t3 = time.perf_counter()
+    return {"acquire": (t1 - t0) * 1000.0, "convert": (t2 - t1) * 1000.0,
+            "archive": (t3 - t2) * 1000.0, "total": (t3 - t0) * 1000.0}
+
+
+def run_mode(mode: str, names: list, iterations: int, out_dir: str, archive: bool) -> dict:
+    """{camera: {stage: [ms, ...]}} plus "round": {"total": [ms per round]}."""
+    cameras = [camera_pool.pool.get(name) for name in names]
+    samples = {name: {stage: [] for stage in STAGES} for name in names}
+    samples["round"] = {"total": []}
+    errors = {name: 0 for name in names}
+
+    def one(camera):
+        try:
+            for stage, ms in _capture_once(camera, out_dir, archive).items():
+                samples[camera.name][stage].append(ms)
+        except Exception as exc:
+            errors[camera.name] += 1
+            print(f"❌ {camera.name.upper()} capture error: {exc}")
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        if mode == "sequential":
+            for camera in cameras:
+                one(camera)
+        else:
+            threads = [threading.Thread(target=one, args=(camera,)) for camera in cameras]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        samples["round"]["total"].append((time.perf_counter() - start) * 1000.0)
+    samples["errors"] = errors
+    return samples
+
+
+def summarize(mode: str, samples: dict) -> list:
+    rows = []
+    for camera, stages in samples.items():
+        if camera == "errors":
+            continue
+        for stage, values in stages.items():
+            if not values:
+                continue
+            rows.append({
+                "mode": mode, "camera": camera, "stage": stage, "n": len(values),
+                "p50_ms": round(statistics.median(values), 3),
+                "p95_ms": round(_pct(values, 0.95), 3),
+                "max_ms": round(max(values), 3),
+                "mean_ms": round(statistics.fmean(values), 3),
+                "errors": samples["errors"].get(camera, 0),
+            })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-camera acquisition / conversion / archive timings")
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--mode", choices=("sequential", "concurrent", "both"), default="both")
+    ap.add_argument("--cameras", default="", help="comma list, default every configured camera")
+    ap.add_argument("--warmup", type=int, default=2, help="untimed captures per camera first")
+    ap.add_argument("--mock", action="store_true", help="MockCameras instead of neoapi")
+    ap.add_argument("--images", default="", help="mock frame folder (camN / input_backup_camN sub-folders)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="mock capture latency")
+    ap.add_argument("--no-archive", action="store_true", help="skip the archive write stage")
+    ap.add_argument("--out-dir", default="", help="archive writes go here (default: a temp dir, removed)")
+    ap.add_argument("--csv", default="")
+    ap.add_argument("--json", default="")
+    args = ap.parse_args()
+
+    if args.mock:
+        camera_pool.use_mock_cameras(args.images or None, latency_ms=args.latency_ms, preload=True)
+    names = [n.strip() for n in args.cameras.split(",") if n.strip()] or camera_pool.pool.names()
+    connected = camera_pool.pool.connect_many(names)
+    names = [name for name in names if connected.get(name)]
+    if not names:
+        print("❌ No camera connected — nothing to measure")
+        return
+
+    out_dir = args.out_dir or tempfile.mkdtemp(prefix="capture_bench_")
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        for name in names:
+            camera = camera_pool.pool.get(name)
+            for _ in range(args.warmup):
+                _capture_once(camera, out_dir, not args.no_archive)
+        modes = ("sequential", "concurrent") if args.mode == "both" else (args.mode,)
+        rows = []
+        for mode in modes:
+            rows += summarize(mode, run_mode(mode, names, args.iterations, out_dir, not args.no_archive))
+    finally:
+        camera_pool.pool.disconnect_all()
+        if not args.out_dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    print(f"\n========== Capture bench ({args.iterations} iterations) ==========")
+    for r in rows:
+        print(f"  {r['mode']:<10} {r['camera']:<6} {r['stage']:<8} p50 {r['p50_ms']:>9} "
+              f"p95 {r['p95_ms']:>9}  max {r['max_ms']:>9} ms  (n={r['n']}, errors={r['errors']})")
+    print("=================================================")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"rows": rows, "args": vars(args),
+                       "backend": {n: type(camera_pool.pool.get(n)).__name__ for n in names}}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
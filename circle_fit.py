@@ -0,0 +1,138 @@
+# circle_fit.py
+# Float centres and radii from contour points, instead of the integer moments centroid and the
+# sqrt(area / pi) radius.
+#
+#   fit_circle(points)         algebraic (Kasa) least-squares circle, one lstsq over all points
+#   fit_circle_robust(points)  RANSAC over 3-point circles, then the algebraic fit on the inliers,
+#                              so flash / burr spikes on the contour do not pull the centre
+#   fit_ellipse(points)        cv2.fitEllipse, for ovality (axes and angle)
+#   circle_props(contour)      ((cx, cy), r) for a burr zone: the robust fit, or the moments
+#                              centroid and sqrt(area / pi) when there are too few points
+#   circle_mask(...)           filled circle at a float centre/radius (cv2 fixed-point shift)
+#
+# Every fit returns a dict with float cx, cy, r (ellipse: axes, angle) and its residuals in
+# pixels (rms and max of |distance - r| over the points used), or None when there are too few
+# points. Contours should come from CHAIN_APPROX_NONE: every boundary pixel then weighs the same.
+
+import cv2
+import numpy as np
+
+MIN_FIT_POINTS = 5
+RANSAC_ITERATIONS = 64
+RANSAC_INLIER_PX = 1.5         # |distance - r| for a point to support a candidate circle
+RANSAC_SAMPLE_POINTS = 2000    # candidates are scored on at most this many points
+RANSAC_MIN_INLIERS = 0.6       # below this share of the points the contour is out of round, not
+                               # spiky: one arc would win, so all points are fitted instead
+CIRCLE_SHIFT = 4               # fractional bits for cv2.circle (1/16 px)
+
+
+def contour_points(contour):
+    """(n, 2) float64 points of a cv2 contour (or any array of x, y pairs)."""
+    return np.asarray(contour, dtype=np.float64).reshape(-1, 2)
+
+
+def _residuals(pts, cx, cy, r):
+    return np.abs(np.hypot(pts[:, 0] - cx, pts[:, 1] - cy) - r)
+
+
+def fit_circle(points):
+    """Algebraic least-squares circle: x^2 + y^2 + D x + E y + F = 0 over all points."""
+    pts = contour_points(points)
+    if len(pts) < MIN_FIT_POINTS:
+        return None
+    mean = pts.mean(axis=0)
+    p = pts - mean                               # centred for a well-conditioned system
+    a = np.column_stack((p, np.ones(len(p))))
+    b = -(p * p).sum(axis=1)
+    (d, e, f), *_ = np.linalg.lstsq(a, b, rcond=None)
+    cx, cy = -d / 2.0, -e / 2.0
+    r2 = cx * cx + cy * cy - f
+    if r2 <= 0:
+        return None
+    cx, cy, r = cx + mean[0], cy + mean[1], float(np.sqrt(r2))
+    res = _residuals(pts, cx, cy, r)
+    return {"cx": float(cx), "cy": float(cy), "r": r, "rms": float(np.sqrt((res * res).mean())),
+            "max_residual": float(res.max()), "inliers": len(pts), "n": len(pts)}
+
+
+def fit_circle_robust(points, iterations: int = RANSAC_ITERATIONS, inlier_px: float = RANSAC_INLIER_PX,
+                      seed: int = 0):
+    """RANSAC circle (all candidates scored at once), refined by fit_circle() on the inliers."""
+    pts = contour_points(points)
+    n = len(pts)
+    if n < MIN_FIT_POINTS:
+        return None
+    rng = np.random.default_rng(seed)            # fixed seed: the same contour gives the same fit
+    score_pts = pts if n <= RANSAC_SAMPLE_POINTS else pts[rng.choice(n, RANSAC_SAMPLE_POINTS, replace=False)]
+
+    # circumcircles of `iterations` random point triples, vectorized
+    idx = rng.integers(0, n, size=(iterations, 3))   # repeated points give den == 0, dropped below
+    p1, p2, p3 = pts[idx[:, 0]], pts[idx[:, 1]], pts[idx[:, 2]]
+    ax, ay = p1[:, 0], p1[:, 1]
+    bx, by = p2[:, 0], p2[:, 1]
+    cx3, cy3 = p3[:, 0], p3[:, 1]
+    den = 2.0 * (ax * (by - cy3) + bx * (cy3 - ay) + cx3 * (ay - by))
+    ok = np.abs(den) > 1e-9
+    if not ok.any():
+        return fit_circle(pts)
+    a2, b2, c2 = ax * ax + ay * ay, bx * bx + by * by, cx3 * cx3 + cy3 * cy3
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ux = (a2 * (by - cy3) + b2 * (cy3 - ay) + c2 * (ay - by)) / den
+        uy = (a2 * (cx3 - bx) + b2 * (ax - cx3) + c2 * (bx - ax)) / den
+    ux, uy = ux[ok], uy[ok]
+    ur = np.hypot(ax[ok] - ux, ay[ok] - uy)
+
+    # inlier count per candidate: (candidates, points)
+    dist = np.hypot(score_pts[None, :, 0] - ux[:, None], score_pts[None, :, 1] - uy[:, None])
+    support = (np.abs(dist - ur[:, None]) <= inlier_px).sum(axis=1)
+    best = int(np.argmax(support))
+
+    inliers = pts[_residuals(pts, ux[best], uy[best], ur[best]) <= inlier_px]
+    if len(inliers) < max(MIN_FIT_POINTS, RANSAC_MIN_INLIERS * n):
+        return fit_circle(pts)
+    fit = fit_circle(inliers)
+    if fit is None:
+        return fit_circle(pts)
+    fit["n"] = n
+    return fit
+
+
+def fit_ellipse(points):
+    """cv2.fitEllipse: float centre, full axes (major >= minor), angle in degrees, and residuals."""
+    pts = contour_points(points)
+    if len(pts) < MIN_FIT_POINTS:
+        return None
+    (cx, cy), (w, h), angle = cv2.fitEllipse(pts.astype(np.float32))
+    a, b = w / 2.0, h / 2.0
+    if a <= 0 or b <= 0:
+        return None
+    t = np.deg2rad(angle)
+    dx, dy = pts[:, 0] - cx, pts[:, 1] - cy
+    u = dx * np.cos(t) + dy * np.sin(t)          # into the ellipse frame
+    v = -dx * np.sin(t) + dy * np.cos(t)
+    # first-order distance to the ellipse: (normalized radius - 1) * local radius
+    rho = np.hypot(u / a, v / b)
+    res = np.abs(rho - 1.0) * np.hypot(u, v) / np.maximum(rho, 1e-9)
+    return {"cx": float(cx), "cy": float(cy), "major": float(max(w, h)), "minor": float(min(w, h)),
+            "angle": float(angle), "rms": float(np.sqrt((res * res).mean())),
+            "max_residual": float(res.max()), "n": len(pts)}
+
+
+def circle_props(contour):
+    """Float ((cx, cy), r) of a contour: fit_circle_robust(), moments / area as the fallback."""
+    fit = fit_circle_robust(contour)
+    if fit is not None:
+        return (fit["cx"], fit["cy"]), fit["r"]
+    m = cv2.moments(contour)
+    if m["m00"] == 0:
+        x, y = contour_points(contour)[0]
+        return (float(x), float(y)), 0.0
+    return (m["m10"] / m["m00"], m["m01"] / m["m00"]), float(np.sqrt(abs(m["m00"]) / np.pi))
+
+
+def circle_mask(img, center, radius: float, color=255):
+    """Filled circle at a float centre/radius, drawn with CIRCLE_SHIFT fractional bits."""
+    scale = 1 << CIRCLE_SHIFT
+    cv2.circle(img, (int(round(center[0] * scale)), int(round(center[1] * scale))),
+               max(0, int(round(radius * scale))), color, cv2.FILLED, cv2.LINE_8, CIRCLE_SHIFT)
+    return img
@@ -0,0 +1,77 @@
+# controller_protocol.py
+# Framing helpers for the PLC/controller link ("pravi commands.txt").
+# Every message on the wire is "$<BODY>#", optionally followed by CR/LF.
+# TCP gives us a byte stream, so one recv() can hold several messages
+# ("$C1#$STP#") or only half of one ("$C" ... "1#"). FrameParser keeps the
+# partial tail between reads and returns every complete frame in order.
+
+FRAME_START = "$"
+FRAME_END = "#"
+
+
+class FrameParser:
+    """Incremental `$...#` frame parser with a bounded carry-over buffer."""
+
+    def __init__(self, max_frame_len: int = 256):
+        self.max_frame_len = max_frame_len
+        self._buffer = ""
+        self.dropped_bytes = 0  # noise outside frames / oversized frames
+
+    def feed(self, data) -> list:
+        """Add received bytes/str and return the list of complete frames (e.g. ["$C1#", "$STP#"])."""
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode(errors="ignore")
+        self._buffer += data
+
+        frames = []
+        while True:
+            start = self._buffer.find(FRAME_START)
+            if start < 0:
+                # no frame started — everything buffered is line noise (CR/LF etc.)
+                self.dropped_bytes += len(self._buffer.strip())
+                self._buffer = ""
+                break
+            if start > 0:
+                self.dropped_bytes += len(self._buffer[:start].strip())
+                self._buffer = self._buffer[start:]
+
+            end = self._buffer.find(FRAME_END, 1)
+            if end < 0:
+                # incomplete frame: keep it for the next read unless it is runaway garbage
+                if len(self._buffer) > self.max_frame_len:
+                    self.dropped_bytes += len(self._buffer)
+                    self._buffer = ""
+                break
+
+            # A second "$" before the "#" means the first frame was truncated; resync on it.
+            restart = self._buffer.find(FRAME_START, 1, end)
+            if restart > 0:
+                self.dropped_bytes += restart
+                self._buffer = self._buffer[restart:]
+                continue
+
+            frames.append(self._buffer[:end + 1])
+            self._buffer = self._buffer[end + 1:]
+        return frames
+
+    def pending(self) -> str:
+        """Partial frame currently held in the buffer (for diagnostics)."""
+        return self._buffer
+
+    def reset(self):
+        self._buffer = ""
+
+
+def frame_body(frame: str) -> str:
+    """'$ACK_CAM1_HT#' -> 'ACK_CAM1_HT', '$CAM1_HT=12#' -> 'CAM1_HT=12'."""
+    return frame.strip().strip("\r\n").lstrip(FRAME_START).rstrip(FRAME_END)
+
+
+def frame_key(frame: str) -> str:
+    """Message type used for dispatch: '$CAM1_HT=12#' -> 'CAM1_HT', '$C1#' -> 'C1'."""
+    return frame_body(frame).split("=", 1)[0]
+
+
+def ack_for(frame: str) -> str:
+    """ACK frame the controller/PC expects in reply: '$C1#' -> '$ACK_C1#'."""
+    return f"$ACK_{frame_key(frame)}#"
@@ -0,0 +1,336 @@
+# controller_sim.py
+# Local stand-in for the PLC/controller so tcp_client can be exercised without the machine.
+# Speaks the "pravi commands.txt" protocol:
+#   PC -> controller : $KEY=value#  -> $ACK_KEY#     (recipe download)
+#                      $STR#        -> $ACK_STR#     (then $C1# triggers start)
+#                      $OK# / $NOK# -> $ACK_OK# / $ACK_NOK#  (verdict, latency recorded)
+#   controller -> PC : $C1# at the configured parts-per-minute, $STP# on stop()
+#                      $C2#/$C3#/$C4# per part after `station_delays` (index travel time)
+#
+# Run standalone:  python controller_sim.py --port 8888 --ppm 60 --jitter 0.1
+# then point tcp_client.CONTROLLER_IP / CONTROLLER_PORT at it.
+
+import argparse
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from controller_protocol import FrameParser, frame_key, ack_for
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class ControllerSimulator:
+    """
+    asyncio TCP server that behaves like the controller for one PC connection at a time.
+
+    ppm           : nominal parts per minute ($C1# rate)
+    jitter        : +/- fraction of the pitch applied randomly to every gap (0.1 = 10 %)
+    burst_every   : every N parts, emit `burst_size` triggers `burst_gap_ms` apart (0 = off)
+    verdict_timeout: a trigger without $OK#/$NOK# after this many seconds counts as dropped
+    station_delays: seconds from station n-1 to station n for $C2#, $C3#, $C4# (None = not sent)
+    debounce_ms   : the PC's $C1# debounce; triggers closer than this to the previous accepted
+                    one are counted as "suppressed" and not waited for, so verdicts stay paired
+                    with the right trigger (verdicts are matched to triggers in FIFO order)
+    """
+
+    def __init__(self, host="127.0.0.1", port=8888, ppm=60.0, jitter=0.0,
+                 burst_every=0, burst_size=2, burst_gap_ms=50.0,
+                 verdict_timeout=10.0, debounce_ms=0.0, ack_delay_ms=0.0,
+                 station_delays=None, seed=None):
+        self.host = host
+        self.port = port
+        self.ppm = float(ppm)
+        self.jitter = float(jitter)
+        self.burst_every = int(burst_every)
+        self.burst_size = int(burst_size)
+        self.burst_gap_ms = float(burst_gap_ms)
+        self.verdict_timeout = float(verdict_timeout)
+        self.debounce_ms = float(debounce_ms)
+        self.station_delays = [float(d) for d in station_delays] if station_delays else []
+        self._downstream = set()
+        self.ack_delay_ms = float(ack_delay_ms)
+        self._rng = random.Random(seed)
+
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._writer = None
+        self._trigger_task = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+        self.reset_stats()
+
+    # ---- statistics ----
+    def reset_stats(self):
+        with self._lock:
+            self.params = {}             # "CAM1_HT" -> "12" as last downloaded
+            self.started_at = None       # perf_counter at $ACK_STR#
+            self.triggers_sent = 0
+            self.suppressed = 0
+            self._last_accepted = None   # perf_counter of the last trigger outside the debounce
+            self.verdicts = []           # (code, latency_ms)
+            self.dropped = 0
+            self.unexpected_verdicts = 0
+            self.last_verdict_at = None
+            self._outstanding = deque()  # perf_counter of triggers waiting for a verdict
+
+    def _expire_outstanding(self, now):
+        while self._outstanding and now - self._outstanding[0] > self.verdict_timeout:
+            self._outstanding.popleft()
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        """Summary of the run so far: rate, dropped triggers and verdict latency percentiles."""
+        with self._lock:
+            now = time.perf_counter()
+            self._expire_outstanding(now)
+            lat = [ms for _, ms in self.verdicts]
+            elapsed = (now - self.started_at) if self.started_at else 0.0
+            # sustained rate is taken up to the last verdict, so a drain period does not dilute it
+            span = (self.last_verdict_at - self.started_at) if self.last_verdict_at else 0.0
+            return {
+                "elapsed_s": round(elapsed, 3),
+                "triggers": self.triggers_sent,
+                "verdicts": len(self.verdicts),
+                "ok": sum(1 for code, _ in self.verdicts if code == "OK"),
+                "nok": sum(1 for code, _ in self.verdicts if code == "NOK"),
+                "suppressed": self.suppressed,
+                "dropped": self.dropped,
+                "in_flight": len(self._outstanding),
+                "unexpected_verdicts": self.unexpected_verdicts,
+                "parts_per_min": round(len(self.verdicts) / span * 60.0, 2) if span > 0 else 0.0,
+                "latency_ms": {
+                    "p50": round(percentile(lat, 50), 2),
+                    "p95": round(percentile(lat, 95), 2),
+                    "p99": round(percentile(lat, 99), 2),
+                    "max": round(max(lat), 2) if lat else 0.0,
+                },
+            }
+
+    # ---- wire ----
+    async def _send(self, msg: str):
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            return
+        writer.write((msg + "\r\n").encode())
+        await writer.drain()
+
+    async def _reply(self, msg: str):
+        if self.ack_delay_ms > 0:
+            await asyncio.sleep(self.ack_delay_ms / 1000.0)
+        await self._send(msg)
+
+    def _on_verdict(self, code: str):
+        now = time.perf_counter()
+        with self._lock:
+            self._expire_outstanding(now)
+            if not self._outstanding:
+                self.unexpected_verdicts += 1
+                return
+            t_trigger = self._outstanding.popleft()
+            self.verdicts.append((code, (now - t_trigger) * 1000.0))
+            self.last_verdict_at = now
+
+    async def _handle_frame(self, frame: str):
+        key = frame_key(frame)
+        if key.startswith("ACK_"):
+            return  # PC acknowledging our $C1# / $STP#
+        if key in ("OK", "NOK"):
+            self._on_verdict(key)
+            await self._reply(ack_for(frame))
+            return
+        if key == "STR":
+            await self._reply(ack_for(frame))
+            self._start_triggers()
+            return
+        if key == "STP":
+            await self._reply(ack_for(frame))
+            self._stop_triggers()
+            return
+        body = frame.strip("$#\r\n ")
+        if "=" in body:
+            with self._lock:
+                self.params[key] = body.split("=", 1)[1]
+        await self._reply(ack_for(frame))
+
+    async def _handle_client(self, reader, writer):
+        if self._writer is not None and not self._writer.is_closing():
+            # the real controller serves one PC; extra connections (fallback STP) are drained
+            parser = FrameParser()
+            while data := await reader.read(1024):
+                for frame in parser.feed(data):
+                    if frame_key(frame) == "STP":
+                        self._stop_triggers()
+            writer.close()
+            return
+
+        self._writer = writer
+        parser = FrameParser()
+        try:
+            while data := await reader.read(1024):
+                for frame in parser.feed(data):
+                    await self._handle_frame(frame)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._stop_triggers()
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+
+    # ---- trigger generator ----
+    def _next_gap(self) -> float:
+        pitch = 60.0 / self.ppm if self.ppm > 0 else 1.0
+        if self.jitter:
+            pitch *= 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, pitch)
+
+    async def _trigger_loop(self):
+        with self._lock:
+            self.started_at = time.perf_counter()
+        next_at = time.perf_counter() + self._next_gap()
+        part = 0
+        while True:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            count = 1
+            if self.burst_every and (part + 1) % self.burst_every == 0:
+                count = max(1, self.burst_size)
+            for i in range(count):
+                with self._lock:
+                    now = time.perf_counter()
+                    self.triggers_sent += 1
+                    accepted = not (self._last_accepted is not None
+                                    and (now - self._last_accepted) * 1000.0 < self.debounce_ms)
+                    if accepted:
+                        self._last_accepted = now
+                        self._outstanding.append(now)
+                    else:
+                        self.suppressed += 1
+                await self._send("$C1#")
+                if accepted and self.station_delays:
+                    task = asyncio.get_running_loop().create_task(self._station_triggers())
+                    self._downstream.add(task)
+                    task.add_done_callback(self._downstream.discard)
+                part += 1
+                if i + 1 < count:
+                    await asyncio.sleep(self.burst_gap_ms / 1000.0)
+            next_at += self._next_gap()
+
+    async def _station_triggers(self):
+        # the part indexes on: $C2# after station_delays[0], $C3# after [1] more, ...
+        for n, delay in enumerate(self.station_delays[:3], start=2):
+            if self.jitter:
+                delay *= 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(max(0.0, delay))
+            await self._send(f"$C{n}#")
+
+    def _start_triggers(self):
+        if self._trigger_task is None or self._trigger_task.done():
+            self._trigger_task = asyncio.get_running_loop().create_task(self._trigger_loop())
+
+    def _stop_triggers(self, downstream: bool = True):
+        if self._trigger_task is not None:
+            self._trigger_task.cancel()
+            self._trigger_task = None
+        if downstream:
+            for task in list(self._downstream):
+                task.cancel()
+
+    # ---- lifecycle ----
+    async def _main(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # resolves port=0
+        print(f"🧪 Controller simulator listening on {self.host}:{self.port} ({self.ppm} ppm)")
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Run the server in a daemon thread; returns once it is listening."""
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self._main())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self
+
+    def hold(self):
+        """Stop emitting $C1# but keep the connection (lets in-flight parts finish)."""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stop_triggers, False)
+
+    def send_stop(self):
+        """Stop triggering and send $STP# to the connected PC (like the operator pressing stop)."""
+        loop = self._loop
+        if loop is None:
+            return
+
+        async def _stop():
+            self._stop_triggers()
+            await self._send("$STP#")
+
+        asyncio.run_coroutine_threadsafe(_stop(), loop).result(5.0)
+
+    def close(self):
+        loop = self._loop
+        if loop is None:
+            return
+
+        def _shutdown():
+            self._stop_triggers()
+            if self._server is not None:
+                self._server.close()
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+
+        loop.call_soon_threadsafe(_shutdown)
+        if self._thread is not None:
+            self._thread.join(5.0)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local PLC/controller simulator")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8888)
+    ap.add_argument("--ppm", type=float, default=60.0, help="parts per minute")
+    ap.add_argument("--jitter", type=float, default=0.0, help="+/- fraction of the pitch")
+    ap.add_argument("--burst-every", type=int, default=0)
+    ap.add_argument("--burst-size", type=int, default=2)
+    ap.add_argument("--burst-gap-ms", type=float, default=50.0)
+    ap.add_argument("--debounce-ms", type=float, default=200.0, help="PC-side $C1# debounce")
+    ap.add_argument("--station-delays", default="", help="s between stations for $C2#..$C4#, e.g. 0.4,0.4,0.4")
+    ap.add_argument("--ack-delay-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    sim = ControllerSimulator(args.host, args.port, ppm=args.ppm, jitter=args.jitter,
+                              burst_every=args.burst_every, burst_size=args.burst_size,
+                              burst_gap_ms=args.burst_gap_ms, debounce_ms=args.debounce_ms,
+                              ack_delay_ms=args.ack_delay_ms,
+                              station_delays=[float(d) for d in args.station_delays.split(",") if d]
+                              ).start()
+    try:
+        while True:
+            time.sleep(5.0)
+            print(sim.stats())
+    except KeyboardInterrupt:
+        sim.close()
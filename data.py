@@ -102,6 +102,8 @@ StaticData = {
 
 
 Frames = {"Cam1frame": "", "Cam2frame": "", "Cam3frame": "", "Cam4frame": ""}
+# sensor ROI / binning of each frame (frame_utils.FrameGeometry), set at capture
+Geometry = {"Cam1frame": None, "Cam2frame": None, "Cam3frame": None, "Cam4frame": None}
 
 # Initialize result dictionary
 result = {
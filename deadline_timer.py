@@ -0,0 +1,172 @@
+# deadline_timer.py
+# One shared high-resolution timer thread for every scheduled capture on the line.
+#
+# Deadlines live in a single heap (time.perf_counter() clock — time.monotonic() only ticks
+# every ~15.6 ms on Windows). The timer thread parks on a Condition while the next deadline is
+# far away, sleeps in short slices once it is within COARSE_WINDOW, and busy-waits for the last
+# SPIN_WINDOW so the callback fires within a few microseconds of the deadline no matter how many
+# parts are in flight. Callbacks run on the timer thread and must only hand work off (e.g.
+# release a job to a station worker); they must never block.
+#
+# Every firing records (actual - scheduled) into a JitterHistogram per label.
+
+import heapq
+import itertools
+import threading
+import time
+
+COARSE_WINDOW = 0.020   # s before the deadline where Condition.wait is replaced by short sleeps
+SPIN_WINDOW = 0.001     # s before the deadline where the thread busy-waits
+
+now = time.perf_counter   # the clock every deadline handed to DeadlineTimer must use
+
+
+class JitterHistogram:
+    """Counts of timing errors in fixed microsecond buckets, plus mean/max and percentiles."""
+
+    EDGES_US = (10, 25, 50, 100, 250, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES_US) + 1)
+        self.early = 0
+        self.n = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, error_s: float):
+        us = error_s * 1e6
+        self.n += 1
+        if us < 0:
+            self.early += 1
+            us = 0.0
+        self.total_us += us
+        self.max_us = max(self.max_us, us)
+        for i, edge in enumerate(self.EDGES_US):
+            if us <= edge:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def _percentile_us(self, pct: float) -> float:
+        # upper bucket edge containing the pct-th sample
+        target = pct / 100.0 * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if c and acc >= target:
+                return float(self.EDGES_US[i]) if i < len(self.EDGES_US) else self.max_us
+        return 0.0
+
+    def to_dict(self) -> dict:
+        labels = [f"<={e}us" for e in self.EDGES_US] + [f">{self.EDGES_US[-1]}us"]
+        return {
+            "count": self.n,
+            "early": self.early,
+            "mean_us": round(self.total_us / self.n, 1) if self.n else 0.0,
+            "max_us": round(self.max_us, 1),
+            "p50_us": self._percentile_us(50),
+            "p99_us": self._percentile_us(99),
+            "buckets": {label: c for label, c in zip(labels, self.counts) if c},
+        }
+
+
+class DeadlineTimer:
+    """Single-thread deadline scheduler: schedule(deadline, callback, *args, label=, owner=)."""
+
+    def __init__(self, name: str = "timer", spin_window: float = SPIN_WINDOW,
+                 coarse_window: float = COARSE_WINDOW):
+        self.name = name
+        self.spin_window = float(spin_window)
+        self.coarse_window = max(float(coarse_window), self.spin_window)
+        self._cond = threading.Condition()
+        self._heap = []           # (deadline, seq, label, owner, callback, args)
+        self._seq = itertools.count()
+        self._thread = None
+        self._hist = {}           # label -> JitterHistogram
+        self._hist_lock = threading.Lock()
+        self.fired = 0
+        self.cancelled = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-timer", daemon=True)
+        self._thread.start()
+        return self
+
+    def schedule(self, deadline: float, callback, *args, label: str = "", owner=None):
+        """Call callback(*args) at `deadline` (perf_counter seconds). Returns the entry seq."""
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (deadline, seq, label, owner, callback, args))
+            if self._heap[0][1] == seq:
+                self._cond.notify()   # new earliest deadline
+        return seq
+
+    def cancel(self, owner=None) -> int:
+        """Drop pending entries belonging to `owner` (all entries when owner is None)."""
+        with self._cond:
+            keep = [e for e in self._heap if owner is not None and e[3] is not owner]
+            dropped = len(self._heap) - len(keep)
+            heapq.heapify(keep)
+            self._heap = keep
+            self.cancelled += dropped
+            self._cond.notify()
+        return dropped
+
+    def pending(self, owner=None) -> int:
+        with self._cond:
+            return sum(1 for e in self._heap if owner is None or e[3] is owner)
+
+    def record(self, label: str, error_s: float):
+        with self._hist_lock:
+            self._hist.setdefault(label, JitterHistogram()).record(error_s)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                deadline = self._heap[0][0]
+                remaining = deadline - now()
+                if remaining > self.coarse_window:
+                    # far away: park, but wake up for new earlier deadlines
+                    self._cond.wait(remaining - self.coarse_window)
+                    continue
+
+            if remaining > self.spin_window:
+                # close: short sleeps, then re-check the heap for earlier entries
+                time.sleep(min(remaining - self.spin_window, 0.001))
+                continue
+
+            # last stretch: busy-wait (keeps the GIL for at most spin_window)
+            while now() < deadline:
+                pass
+
+            due = []
+            with self._cond:
+                t = now()
+                while self._heap and self._heap[0][0] <= t:
+                    due.append(heapq.heappop(self._heap))
+
+            for entry_deadline, _, label, _, callback, args in due:
+                self.record(label or "timer", now() - entry_deadline)
+                self.fired += 1
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"❌ {self.name} timer callback {label} failed: {e}")
+
+    def status(self) -> dict:
+        with self._hist_lock:
+            hist = {label: h.to_dict() for label, h in sorted(self._hist.items())}
+        return {
+            "pending": self.pending(),
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "spin_window_ms": self.spin_window * 1000.0,
+            "fire_error": hist,
+        }
@@ -27,45 +27,60 @@ DEFECT_BOX_COLOR = (0, 0, 255)
 import cv2
 import numpy as np
 import math
+from frame_utils import FrameAnalysis, ScratchPool, to_bgr
+import radial_profile
+import circle_fit
+import artifacts
+from image_writer import write_async, write_latest
 from datetime import datetime
 import os
 import time
 
 ENABLE_TIMING = True
 
+ID_OD_THRESHOLD = 190      # binarization for the ID/OD contours (and their edge level)
+ORIFICE_THRESHOLD = 180
+RING_PAD_PX = 4            # margin around a flash ring's bounding box (keeps its edge off the mask border)
+# Pixel limits below are tuned on full-sensor (unbinned) frames; station1 scales them through
+# FrameGeometry when the camera bins.
+FLASH_MAX_PERIMETER_PX = 40     # a flash blob with a longer perimeter is the ring edge, not flash
+ORIFICE_MIN_AREA_PX = 500       # smallest contour considered as the orifice
+
+_masks = ScratchPool()     # flash ring masks, reused part after part
+
 # ============ 1. Preprocessing Function ============
-def preprocess_image(frame, output_folder=None):
+def preprocess_image(frame, output_folder=None, analysis=None):
     if ENABLE_TIMING:
         start_time = time.time()
 
     if output_folder:
         os.makedirs(output_folder, exist_ok=True)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 190, 255, cv2.THRESH_BINARY)
-    contours, _ = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
+    analysis = analysis or FrameAnalysis(frame)
+    gray = analysis.gray
+    contours = analysis.by_area(ID_OD_THRESHOLD)
 
     # Take next two largest after the biggest (often background)
-    sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)[1:3] if len(contours) > 1 else []
+    sorted_contours = contours[1:3] if len(contours) > 1 else []
 
-    contour_image = frame.copy()
-    cv2.drawContours(contour_image, sorted_contours, -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
-    if output_folder:
-        cv2.imwrite(os.path.join(output_folder, 'contours.bmp'), contour_image)
+    if output_folder and artifacts.debug():
+        contour_image = to_bgr(frame)
+        cv2.drawContours(contour_image, sorted_contours, -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
+        write_async(os.path.join(output_folder, 'contours.bmp'), contour_image)
 
     if ENABLE_TIMING:
         elapsed = (time.time() - start_time) * 1000
         print(f"[preprocess_image] Time: {elapsed:.2f} ms")
 
     return {
-        "image": frame.copy(),
+        "image": frame,
         "sorted_contours": sorted_contours,
         "original_gray": gray
     }
 
 # =========== 2. ID/OD Measurement ===========
 def id_od_dimension(frame, sorted_contours, id_min=None, id_max=None, od_min=None, od_max=None,
-                    pixel_to_micron_id=None, pixel_to_micron_od=None):
+                    pixel_to_micron_id=None, pixel_to_micron_od=None, analysis=None):
     if ENABLE_TIMING:
         start_time = time.time()
 
@@ -73,30 +88,18 @@ def id_od_dimension(frame, sorted_contours, id_min=None, id_max=None, od_min=Non
         raise ValueError("Not enough contours found for ID/OD measurement")
 
     od_contour, id_contour = sorted_contours[0], sorted_contours[1]
+    analysis = analysis or FrameAnalysis(frame)
 
-    def get_center(contour):
-        M = cv2.moments(contour)
-        if M["m00"] == 0:
-            return (0, 0)
-        return (int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"]))
-
-    center_x_od, center_y_od = get_center(od_contour)
-    center_x_id, center_y_id = get_center(id_contour)
-
-    radius_od = int(np.sqrt(cv2.contourArea(od_contour) / np.pi))
-    radius_id = int(np.sqrt(cv2.contourArea(id_contour) / np.pi))
-
-    def get_avg_diameter(center_x, center_y, radius):
-        diameters = []
-        for angle in range(0, 360, 10):
-            rad = math.radians(angle)
-            pt1 = (int(center_x + radius * math.cos(rad)), int(center_y + radius * math.sin(rad)))
-            pt2 = (int(center_x - radius * math.cos(rad)), int(center_y - radius * math.sin(rad)))
-            diameters.append(math.hypot(pt2[0] - pt1[0], pt2[1] - pt1[1]))
-        return sum(diameters) / len(diameters)
+    # float centres and radii from a robust circle fit on the contour points
+    od_fit = _circle(od_contour)
+    id_fit = _circle(id_contour)
+    center_x_od, center_y_od, radius_od = od_fit["cx"], od_fit["cy"], od_fit["r"]
+    center_x_id, center_y_id, radius_id = id_fit["cx"], id_fit["cy"], id_fit["r"]
 
-    diameter_od = get_avg_diameter(center_x_od, center_y_od, radius_od)
-    diameter_id = get_avg_diameter(center_x_id, center_y_id, radius_id)
+    od_profile = _edge_profile(analysis, od_fit, ID_OD_THRESHOLD)
+    id_profile = _edge_profile(analysis, id_fit, ID_OD_THRESHOLD)
+    diameter_od = od_profile["mean"]
+    diameter_id = id_profile["mean"]
 
     diameter_od_mm = (diameter_od * pixel_to_micron_od) / 1000.0
     diameter_id_mm = (diameter_id * pixel_to_micron_id) / 1000.0
@@ -122,9 +125,39 @@ def id_od_dimension(frame, sorted_contours, id_min=None, id_max=None, od_min=Non
         "id_contour": id_contour,
         "od_contour": od_contour,
         "radius_od": radius_od,
-        "radius_id": radius_id
+        "radius_id": radius_id,
+        "od_profile": od_profile,
+        "id_profile": id_profile,
+        "od_fit": od_fit,
+        "id_fit": id_fit
     }
 
+def _circle(contour):
+    """Robust circle fit of the contour; moments centroid and area radius when the fit fails."""
+    fit = circle_fit.fit_circle_robust(contour)
+    if fit is None:
+        m = cv2.moments(contour)
+        cx, cy = (m["m10"] / m["m00"], m["m01"] / m["m00"]) if m["m00"] != 0 else (0.0, 0.0)
+        fit = {"cx": cx, "cy": cy, "r": math.sqrt(cv2.contourArea(contour) / math.pi),
+               "rms": None, "max_residual": None, "inliers": 0, "n": len(contour)}
+    return fit
+
+def _centroid(contour):
+    """Integer centroid, or None for a zero-area contour."""
+    m = cv2.moments(contour)
+    if m["m00"] == 0:
+        return None
+    return int(m["m10"] / m["m00"]), int(m["m01"] / m["m00"])
+
+def _edge_profile(analysis, fit, level):
+    """Diameter profile (px) from the polar-unwrapped edge; 2r of the fit if the edge is not found."""
+    profile = radial_profile.diameter_profile(analysis.gray, (fit["cx"], fit["cy"]), fit["r"], level)
+    if profile is None:
+        print("Edge profile not found, using the fitted diameter")
+        d = 2.0 * fit["r"]
+        profile = {"mean": d, "min": d, "max": d, "ovality": 0.0, "valid": 0.0}
+    return profile
+
 # =========== 3. Concentricity Measurement ===========
 def concentricity(center_x_od, center_y_od, center_x_id, center_y_id, concentricity_max=None, pixel_to_micron=None):
     if ENABLE_TIMING:
@@ -143,81 +176,98 @@ def concentricity(center_x_od, center_y_od, center_x_id, center_y_id, concentric
     }
 
 # =========== 4. Flash (Defect) Detection ===========
-def flash_detection(frame, id_contour, od_contour, threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder=None):
+def _ring_box(shape, contour, center, radius):
+    """Frame rectangle (x, y, w, h) holding `contour` and the circle of `radius` around `center`, padded."""
+    x, y, w, h = cv2.boundingRect(contour)
+    cx, cy = center
+    radius = max(0, radius)
+    x1 = max(0, min(x, cx - radius) - RING_PAD_PX)
+    y1 = max(0, min(y, cy - radius) - RING_PAD_PX)
+    x2 = min(shape[1], max(x + w, cx + radius + 1) + RING_PAD_PX)
+    y2 = min(shape[0], max(y + h, cy + radius + 1) + RING_PAD_PX)
+    return x1, y1, max(1, x2 - x1), max(1, y2 - y1)
+
+def _ring_mask(slot, box, contour, center, radius):
+    """Box-local mask: the contour points and the filled circle, as the full-frame masks were drawn."""
+    x0, y0, w, h = box
+    mask = _masks.take(slot, h, w)
+    cv2.drawContours(mask, contour, -1, 255, thickness=cv2.FILLED, offset=(-x0, -y0))
+    cv2.circle(mask, (center[0] - x0, center[1] - y0), radius, 255, thickness=cv2.FILLED)
+    return mask
+
+def flash_detection(frame, id_contour, od_contour, threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder=None,
+                    analysis=None, max_flash_perimeter=FLASH_MAX_PERIMETER_PX):
     if ENABLE_TIMING:
         start_time = time.time()
 
     fod_found = 0
     fid_found = 0
-    img = frame.copy()
-    gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, binary_image = cv2.threshold(gray_img, 128, 255, cv2.THRESH_BINARY)
-
-    if output_folder:
-        cv2.imwrite(os.path.join(output_folder, "02_binary_threshold_ID.bmp"), binary_image)
-
-    contours, _ = cv2.findContours(binary_image, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
-    all_contours_img = img.copy()
-    cv2.drawContours(all_contours_img, contours, -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
+    analysis = analysis or FrameAnalysis(frame)
+    # annotated output (flash_marked_image), only when result images are drawn; processing stays mono
+    img = to_bgr(frame) if artifacts.annotate() else None
+    debug = img is not None and artifacts.debug()     # tuning canvases below
+    roi_id_od = None
+    gray_img = analysis.gray
+    binary_image = analysis.binary(128)
+
+    if output_folder and debug:
+        write_async(os.path.join(output_folder, "02_binary_threshold_ID.bmp"), binary_image)
+
+    contours = analysis.contours(128)
+    if debug:
+        all_contours_img = img.copy()
+        cv2.drawContours(all_contours_img, contours, -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
 
     if contours and len(contours) > 1:
-        sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)[1:3]
-        sorted_contours_img = img.copy()
-        for i, contour in enumerate(sorted_contours):
-            cv2.drawContours(sorted_contours_img, [contour], -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
-            M = cv2.moments(contour)
-            if M["m00"] != 0:
-                cx = int(M["m10"] / M["m00"])
-                cy = int(M["m01"] / M["m00"])
-                cv2.putText(sorted_contours_img, f"Contour {i}", (cx-30, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        sorted_contours = analysis.by_area(128)[1:3]
+        if debug:
+            sorted_contours_img = img.copy()
+            for i, contour in enumerate(sorted_contours):
+                cv2.drawContours(sorted_contours_img, [contour], -1, PREPROCESS_CONTOUR_COLOR, CONTOUR_THICKNESS)
+                center = _centroid(contour)
+                if center is not None:
+                    cx, cy = center
+                    cv2.putText(sorted_contours_img, f"Contour {i}", (cx-30, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         # Re-derive centers/radii for ID ring masks
         od_contours = sorted_contours[0]
         id_contours = sorted_contours[1]
 
-        M = cv2.moments(id_contours)
-        if M["m00"] != 0:
-            id_center_x = int(M["m10"] / M["m00"])
-            id_center_y = int(M["m01"] / M["m00"])
+        id_center = _centroid(id_contours)
+        if id_center is not None:
+            id_center_x, id_center_y = id_center
             id1_radius = int(np.sqrt(cv2.contourArea(id_contours) / np.pi))
-
-            id1_mask = np.zeros_like(gray_img)
-            cv2.drawContours(id1_mask, id_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(id1_mask, (id_center_x, id_center_y), id1_radius, 255, thickness=cv2.FILLED)
-
-            id2_mask = np.zeros_like(gray_img)
             id2_radius = id1_radius - (threshold_id2 if threshold_id2 is not None else 0)
-            cv2.drawContours(id2_mask, id_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(id2_mask, (id_center_x, id_center_y), id2_radius, 255, thickness=cv2.FILLED)
-            id2_ring_mask = cv2.subtract(id1_mask, id2_mask)
-
-            id3_mask = np.zeros_like(gray_img)
             id3_radius = id2_radius + (threshold_id3 if threshold_id3 is not None else 0)
-            cv2.drawContours(id3_mask, id_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(id3_mask, (id_center_x, id_center_y), id3_radius, 255, thickness=cv2.FILLED)
-            id3_ring_mask = cv2.subtract(id3_mask, id2_mask)
 
-            id3_mask_img = cv2.cvtColor(id3_ring_mask, cv2.COLOR_GRAY2BGR)
-            gray = cv2.cvtColor(id3_mask_img, cv2.COLOR_BGR2GRAY)
-            id3_ring_mask_contours, _ = cv2.findContours(gray, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+            # ring masks only span the ring's bounding box; contours come back in frame coordinates
+            box = _ring_box(gray_img.shape, id_contours, id_center, max(id2_radius, id3_radius))
+            id2_mask = _ring_mask("ring2", box, id_contours, id_center, id2_radius)
+            id3_ring_mask = _ring_mask("ring3", box, id_contours, id_center, id3_radius)
+            cv2.subtract(id3_ring_mask, id2_mask, dst=id3_ring_mask)
 
-            roi_id_od = img.copy()
-            cv2.drawContours(roi_id_od, id3_ring_mask_contours, -1, ID_CONTOUR_COLOR, CONTOUR_THICKNESS)
+            id3_ring_mask_contours, _ = cv2.findContours(id3_ring_mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE,
+                                                         offset=box[:2])
+
+            if debug:
+                roi_id_od = img.copy()
+                cv2.drawContours(roi_id_od, id3_ring_mask_contours, -1, ID_CONTOUR_COLOR, CONTOUR_THICKNESS)
 
             id_sorted_flash_contour_lst = []
             for (i, c) in enumerate(id3_ring_mask_contours):
                 id_perimeter = cv2.arcLength(c, True)
                 print("Contour #{} --id_perimeter: {:.2f}".format(i + 1, id_perimeter))
-                if id_perimeter < 40:
+                if id_perimeter < max_flash_perimeter:
                     id_sorted_flash_contour_lst.append(c)
                     fid_found = 1
 
-            id_flash_contours_img = img.copy()
-            cv2.drawContours(id_flash_contours_img, id_sorted_flash_contour_lst, -1, DEFECT_CONTOUR_COLOR_ID, CONTOUR_THICKNESS)
-            if output_folder:
-                cv2.imwrite(os.path.join(output_folder, '08_id_flash_contours.bmp'), id_flash_contours_img)
+            if debug:
+                id_flash_contours_img = img.copy()
+                cv2.drawContours(id_flash_contours_img, id_sorted_flash_contour_lst, -1, DEFECT_CONTOUR_COLOR_ID, CONTOUR_THICKNESS)
+                if output_folder:
+                    write_async(os.path.join(output_folder, '08_id_flash_contours.bmp'), id_flash_contours_img)
 
-            for (c) in id_sorted_flash_contour_lst:
+            for (c) in (id_sorted_flash_contour_lst if img is not None else []):
                 (x, y, w, h) = cv2.boundingRect(c)
                 x1 = x - 10
                 y1 = y - 3
@@ -226,51 +276,40 @@ def flash_detection(frame, id_contour, od_contour, threshold_id2, threshold_id3,
                 cv2.rectangle(img, (x1, y1), (x1 + w1, y1 + h1), DEFECT_BOX_COLOR, CONTOUR_THICKNESS)
 
         # Re-derive centers/radii for OD ring masks
-        M = cv2.moments(od_contours)
-        if M["m00"] != 0:
-            od_center_x = int(M["m10"] / M["m00"])
-            od_center_y = int(M["m01"] / M["m00"])
+        od_center = _centroid(od_contours)
+        if od_center is not None:
+            od_center_x, od_center_y = od_center
             od1_radius = int(np.sqrt(cv2.contourArea(od_contours) / np.pi))
-
-            od1_mask = np.zeros_like(gray_img)
-            cv2.drawContours(od1_mask, od_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(od1_mask, (od_center_x, od_center_y), od1_radius, 255, thickness=cv2.FILLED)
-
-            od2_mask = np.zeros_like(gray_img)
             od2_radius = od1_radius + (threshold_od2 if threshold_od2 is not None else 0)
-            cv2.drawContours(od2_mask, od_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(od2_mask, (od_center_x, od_center_y), od2_radius, 255, thickness=cv2.FILLED)
-            od2_ring_mask = cv2.subtract(od2_mask, od1_mask)
-
-            od3_mask = np.zeros_like(gray_img)
             od3_radius = od2_radius - (threshold_od3 if threshold_od3 is not None else 0)
-            cv2.drawContours(od3_mask, od_contours, -1, 255, thickness=cv2.FILLED)
-            cv2.circle(od3_mask, (od_center_x, od_center_y), od3_radius, 255, thickness=cv2.FILLED)
-            od3_ring_mask = cv2.subtract(od2_mask, od3_mask)
 
-            od3_mask_img = cv2.cvtColor(od3_ring_mask, cv2.COLOR_GRAY2BGR)
-            gray = cv2.cvtColor(od3_mask_img, cv2.COLOR_BGR2GRAY)
-            od3_ring_mask_contours, _ = cv2.findContours(gray, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+            box = _ring_box(gray_img.shape, od_contours, od_center, max(od2_radius, od3_radius))
+            od2_mask = _ring_mask("ring2", box, od_contours, od_center, od2_radius)
+            od3_ring_mask = _ring_mask("ring3", box, od_contours, od_center, od3_radius)
+            cv2.subtract(od2_mask, od3_ring_mask, dst=od3_ring_mask)
 
-            try:
-                roi_id_od
-            except NameError:
-                roi_id_od = img.copy()
-            cv2.drawContours(roi_id_od, od3_ring_mask_contours, -1, OD_CONTOUR_COLOR, CONTOUR_THICKNESS)
+            od3_ring_mask_contours, _ = cv2.findContours(od3_ring_mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE,
+                                                         offset=box[:2])
+
+            if debug:
+                if roi_id_od is None:
+                    roi_id_od = img.copy()
+                cv2.drawContours(roi_id_od, od3_ring_mask_contours, -1, OD_CONTOUR_COLOR, CONTOUR_THICKNESS)
 
             od_sorted_flash_contour_lst = []
             for (i, c) in enumerate(od3_ring_mask_contours):
                 od_perimeter = cv2.arcLength(c, True)
                 print("Contour OD #{}: perimeter: {:.2f}".format(i + 1, od_perimeter))
-                if od_perimeter < 40:
+                if od_perimeter < max_flash_perimeter:
                     od_sorted_flash_contour_lst.append(c)
                     fod_found = 1
                     print("fod found")
 
-            od_flash_contours_img = img.copy()
-            cv2.drawContours(od_flash_contours_img, od_sorted_flash_contour_lst, -1, DEFECT_CONTOUR_COLOR_OD, CONTOUR_THICKNESS)
+            if debug:
+                od_flash_contours_img = img.copy()
+                cv2.drawContours(od_flash_contours_img, od_sorted_flash_contour_lst, -1, DEFECT_CONTOUR_COLOR_OD, CONTOUR_THICKNESS)
 
-            for (c) in od_sorted_flash_contour_lst:
+            for (c) in (od_sorted_flash_contour_lst if img is not None else []):
                 (x, y, w, h) = cv2.boundingRect(c)
                 x1 = x - 10
                 y1 = y - 5
@@ -304,17 +343,17 @@ def flash_detection(frame, id_contour, od_contour, threshold_id2, threshold_id3,
     }
 
 # =========== 5. Orifice Measurement ===========
-def measure_orifice(frame, orifice_min=None, orifice_max=None, pixel_to_micron=None, min_area=500):
+def measure_orifice(frame, orifice_min=None, orifice_max=None, pixel_to_micron=None, min_area=ORIFICE_MIN_AREA_PX,
+                    analysis=None):
     if ENABLE_TIMING:
         start_time = time.time()
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    _, binary = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY)
-    contours, _ = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
+    analysis = analysis or FrameAnalysis(frame)
+    contours = analysis.contours(ORIFICE_THRESHOLD)
+    areas = analysis.areas(ORIFICE_THRESHOLD)
 
     valid = []
-    for c in contours:
-        area = cv2.contourArea(c)
+    for c, area in zip(contours, areas):
         if area >= min_area:
             perimeter = cv2.arcLength(c, True)
             if perimeter > 0:
@@ -329,24 +368,17 @@ def measure_orifice(frame, orifice_min=None, orifice_max=None, pixel_to_micron=N
         return {"orifice_diameter_mm": 0.0, "orifice_status": "NOK"}
 
     contour = sorted(valid, key=cv2.contourArea)[0]
-    M = cv2.moments(contour)
-    if M["m00"] == 0:
+    fit = circle_fit.fit_circle_robust(contour)
+    if fit is None:
         if ENABLE_TIMING:
             elapsed = (time.time() - start_time) * 1000
             print(f"[measure_orifice] Time: {elapsed:.2f} ms")
         return {"orifice_diameter_mm": 0.0, "orifice_status": "NOK"}
 
-    cx, cy = int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])
-    radius = int(np.sqrt(cv2.contourArea(contour) / np.pi))
+    cx, cy, radius = fit["cx"], fit["cy"], fit["r"]
 
-    diameters = []
-    for angle in range(0, 360, 10):
-        rad = math.radians(angle)
-        pt1 = (int(cx + radius * math.cos(rad)), int(cy + radius * math.sin(rad)))
-        pt2 = (int(cx - radius * math.cos(rad)), int(cy - radius * math.sin(rad)))
-        diameters.append(math.hypot(pt2[0] - pt1[0], pt2[1] - pt1[1]))
-    avg = sum(diameters) / len(diameters)
-    d_mm = (avg * pixel_to_micron) / 1000.0
+    profile = _edge_profile(analysis, fit, ORIFICE_THRESHOLD)
+    d_mm = (profile["mean"] * pixel_to_micron) / 1000.0
 
     if ENABLE_TIMING:
         elapsed = (time.time() - start_time) * 1000
@@ -358,7 +390,8 @@ def measure_orifice(frame, orifice_min=None, orifice_max=None, pixel_to_micron=N
         "orifice_contour": contour,
         "center_x": cx,
         "center_y": cy,
-        "radius": radius
+        "radius": radius,
+        "profile": profile
     }
 
 # ========= 6. Save Annotated Result Image ==========
@@ -366,11 +399,14 @@ def save_final_result_image(image, dim_data, flash_data, concentricity_data=None
                             output_folder="output_images", backup_output_folder=None):
     if ENABLE_TIMING:
         start_time = time.time()
+    if not artifacts.annotate():
+        # artifact level "off": verdict only, the result image is neither drawn nor written
+        return {"output_path": None, "success": True, "skipped": True}
     try:
         # Prefer flash-marked image; fallback to original image
         result_img = flash_data.get("flash_marked_image", None)
         if result_img is None:
-            result_img = image.copy()
+            result_img = to_bgr(image)
 
         os.makedirs(output_folder, exist_ok=True)
         if backup_output_folder:
@@ -437,20 +473,20 @@ def save_final_result_image(image, dim_data, flash_data, concentricity_data=None
         except Exception as _draw_e:
             print(f"Overlay drawing warning: {_draw_e}")
 
-        # 1) Write the annotated image to the standard path (preserve legacy)
+        # 1) Queue the annotated image for the standard path (preserve legacy); the results
+        #    writer encodes it and atomically replaces the file off the inspection thread
         filename = "cam1_bmp.bmp"
         output_path = os.path.join(output_folder, filename)
-        write_ok = cv2.imwrite(output_path, result_img)
-        if not write_ok:
-            print("Annotated write failed, attempting fallback with original image")
-            write_ok = cv2.imwrite(output_path, image)
+        # queued, not yet on disk: a failed encode/write is logged and counted in the writer's
+        # "errors" metric, it does not come back here
+        write_latest(output_path, result_img)
 
         # 2) Additionally write a timestamped backup copy if a backup folder is provided
         if backup_output_folder:
             try:
                 backup_name = f"cam1_bmp_{timestamp}.png"
                 backup_path = os.path.join(backup_output_folder, backup_name)
-                cv2.imwrite(backup_path, result_img)
+                write_async(backup_path, result_img)
                 print(f"Backup copy saved to: {backup_path}")
             except Exception as _be:
                 print(f"Backup write error: {_be}")
@@ -459,13 +495,13 @@ def save_final_result_image(image, dim_data, flash_data, concentricity_data=None
             elapsed = (time.time() - start_time) * 1000
             print(f"[save_final_result_image] Time: {elapsed:.2f} ms")
 
-        return {"output_path": output_path if write_ok else None, "success": bool(write_ok)}
+        return {"output_path": output_path, "success": True}
     except Exception as e:
         # Last-resort fallback: try to save the original image anyway
         try:
             os.makedirs(output_folder, exist_ok=True)
             output_path = os.path.join(output_folder, "cam1_bmp.bmp")
-            ok = cv2.imwrite(output_path, image)
+            ok = write_latest(output_path, image, copy=True)
 
             # Best-effort backup on exception as well
             if backup_output_folder:
@@ -474,7 +510,7 @@ def save_final_result_image(image, dim_data, flash_data, concentricity_data=None
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     backup_name = f"cam1_bmp_{timestamp}.png"
                     backup_path = os.path.join(backup_output_folder, backup_name)
-                    cv2.imwrite(backup_path, image)
+                    write_async(backup_path, image, copy=True)
                     print(f"Backup copy (exception path) saved to: {backup_path}")
                 except Exception as _be:
                     print(f"Backup write error (exception path): {_be}")
@@ -0,0 +1,141 @@
+# frame_ring.py
+# Pre-allocated ring of frame buffers for hardware-triggered (streaming) acquisition.
+#
+# The camera runs on its trigger line and a grab thread copies every frame into the next free
+# slot of the ring (np.copyto, no allocation per frame). Each slot carries the camera frame
+# counter, the camera timestamp and the host arrival time (perf_counter clock, same as
+# deadline_timer). The station pulls the frame that belongs to its part with take(lo, hi):
+# the oldest unclaimed frame that arrived inside the part's window. A taken frame is leased —
+# the grabber never overwrites it — until release().
+#
+# Buffers are allocated on the first frame (or when the sensor format changes, e.g. ROI).
+# Counters: overwritten = unclaimed frames recycled (no part asked for them, e.g. the part
+# was skipped after an upstream NOK); dropped = a frame arrived while every slot was leased.
+
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_SLOTS = 8
+
+
+class RingFrame:
+    __slots__ = ("slot", "data", "frame_id", "camera_ts", "host_ts", "_ring")
+
+    def __init__(self, ring, slot):
+        self._ring = ring
+        self.slot = slot
+        self.data = None        # view into the pre-allocated buffer
+        self.frame_id = None    # camera frame counter
+        self.camera_ts = None   # camera timestamp (ns, camera clock)
+        self.host_ts = None     # arrival, perf_counter seconds
+
+    def release(self):
+        self._ring.release(self)
+
+
+class FrameRing:
+    def __init__(self, slots: int = DEFAULT_SLOTS, name: str = "ring"):
+        self.name = name
+        self.slots = max(2, int(slots))
+        self._cond = threading.Condition()
+        self._buffers = None
+        self._frames = [RingFrame(self, i) for i in range(self.slots)]
+        self._state = ["free"] * self.slots     # free | ready | leased
+        self._next = 0
+        self.received = 0
+        self.taken = 0
+        self.overwritten = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.allocations = 0
+
+    def _alloc(self, shape, dtype):
+        # caller holds _cond; only on the first frame or a format change
+        self._buffers = [np.empty(shape, dtype=dtype) for _ in range(self.slots)]
+        self.allocations += 1
+        for i, fr in enumerate(self._frames):
+            fr.data = self._buffers[i]
+            if self._state[i] == "ready":
+                self._state[i] = "free"
+
+    def put(self, src, frame_id=None, camera_ts=None, host_ts=None) -> bool:
+        """Grabber: copy `src` into the next slot that is not leased. False if all are leased."""
+        host_ts = time.perf_counter() if host_ts is None else host_ts
+        with self._cond:
+            if self._buffers is None or self._buffers[0].shape != src.shape \
+                    or self._buffers[0].dtype != src.dtype:
+                if "leased" in self._state:
+                    self.dropped += 1     # cannot swap buffers under a station
+                    return False
+                self._alloc(src.shape, src.dtype)
+            for k in range(self.slots):
+                i = (self._next + k) % self.slots
+                if self._state[i] != "leased":
+                    break
+            else:
+                self.dropped += 1
+                return False
+            if self._state[i] == "ready":
+                self.overwritten += 1
+            np.copyto(self._buffers[i], src)
+            fr = self._frames[i]
+            fr.frame_id, fr.camera_ts, fr.host_ts = frame_id, camera_ts, host_ts
+            self._state[i] = "ready"
+            self._next = (i + 1) % self.slots
+            self.received += 1
+            self._cond.notify_all()
+        return True
+
+    def _find(self, lo, hi):
+        best = None
+        for i, st in enumerate(self._state):
+            if st != "ready":
+                continue
+            fr = self._frames[i]
+            if lo <= fr.host_ts <= hi and (best is None or fr.host_ts < best.host_ts):
+                best = fr
+        return best
+
+    def take(self, lo: float, hi: float, timeout: float) -> RingFrame | None:
+        """Lease the oldest unclaimed frame that arrived in [lo, hi]; wait up to `timeout` s."""
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                fr = self._find(lo, hi)
+                if fr is not None:
+                    self._state[fr.slot] = "leased"
+                    self.taken += 1
+                    return fr
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    self.timeouts += 1
+                    return None
+                self._cond.wait(left)
+
+    def release(self, fr: RingFrame):
+        with self._cond:
+            if self._state[fr.slot] == "leased":
+                self._state[fr.slot] = "free"
+
+    def clear(self):
+        """Forget unclaimed frames (new run); leased ones stay with their station."""
+        with self._cond:
+            for i, st in enumerate(self._state):
+                if st == "ready":
+                    self._state[i] = "free"
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "ready": self._state.count("ready"),
+                "leased": self._state.count("leased"),
+                "received": self.received,
+                "taken": self.taken,
+                "overwritten": self.overwritten,
+                "dropped": self.dropped,
+                "timeouts": self.timeouts,
+                "allocations": self.allocations,
+            }
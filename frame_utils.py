@@ -0,0 +1,191 @@
+# frame_utils.py
+# Channel handling and frame geometry shared by the station modules.
+#
+# Frames stay as the camera delivers them (mono cameras: 2-D uint8) through the whole
+# measurement path. Processing asks for to_gray(), which is free for a mono frame; colour is
+# only made by to_bgr() for the annotated images the renderers draw on.
+#
+# A frame may be a sensor ROI and/or binned (recipe CameraROI* / CameraBinning); FrameGeometry
+# maps between its pixels and full-sensor coordinates.
+#
+# FrameAnalysis memoizes the gray image and contour sets of one frame for the station 1 stages
+# (preprocess, ID/OD, flash, orifice). Per-contour values (area, moments, circle fits) are not
+# cached: each is cheap or computed once per part. bench_station1.py measures it against
+# per-stage analysis; on 2000x1600 mono frames the two are level.
+# ScratchPool hands out reusable mask buffers so per-part masks are not allocated every time.
+
+import threading
+
+import cv2
+import numpy as np
+
+
+def normalize_frame(frame):
+    """Camera frame -> 2-D mono or 3-channel BGR (drops a singleton channel axis / alpha)."""
+    if frame is None or not hasattr(frame, "shape"):
+        return frame
+    if frame.ndim == 3 and frame.shape[2] == 1:
+        return frame[:, :, 0]
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
+
+
+def to_gray(frame):
+    """Single-channel view for processing; no copy when the frame is already mono."""
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 1:
+        return frame[:, :, 0]
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def to_bgr(frame):
+    """New BGR canvas for colour annotations (always a copy, never the input frame)."""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 1:
+        return cv2.cvtColor(frame[:, :, 0], cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame.copy()
+
+
+class FrameGeometry:
+    """
+    Where a frame sits on the sensor: the camera ROI offset (in binned pixels) and the binning
+    factor. Frame coordinates map to full-sensor coordinates as (x + offset_x) * binning.
+    Full-frame constants (e.g. station 2's search rectangle) go through rect_to_frame();
+    calibrations measured on the full sensor (PIXELTOMICRON) through micron_per_pixel(); pixel
+    limits tuned on the full sensor through length_to_frame() (px) and area_to_frame() (px²).
+    """
+
+    __slots__ = ("offset_x", "offset_y", "binning")
+
+    def __init__(self, offset_x: int = 0, offset_y: int = 0, binning: int = 1):
+        self.offset_x = int(offset_x)
+        self.offset_y = int(offset_y)
+        self.binning = max(1, int(binning))
+
+    @property
+    def is_full_frame(self) -> bool:
+        return self.offset_x == 0 and self.offset_y == 0 and self.binning == 1
+
+    def to_full(self, x, y):
+        return (x + self.offset_x) * self.binning, (y + self.offset_y) * self.binning
+
+    def to_frame(self, x, y):
+        return x // self.binning - self.offset_x, y // self.binning - self.offset_y
+
+    def rect_to_frame(self, x1, y1, x2, y2):
+        fx1, fy1 = self.to_frame(x1, y1)
+        fx2, fy2 = self.to_frame(x2, y2)
+        return fx1, fy1, fx2, fy2
+
+    def micron_per_pixel(self, pixel_to_micron):
+        """Full-sensor calibration -> µm per pixel of this frame."""
+        return pixel_to_micron * self.binning
+
+    def length_to_frame(self, px):
+        """Full-sensor length in px -> px of this frame (None passes through)."""
+        return None if px is None else px / self.binning
+
+    def area_to_frame(self, px2):
+        """Full-sensor area in px² -> px² of this frame (None passes through)."""
+        return None if px2 is None else px2 / (self.binning * self.binning)
+
+    def as_dict(self) -> dict:
+        return {"offset_x": self.offset_x, "offset_y": self.offset_y, "binning": self.binning}
+
+    def __repr__(self):
+        return f"FrameGeometry(offset=({self.offset_x}, {self.offset_y}), binning={self.binning})"
+
+
+FULL_FRAME = FrameGeometry()
+
+
+class FrameAnalysis:
+    """
+    Per-frame memo for the station 1 stages: the gray image once, and contour sets (with their
+    areas, largest-first order) per threshold, computed on first use. A binary image is kept only
+    when a stage asks for it with binary(). Create one per frame in station1.main and pass it to
+    every defect.* stage; a stage called without one builds its own (same results, nothing
+    shared). Results are read-only: stages must not draw on them.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._gray = None
+        self._binary = {}           # threshold -> binary image
+        self._contours = {}         # (threshold, mode, method) -> contours
+        self._areas = {}            # (threshold, mode, method) -> [area per contour]
+        self._by_area = {}          # (threshold, mode, method) -> contours, largest first
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = to_gray(self.frame)
+        return self._gray
+
+    def binary(self, threshold: int):
+        img = self._binary.get(threshold)
+        if img is None:
+            _, img = cv2.threshold(self.gray, threshold, 255, cv2.THRESH_BINARY)
+            self._binary[threshold] = img
+        return img
+
+    def contours(self, threshold: int, mode=cv2.RETR_TREE, method=cv2.CHAIN_APPROX_NONE):
+        key = (threshold, mode, method)
+        found = self._contours.get(key)
+        if found is None:
+            binary = self._binary.get(threshold)
+            if binary is None:      # not kept: holding every threshold image costs more than it saves
+                _, binary = cv2.threshold(self.gray, threshold, 255, cv2.THRESH_BINARY)
+            found, _ = cv2.findContours(binary, mode, method)
+            self._contours[key] = found
+        return found
+
+    def areas(self, threshold: int, mode=cv2.RETR_TREE, method=cv2.CHAIN_APPROX_NONE):
+        key = (threshold, mode, method)
+        found = self._areas.get(key)
+        if found is None:
+            found = [cv2.contourArea(c) for c in self.contours(threshold, mode, method)]
+            self._areas[key] = found
+        return found
+
+    def by_area(self, threshold: int, mode=cv2.RETR_TREE, method=cv2.CHAIN_APPROX_NONE):
+        """Contours largest first (same order as sorted(..., key=cv2.contourArea, reverse=True))."""
+        key = (threshold, mode, method)
+        found = self._by_area.get(key)
+        if found is None:
+            contours = self.contours(threshold, mode, method)
+            areas = self.areas(threshold, mode, method)
+            order = sorted(range(len(contours)), key=areas.__getitem__, reverse=True)
+            found = [contours[i] for i in order]
+            self._by_area[key] = found
+        return found
+
+
+class ScratchPool:
+    """
+    Reusable uint8 work buffers, one per slot name and thread. take() returns a zeroed,
+    C-contiguous (h, w) view of the slot's buffer, which only grows; the view is valid until
+    the same slot is taken again on the same thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def take(self, slot: str, h: int, w: int):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        size = h * w
+        buf = buffers.get(slot)
+        if buf is None or buf.size < size:
+            buf = buffers[slot] = np.empty(size, dtype=np.uint8)
+        view = buf[:size].reshape(h, w)
+        view.fill(0)
+        return view
@@ -0,0 +1,298 @@
+# image_writer.py
+# Background image archive. Capture hands the frame over and returns at once; a worker thread
+# does the PNG/BMP encoding and the disk write off the trigger path.
+#
+# The queue is bounded (max_queue frames). When it is full the drop policy decides:
+#   "drop_newest" : the incoming frame is not archived (default — the line never waits on disk)
+#   "drop_oldest" : the oldest queued frame is discarded to make room
+#   "spill"       : the caller writes the frame itself as uncompressed BMP (no PNG encode):
+#                   nothing is lost, capture pays only a raw write while the disk is behind
+#
+# Directories are created once and remembered, not on every frame. Frames must not be modified
+# after submit() (pass copy=True when the caller draws on them).
+#
+# "Latest" images the UI polls (cam1_bmp.bmp, cam4_id.bmp, ...) go through submit_latest():
+# written to a temp file and renamed over the old one, so a reader never sees a half-written
+# BMP; if a newer image for the same path arrives before the old one was written, only the
+# newer one is written (coalesced). If the target is held open by a reader (the UI, on Windows),
+# the rename is retried with REPLACE_RETRY_SEC back-off; a newer image for the path ends the
+# retries, and a final failure removes the temp file and counts an error. The stations use write_latest() / write_async() on the
+# `results` writer, so encode and disk time stay out of the verdict.
+
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+ARCHIVE_MAX_QUEUE = 32             # frames waiting for the disk (~5 MB each at 2448x2048 mono)
+ARCHIVE_DROP_POLICY = "drop_newest"
+RESULTS_MAX_QUEUE = 64             # annotated result images (several per part at station 4)
+RESULTS_WORKERS = 2
+DROP_POLICIES = ("drop_newest", "drop_oldest", "spill")
+REPLACE_RETRY_SEC = (0.02, 0.05, 0.1, 0.25, 0.5)   # back-off while a reader holds a latest image
+                                                   # open (Windows: os.replace -> PermissionError)
+
+_writers = {}                      # name -> ImageWriter, for get_writer_metrics()
+_writers_lock = threading.Lock()
+
+
+class ImageWriter:
+    def __init__(self, name: str = "archive", max_queue: int = ARCHIVE_MAX_QUEUE,
+                 policy: str = ARCHIVE_DROP_POLICY, workers: int = 1):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"policy must be one of {DROP_POLICIES}, got {policy!r}")
+        self.name = name
+        self.policy = policy
+        self.workers = max(1, int(workers))
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._dirs = set()
+        self._dirs_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._write_ms = deque(maxlen=500)
+        self._latest = {}                  # path -> newest frame not yet written
+        self._path_locks = {}
+        self._writing = set()
+        self._latest_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_depth = 0
+        with _writers_lock:
+            _writers[name] = self
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return self
+            for w in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-writer-{w}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def ensure_dir(self, folder: str):
+        """os.makedirs once per folder for the life of the process."""
+        if folder in self._dirs:
+            return
+        with self._dirs_lock:
+            if folder not in self._dirs:
+                os.makedirs(folder, exist_ok=True)
+                self._dirs.add(folder)
+
+    def submit(self, frame, paths, copy: bool = False) -> bool:
+        """Queue `frame` to be written to every path in `paths` (format from the extension)."""
+        if frame is None:
+            return False
+        if not self._threads:
+            self.start()
+        job = (frame.copy() if copy else frame, list(paths))
+        with self._stats_lock:
+            self.submitted += 1
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            return self._overflow(job)
+        self._note_depth()
+        return True
+
+    def submit_latest(self, frame, path: str, copy: bool = False) -> bool:
+        """Queue `frame` as the new content of `path`; atomic replace, coalesced per path."""
+        if frame is None:
+            return False
+        if not self._threads:
+            self.start()
+        frame = frame.copy() if copy else frame
+        with self._stats_lock:
+            self.submitted += 1
+        with self._latest_lock:
+            pending = path in self._latest
+            self._latest[path] = frame
+        if pending:
+            with self._stats_lock:
+                self.coalesced += 1          # the queued job will write this newer frame
+            return True
+        try:
+            self._queue.put_nowait((None, path))
+        except queue.Full:
+            return self._overflow((None, path))
+        self._note_depth()
+        return True
+
+    def _overflow(self, job) -> bool:
+        if job[0] is None:
+            # latest images are never dropped: the UI would keep showing an old part
+            self._write_latest(job[1])
+            with self._stats_lock:
+                self.spilled += 1
+            return True
+        if self.policy == "spill":
+            frame, paths = job
+            self._write(frame, [os.path.splitext(p)[0] + ".bmp" for p in paths])
+            with self._stats_lock:
+                self.spilled += 1
+            return True
+        if self.policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                with self._stats_lock:
+                    self.dropped += 1
+                self._queue.put_nowait(job)
+                self._note_depth()
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+        with self._stats_lock:
+            self.dropped += 1
+        return False
+
+    def _note_depth(self):
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def _write(self, frame, paths):
+        start = time.perf_counter()
+        for path in paths:
+            try:
+                self.ensure_dir(os.path.dirname(path) or ".")
+                if not cv2.imwrite(path, frame):
+                    raise IOError("cv2.imwrite returned False")
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                self._dirs.discard(os.path.dirname(path) or ".")   # recreate it next time
+                print(f"❌ {self.name}: could not write {path}: {e}")
+        with self._stats_lock:
+            self.written += 1
+            self._write_ms.append((time.perf_counter() - start) * 1000.0)
+
+    def _write_latest(self, path: str):
+        with self._latest_lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        with path_lock:                      # one writer per path: renames land in order
+            with self._latest_lock:
+                frame = self._latest.pop(path, None)
+                if frame is not None:
+                    self._writing.add(path)
+            if frame is not None:
+                try:
+                    self._replace(path, frame)
+                finally:
+                    with self._latest_lock:
+                        self._writing.discard(path)
+
+    def will_exist(self, path: str) -> bool:
+        """`path` is on disk or queued/being written here (os.path.exists for async writes)."""
+        with self._latest_lock:
+            if path in self._latest or path in self._writing:
+                return True
+        return os.path.exists(path)
+
+    def _replace(self, path: str, frame):
+        root, ext = os.path.splitext(path)
+        tmp = f"{root}.tmp{ext}"            # same extension: cv2 picks the encoder from it
+        start = time.perf_counter()
+        try:
+            self.ensure_dir(os.path.dirname(path) or ".")
+            if not cv2.imwrite(tmp, frame):
+                raise IOError("cv2.imwrite returned False")
+            self._rename(tmp, path)
+        except Exception as e:
+            with self._stats_lock:
+                self.errors += 1
+            self._dirs.discard(os.path.dirname(path) or ".")
+            print(f"❌ {self.name}: could not write {path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        with self._stats_lock:
+            self.written += 1
+            self._write_ms.append((time.perf_counter() - start) * 1000.0)
+
+    def _rename(self, tmp: str, path: str):
+        for delay in REPLACE_RETRY_SEC + (None,):
+            try:
+                os.replace(tmp, path)
+                return
+            except PermissionError:
+                if delay is None:
+                    raise
+            with self._latest_lock:
+                superseded = path in self._latest
+            if superseded:                   # a newer image for this path is queued: it wins
+                os.remove(tmp)
+                return
+            time.sleep(delay)
+
+    def _worker(self):
+        while True:
+            frame, paths = self._queue.get()
+            try:
+                if frame is None:
+                    self._write_latest(paths)
+                else:
+                    self._write(frame, paths)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until the queue is empty (e.g. before shutdown). False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def status(self) -> dict:
+        with self._stats_lock:
+            times = sorted(self._write_ms)
+            return {
+                "policy": self.policy,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "write_ms_avg": round(sum(times) / len(times), 3) if times else 0.0,
+                "write_ms_p95": round(times[max(0, math.ceil(0.95 * len(times)) - 1)], 3) if times else 0.0,
+                "write_ms_max": round(times[-1], 3) if times else 0.0,
+            }
+
+
+def get_writer_metrics() -> dict:
+    with _writers_lock:
+        writers = list(_writers.values())
+    return {w.name: w.status() for w in writers}
+
+
+archive = ImageWriter("archive")   # raw camera frames (input_backup_camN + latest camN.bmp)
+results = ImageWriter("results", max_queue=RESULTS_MAX_QUEUE, workers=RESULTS_WORKERS)
+
+
+def write_latest(path: str, frame, copy: bool = False) -> bool:
+    """
+    Non-blocking cv2.imwrite for an image the UI reads (atomic replace, coalesced). True means
+    queued (False only for a None frame); a failed write is logged and counted in "errors".
+    """
+    return results.submit_latest(frame, path, copy=copy)
+
+
+def write_async(path: str, frame, copy: bool = False) -> bool:
+    """Non-blocking cv2.imwrite for a file nobody is waiting on (timestamped backups, debug)."""
+    return results.submit(frame, [path], copy=copy)
@@ -0,0 +1,119 @@
+# part_state.py
+# Per-part state machine. Every active station of a part owns a Future that resolves to
+#   True  (OK), False (NOK) or None (UNKNOWN — no trustworthy result).
+# A downstream station waits on its predecessor's future up to a deadline; the final verdict
+# is the combination of all station futures. Live and recently finished parts are kept in a
+# registry so /part-state can show where every part on the line is.
+#
+# Station states: pending -> waiting -> running -> ok | nok | unknown | cancelled
+# Part states   : in_flight -> OK | NOK | UNKNOWN | REFUSED | CANCELLED
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+FINISHED_KEEP = 100          # finished parts kept for diagnostics
+
+PENDING = object()           # wait_result(): deadline passed before the station finished
+
+_part_counter = itertools.count(1)
+_lock = threading.Lock()
+_live = OrderedDict()        # part_no -> PartState
+_finished = deque(maxlen=FINISHED_KEEP)
+
+
+class PartState:
+    def __init__(self, stations, part_no=None):
+        self.part_no = part_no if part_no is not None else next(_part_counter)
+        self.stations = list(stations)
+        self.created = time.perf_counter()
+        self.wall_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.state = "in_flight"
+        self.finished_ms = None
+        self.futures = {st: Future() for st in self.stations}
+        self.station_state = {st: "pending" for st in self.stations}
+        self.notes = {}
+        self._lock = threading.Lock()
+        with _lock:
+            _live[self.part_no] = self
+
+    def mark(self, station: str, state: str, note: str | None = None):
+        with self._lock:
+            self.station_state[station] = state
+            if note:
+                self.notes[station] = note
+
+    def set_result(self, station: str, ok, note: str | None = None):
+        """Resolve a station: True=OK, False=NOK, None=UNKNOWN. Later calls are ignored."""
+        fut = self.futures[station]
+        with self._lock:
+            if fut.done():
+                return
+            self.station_state[station] = "ok" if ok is True else "nok" if ok is False else "unknown"
+            if note:
+                self.notes[station] = note
+        fut.set_result(ok)
+
+    def wait_result(self, station: str, deadline: float):
+        """Result of `station` (True/False/None), or PENDING if not done by `deadline` (perf_counter)."""
+        try:
+            return self.futures[station].result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            return PENDING
+
+    def final_result(self, deadline: float):
+        """Combined verdict: False if any station is NOK, None if any is unknown/unfinished, else True."""
+        result = True
+        for st in self.stations:
+            ok = self.wait_result(st, deadline)
+            if ok is False:
+                return False
+            if ok is None or ok is PENDING:
+                result = None
+        return result
+
+    def finish(self, state: str):
+        with self._lock:
+            if self.state != "in_flight":
+                return
+            self.state = state
+            self.finished_ms = round((time.perf_counter() - self.created) * 1000.0, 3)
+        # unblock anybody still waiting on a station that will never run
+        for st, fut in self.futures.items():
+            if not fut.done():
+                self.set_result(st, None, note=f"part {state.lower()}")
+        with _lock:
+            _live.pop(self.part_no, None)
+            _finished.append(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "part_no": self.part_no,
+                "time": self.wall_time,
+                "state": self.state,
+                "age_ms": round((time.perf_counter() - self.created) * 1000.0, 3),
+                "finished_ms": self.finished_ms,
+                "stations": dict(self.station_state),
+                "notes": dict(self.notes),
+            }
+
+
+def cancel_all():
+    """STOP: every live part is closed as CANCELLED."""
+    with _lock:
+        parts = list(_live.values())
+    for part in parts:
+        part.finish("CANCELLED")
+
+
+def get_part_states(finished: int = 20) -> dict:
+    with _lock:
+        live = list(_live.values())
+        done = list(_finished)[-finished:] if finished else []
+    return {
+        "in_flight": [p.to_dict() for p in live],
+        "finished": [p.to_dict() for p in done],
+    }
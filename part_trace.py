@@ -0,0 +1,149 @@
+# part_trace.py
+# Per-part latency tracing. A PartTrace is created when $C1# is accepted and travels with the
+# part (ctx["trace"]) through run_part_pipeline -> capture -> inspection -> DB -> verdict.
+# Every span is stored as (start, end) in ms relative to the trigger, on time.perf_counter().
+# Finished traces go into a ring buffer; get_trace_summary() gives p50/p95/p99 per span.
+#
+# Span names: "C1.wait", "C1.capture", "C1.params", "C1.inspect", "C1.db" (same for C2..C4),
+#             "verdict.db" (defect count), "verdict" (send_until_ack of $OK#/$NOK#)
+#             and "cycle" (trigger -> verdict ACK).
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_RING_SIZE = 500      # finished parts kept in memory
+TRACE_RECENT = 20          # parts returned in full by get_trace_summary()
+
+_part_counter = itertools.count(1)
+_ring = deque(maxlen=TRACE_RING_SIZE)
+_ring_lock = threading.Lock()
+
+
+class PartTrace:
+    """Timestamps for one part; safe to use from the station threads at the same time."""
+
+    def __init__(self):
+        self.part_no = next(_part_counter)
+        self.t0 = time.perf_counter()
+        self.wall_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.spans = {}        # name -> [start_ms, end_ms or None]
+        self.verdict = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000.0
+
+    def begin(self, name: str):
+        with self._lock:
+            self.spans[name] = [self._now_ms(), None]
+
+    def end(self, name: str):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [0.0, self._now_ms()]
+            else:
+                span[1] = self._now_ms()
+
+    @contextmanager
+    def span(self, name: str):
+        self.begin(name)
+        try:
+            yield self
+        finally:
+            self.end(name)
+
+    def durations(self) -> dict:
+        with self._lock:
+            return {name: round(end - start, 3)
+                    for name, (start, end) in self.spans.items() if end is not None}
+
+    def finish(self, verdict: str | None = None):
+        """Close the trace ("cycle" span) and push it into the ring buffer once."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.verdict = verdict
+            self.spans["cycle"] = [0.0, self._now_ms()]
+        with _ring_lock:
+            _ring.append(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = {name: {"start_ms": round(start, 3),
+                            "end_ms": round(end, 3) if end is not None else None}
+                     for name, (start, end) in self.spans.items()}
+        return {"part_no": self.part_no, "time": self.wall_time,
+                "verdict": self.verdict, "spans": spans, "durations_ms": self.durations()}
+
+
+def begin(trace, name: str):
+    """None-safe PartTrace.begin (parts started without a trace are simply not timed)."""
+    if trace is not None:
+        trace.begin(name)
+
+
+def end(trace, name: str):
+    if trace is not None:
+        trace.end(name)
+
+
+def finish(trace, verdict: str | None = None):
+    if trace is not None:
+        trace.finish(verdict)
+
+
+@contextmanager
+def span(trace, name: str):
+    """`with span(ctx.get("trace"), "C1.db"):` — a no-op when the part has no trace."""
+    if trace is None:
+        yield None
+        return
+    with trace.span(name):
+        yield trace
+
+
+def _percentile(ordered, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def get_trace_summary(recent: int = TRACE_RECENT) -> dict:
+    """p50/p95/p99/max per span over the ring buffer, plus the last `recent` parts in full."""
+    with _ring_lock:
+        traces = list(_ring)
+
+    per_span = {}
+    for trace in traces:
+        for name, ms in trace.durations().items():
+            per_span.setdefault(name, []).append(ms)
+
+    spans = {}
+    for name, values in sorted(per_span.items()):
+        values.sort()
+        spans[name] = {
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 50), 3),
+            "p95_ms": round(_percentile(values, 95), 3),
+            "p99_ms": round(_percentile(values, 99), 3),
+            "max_ms": round(values[-1], 3),
+        }
+
+    return {
+        "parts": len(traces),
+        "spans": spans,
+        "recent": [t.to_dict() for t in traces[-recent:]] if recent else [],
+    }
+
+
+def clear_traces():
+    with _ring_lock:
+        _ring.clear()
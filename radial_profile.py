@@ -0,0 +1,71 @@
+# radial_profile.py
+# Diameter measurement from the real edge, one pass per circle.
+#
+# The image is unwrapped around the fitted centre with cv2.warpPolar (one row per angle, one
+# column per pixel of radius). In every row, the edge is the crossing of the threshold level
+# closest to the expected radius, inside a band around it, interpolated linearly between the
+# two samples on either side (sub-pixel). Opposite radii add up to one diameter per angle pair,
+# so a profile gives min / max / mean diameter and ovality (max - min) instead of the single
+# 2r that sqrt(area / pi) implies.
+#
+# Polarity-free: the band search does not care whether the part is darker or brighter than
+# what surrounds the edge, so the same call serves ID, OD and orifice edges.
+
+import math
+
+import cv2
+import numpy as np
+
+RADIAL_ANGLES = 360            # rows of the unwrapped image (must be even: diameters pair up)
+RADIAL_BAND_PX = 12            # edge search half-width around the expected radius, at least
+RADIAL_BAND_FRACTION = 0.05    # ... or this fraction of the radius, whichever is larger
+MIN_VALID_FRACTION = 0.5       # fewer diameters than this share of angle pairs -> no profile
+
+
+def edge_radii(gray, center, radius: float, level: float, angles: int = RADIAL_ANGLES, band: float = None):
+    """Sub-pixel edge radius per angle (float32 array of `angles`, NaN where no edge was found)."""
+    if band is None:
+        band = max(RADIAL_BAND_PX, RADIAL_BAND_FRACTION * radius)
+    width = int(math.ceil(radius + band)) + 2          # maxRadius == width: 1 column per pixel
+    polar = cv2.warpPolar(gray, (width, angles), (float(center[0]), float(center[1])), width,
+                          cv2.INTER_LINEAR + cv2.WARP_POLAR_LINEAR + cv2.WARP_FILL_OUTLIERS)
+    lo = max(0, int(radius - band))
+    hi = min(width, int(radius + band) + 2)
+    strip = polar[:, lo:hi].astype(np.float32) - np.float32(level)
+    if strip.shape[1] < 2:
+        return np.full(angles, np.nan, dtype=np.float32)
+
+    a, b = strip[:, :-1], strip[:, 1:]
+    crossing = np.signbit(a) != np.signbit(b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(crossing, a / (a - b), 0.0)
+    r = lo + np.arange(a.shape[1], dtype=np.float32)[None, :] + frac
+    dist = np.where(crossing, np.abs(r - radius), np.inf)
+
+    rows = np.arange(angles)
+    best = np.argmin(dist, axis=1)
+    found = np.isfinite(dist[rows, best])
+    return np.where(found, r[rows, best], np.nan).astype(np.float32)
+
+
+def diameter_profile(gray, center, radius: float, level: float, angles: int = RADIAL_ANGLES):
+    """
+    {"mean", "min", "max", "ovality", "valid"} in pixels for the circle near `radius` around
+    `center`, or None when fewer than MIN_VALID_FRACTION of the diameters had both edges.
+    """
+    if radius <= 0:
+        return None
+    radii = edge_radii(gray, center, radius, level, angles)
+    half = angles // 2
+    diameters = radii[:half] + radii[half:2 * half]
+    diameters = diameters[np.isfinite(diameters)]
+    if diameters.size < MIN_VALID_FRACTION * half:
+        return None
+    d_min, d_max = float(diameters.min()), float(diameters.max())
+    return {
+        "mean": float(diameters.mean()),
+        "min": d_min,
+        "max": d_max,
+        "ovality": d_max - d_min,
+        "valid": round(diameters.size / half, 3),
+    }
@@ -5,9 +5,12 @@
 #  # changes because of support pistong ring part
 # ## updated 20\9\2025  11:PM   upto 22_sep_25
 import defect as dt
+from frame_utils import FULL_FRAME, FrameAnalysis, normalize_frame
 import cv2
 import numpy as np
 import os  # needed for fallback writes
+import artifacts
+from image_writer import results, write_async, write_latest
 from datetime import datetime
 
 def safe_color_convert(image, conversion_code):
@@ -33,7 +36,7 @@ def _write_backup(frame, backup_output_folder):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"cam1_bmp_{ts}.bmp"
             backup_path = os.path.join(backup_output_folder, backup_name)
-            ok2 = cv2.imwrite(backup_path, frame)
+            ok2 = write_async(backup_path, frame, copy=True)
             print(f"Backup wrote to {backup_path}: {ok2}")
     except Exception as _be:
         print(f"Backup write error: {_be}")
@@ -44,20 +47,14 @@ def main(part, subpart, frame,
          threshold_id2, threshold_id3, threshold_od2, threshold_od3,
          pixel_to_micron, pixel_to_micron_id, pixel_to_micron_od,
          output_folder,
-         backup_output_folder=None):  # new
+         backup_output_folder=None,  # new
+         geometry=None):  # sensor ROI / binning of `frame` (frame_utils.FrameGeometry)
     # Convert string parameters to float
     try:
         print("type of id min:", type(id_min))
         print(f"Original frame shape: {frame.shape}")
-        if len(frame.shape) == 2:
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-            print("Converted grayscale frame to BGR")
-        elif len(frame.shape) == 3 and frame.shape[2] == 1:
-            frame = cv2.cvtColor(frame.squeeze(), cv2.COLOR_GRAY2BGR)
-            print("Converted single-channel frame to BGR")
-        elif len(frame.shape) == 3 and frame.shape[2] == 4:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-            print("Converted BGRA frame to BGR")
+        # mono frames stay single-channel; colour is added only for the annotated output
+        frame = normalize_frame(frame)
         print(f"Final frame shape: {frame.shape}")
 
         id_min = float(id_min) if id_min != "NA" else None
@@ -74,6 +71,17 @@ def main(part, subpart, frame,
         pixel_to_micron = float(pixel_to_micron)
         pixel_to_micron_id = float(pixel_to_micron_id)
         pixel_to_micron_od = float(pixel_to_micron_od)
+        # calibrations are per full-sensor pixel; a binned frame has larger pixels
+        geometry = geometry or FULL_FRAME
+        pixel_to_micron = geometry.micron_per_pixel(pixel_to_micron)
+        pixel_to_micron_id = geometry.micron_per_pixel(pixel_to_micron_id)
+        pixel_to_micron_od = geometry.micron_per_pixel(pixel_to_micron_od)
+        # ring offsets and blob limits are full-sensor pixels too: lengths / binning, areas / binning²
+        threshold_id2, threshold_id3, threshold_od2, threshold_od3 = (
+            None if v is None else int(round(geometry.length_to_frame(v)))
+            for v in (threshold_id2, threshold_id3, threshold_od2, threshold_od3))
+        flash_perimeter = geometry.length_to_frame(dt.FLASH_MAX_PERIMETER_PX)
+        orifice_min_area = geometry.area_to_frame(dt.ORIFICE_MIN_AREA_PX)
 
     except ValueError as e:
         # On parameter conversion failure, still try to save original as fallback
@@ -81,7 +89,7 @@ def main(part, subpart, frame,
             os.makedirs(output_folder, exist_ok=True)
             if frame is not None:
                 fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Fallback write (param error) to {fallback_path}: {ok}")
                 _write_backup(frame, backup_output_folder)  # backup
         except Exception as _e:
@@ -113,7 +121,9 @@ def main(part, subpart, frame,
     }
 
     try:
-        processed = dt.preprocess_image(frame, output_folder)
+        # gray, thresholds and contours computed once and shared by every stage below
+        analysis = FrameAnalysis(frame)
+        processed = dt.preprocess_image(frame, output_folder, analysis=analysis)
         if len(processed["sorted_contours"]) < 2:
             raise ValueError("Not enough contours found for ID/OD measurement")
         contours = processed["sorted_contours"]
@@ -121,15 +131,18 @@ def main(part, subpart, frame,
         # 1) PISTON: ID/OD + concentricity + optional orifice
         if part == "PISTON":
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             conc = dt.concentricity(dims['center_x_od'], dims['center_y_od'],
                                     dims['center_x_id'], dims['center_y_id'], concentricity_max, pixel_to_micron)
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             orifice_data = None
             if orifice_min is not None and orifice_max is not None:
-                orifice_data = dt.measure_orifice(frame, orifice_min, orifice_max, pixel_to_micron)
+                orifice_data = dt.measure_orifice(frame, orifice_min, orifice_max, pixel_to_micron,
+                                                  min_area=orifice_min_area, analysis=analysis)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -145,11 +158,11 @@ def main(part, subpart, frame,
             result['image_path'] = save_result.get('output_path')
 
             # Fallback if save failed
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -159,11 +172,13 @@ def main(part, subpart, frame,
         # 2) Ring-like: ID/OD + concentricity (no orifice)
         elif part in ["TEFLON PISTON RING", "SUPPORT PISTON RING", "SUPPORT PISTON", "OIL SEAL", "SPACER", "GUIDE END", "WASHER"]:
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             conc = dt.concentricity(dims['center_x_od'], dims['center_y_od'],
                                     dims['center_x_id'], dims['center_y_id'], concentricity_max, pixel_to_micron)
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -177,11 +192,11 @@ def main(part, subpart, frame,
                                                      backup_output_folder=backup_output_folder)  # new
             result['image_path'] = save_result.get('output_path')
 
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -191,12 +206,14 @@ def main(part, subpart, frame,
         # 3) O RING: ID only (OD NA), no concentricity/orifice
         elif part == "O RING":
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             dims['diameter_od_mm'] = 0.0
             dims['diameter_od_px'] = 0.0
             dims['od_status'] = "NA"
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -210,11 +227,11 @@ def main(part, subpart, frame,
                                                      backup_output_folder=backup_output_folder)  # new
             result['image_path'] = save_result.get('output_path')
 
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -224,12 +241,14 @@ def main(part, subpart, frame,
         # 4) NRV SEAL: OD only (ID NA), no concentricity/orifice
         elif part == "NRV SEAL":
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             dims['diameter_id_mm'] = 0.0
             dims['diameter_id_px'] = 0.0
             dims['id_status'] = "NA"
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -243,11 +262,11 @@ def main(part, subpart, frame,
                                                      backup_output_folder=backup_output_folder)  # new
             result['image_path'] = save_result.get('output_path')
 
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -257,9 +276,11 @@ def main(part, subpart, frame,
         # 5) Other simple parts: ID/OD only (no concentricity/orifice)
         elif part in ["NRV WASHER", "PISTON RING", "TEFLON RING"]:
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -273,11 +294,11 @@ def main(part, subpart, frame,
                                                      backup_output_folder=backup_output_folder)  # new
             result['image_path'] = save_result.get('output_path')
 
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -287,12 +308,14 @@ def main(part, subpart, frame,
         # 6) SEPEARTING PISTON: OD only (ID NA), no concentricity/orifice
         elif part == "SEPEARTING PISTON":
             dims = dt.id_od_dimension(
-                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od)
+                frame, contours, id_min, id_max, od_min, od_max, pixel_to_micron_id, pixel_to_micron_od,
+                analysis=analysis)
             dims['diameter_id_mm'] = 0.0
             dims['diameter_id_px'] = 0.0
             dims['id_status'] = "NA"
             flash = dt.flash_detection(frame, dims['id_contour'], dims['od_contour'],
-                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder)
+                                       threshold_id2, threshold_id3, threshold_od2, threshold_od3, output_folder,
+                                       analysis=analysis, max_flash_perimeter=flash_perimeter)
 
             result['measurements'].update({
                 'id': {'value': dims['diameter_id_mm'], 'status': dims['id_status']},
@@ -306,11 +329,11 @@ def main(part, subpart, frame,
                                                      backup_output_folder=backup_output_folder)  # new
             result['image_path'] = save_result.get('output_path')
 
-            if not save_result.get('success') or not save_result.get('output_path'):
+            if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                 try:
                     os.makedirs(output_folder, exist_ok=True)
                     fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     result['image_path'] = fallback_path if ok else None
                     print(f"Fallback write after save failure to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # backup
@@ -366,8 +389,8 @@ def main(part, subpart, frame,
         try:
             os.makedirs(output_folder, exist_ok=True)
             cam1_path = os.path.join(output_folder, "cam1_bmp.bmp")
-            if not os.path.exists(cam1_path) and frame is not None:
-                ok = cv2.imwrite(cam1_path, frame)
+            if artifacts.annotate() and not results.will_exist(cam1_path) and frame is not None:
+                ok = write_latest(cam1_path, frame, copy=True)
                 if not result['image_path']:
                     result['image_path'] = cam1_path if ok else None
                 print(f"Final guard wrote original to {cam1_path}: {ok}")
@@ -391,7 +414,7 @@ def main(part, subpart, frame,
             os.makedirs(output_folder, exist_ok=True)
             if frame is not None:
                 fallback_path = os.path.join(output_folder, "cam1_bmp.bmp")
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Fallback write (exception path) to {fallback_path}: {ok}")
                 _write_backup(frame, backup_output_folder)  # backup
         except Exception as _e:
@@ -6,11 +6,13 @@
 # - Legacy primary save (cam2_bmp.bmp in output_folder) is preserved.
 
 import station_2_defect as dt
-import cv2
 import numpy as np
 import os
 from PIL import Image
 from datetime import datetime
+from frame_utils import FULL_FRAME
+import artifacts
+from image_writer import results, write_async, write_latest
 
 def _write_backup(frame, backup_output_folder):
     """Write a timestamped backup copy if a backup folder is provided."""
@@ -20,13 +22,14 @@ def _write_backup(frame, backup_output_folder):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"cam2_bmp_{ts}.bmp"
             backup_path = os.path.join(backup_output_folder, backup_name)
-            ok = cv2.imwrite(backup_path, frame)
+            ok = write_async(backup_path, frame, copy=True)
             print(f"Backup wrote to {backup_path}: {ok}")
     except Exception as _be:
         print(f"Backup write error: {_be}")
 
 def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_folder, min_thresh, max_thresh,
-         backup_output_folder=None):  # NEW
+         backup_output_folder=None,  # NEW
+         geometry=None):  # sensor ROI / binning of `frame` (frame_utils.FrameGeometry)
     # Check if part is in the excluded list
     excluded_parts = ["PISTON", "GUIDE END", "SEPARATING PISTON", "NRV SEAL"]
 
@@ -36,7 +39,7 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
             os.makedirs(output_folder, exist_ok=True)
             if frame is not None:
                 fallback_path = os.path.join(output_folder, "cam2_bmp.bmp")
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Excluded-part fallback write to {fallback_path}: {ok}")
                 _write_backup(frame, backup_output_folder)  # NEW
         except Exception as _e:
@@ -60,13 +63,16 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
             thick_min = float(thick_min) if thick_min != "NA" else None
             thick_max = float(thick_max) if thick_max != "NA" else None
             pixel_to_micron = float(pixel_to_micron)
+            # calibration is per full-sensor pixel; a binned frame has larger pixels
+            geometry = geometry or FULL_FRAME
+            pixel_to_micron = geometry.micron_per_pixel(pixel_to_micron)
         except ValueError:
             # Fallback save on parameter conversion failure
             try:
                 os.makedirs(output_folder, exist_ok=True)
                 if frame is not None:
                     fallback_path = os.path.join(output_folder, "cam2_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     print(f"Fallback write (param error) to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # NEW
             except Exception as _e:
@@ -114,7 +120,8 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
             }
         }
         try:
-            processed = dt.preprocess_image(frame, output_folder, min_thresh=min_thr, max_thresh=max_thr)
+            processed = dt.preprocess_image(frame, output_folder, min_thresh=min_thr, max_thresh=max_thr,
+                                            geometry=geometry)
             if len(processed["sorted_contours"]) < 1:
                 raise ValueError("Not enough contours found for thickness measurement")
             contours = processed["sorted_contours"]
@@ -146,11 +153,11 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
                 result['image_path'] = save_result['output_path']
 
                 # Fallback if save failed
-                if not save_result.get('success') or not save_result.get('output_path'):
+                if not save_result.get('skipped') and (not save_result.get('success') or not save_result.get('output_path')):
                     try:
                         os.makedirs(output_folder, exist_ok=True)
                         fallback_path = os.path.join(output_folder, "cam2_bmp.bmp")
-                        ok = cv2.imwrite(fallback_path, frame)
+                        ok = write_latest(fallback_path, frame, copy=True)
                         result['image_path'] = fallback_path if ok else None
                         print(f"Fallback write after save failure to {fallback_path}: {ok}")
                         _write_backup(frame, backup_output_folder)  # NEW
@@ -190,8 +197,8 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
             try:
                 os.makedirs(output_folder, exist_ok=True)
                 cam2_path = os.path.join(output_folder, "cam2_bmp.bmp")
-                if not os.path.exists(cam2_path) and frame is not None:
-                    ok = cv2.imwrite(cam2_path, frame)
+                if artifacts.annotate() and not results.will_exist(cam2_path) and frame is not None:
+                    ok = write_latest(cam2_path, frame, copy=True)
                     if not result['image_path']:
                         result['image_path'] = cam2_path if ok else None
                     print(f"Final guard wrote original to {cam2_path}: {ok}")
@@ -214,7 +221,7 @@ def main(part, subpart, frame, thick_min, thick_max, pixel_to_micron, output_fol
                 os.makedirs(output_folder, exist_ok=True)
                 if frame is not None:
                     fallback_path = os.path.join(output_folder, "cam2_bmp.bmp")
-                    ok = cv2.imwrite(fallback_path, frame)
+                    ok = write_latest(fallback_path, frame, copy=True)
                     print(f"Fallback write (exception path) to {fallback_path}: {ok}")
                     _write_backup(frame, backup_output_folder)  # NEW
             except Exception as _e:
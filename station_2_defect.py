@@ -9,11 +9,17 @@ import math
 from datetime import datetime
 import os
 import imutils
+from frame_utils import FULL_FRAME, to_gray, to_bgr
+from image_writer import write_async, write_latest
+import artifacts
 
-def preprocess_image(frame, output_folder=None, min_thresh=0, max_thresh=255):
+# part search window, full-sensor coordinates
+SEARCH_RECT = (400, 840, 1750, 1050)
+
+def preprocess_image(frame, output_folder=None, min_thresh=0, max_thresh=255, geometry=None):
     if output_folder:
         os.makedirs(output_folder, exist_ok=True)
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
     try:
         min_thr = int(float(min_thresh)); min_thr = max(0, min(255, min_thr))
         max_thr = int(float(max_thresh)); max_thr = max(0, min(255, max_thr))
@@ -22,8 +28,8 @@ def preprocess_image(frame, output_folder=None, min_thresh=0, max_thresh=255):
     print('Min Thr:', min_thr, 'max  thr:', max_thr)
     _, thresh_img = cv2.threshold(gray, min_thr, max_thr, cv2.THRESH_BINARY_INV)
     contours, _ = cv2.findContours(thresh_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    rect_x1, rect_y1 = 400, 840
-    rect_x2, rect_y2 = 1750, 1050
+    # search window moved into this frame's pixels (sensor ROI / binning)
+    rect_x1, rect_y1, rect_x2, rect_y2 = (geometry or FULL_FRAME).rect_to_frame(*SEARCH_RECT)
     filtered_contours = []
     for contour in contours:
         x, y, w, h = cv2.boundingRect(contour)
@@ -31,7 +37,7 @@ def preprocess_image(frame, output_folder=None, min_thresh=0, max_thresh=255):
             filtered_contours.append(contour)
     sorted_contours = sorted(filtered_contours, key=cv2.contourArea, reverse=True) if filtered_contours else []
     return {
-        "image": frame.copy(),
+        "image": frame,
         "sorted_contours": sorted_contours,
         "original_gray": gray,
         "thresh_img": thresh_img
@@ -142,8 +148,11 @@ def calculate_distance(pt1, pt2):
 def save_thickness_result_image(image, thickness_data, flash_data, output_folder="output_images",
                                 backup_output_folder=None):  # NEW
     """Save result image with thickness annotations, preserving legacy cam2_bmp.bmp and adding an optional timestamped backup."""
+    if not artifacts.annotate():
+        # artifact level "off": verdict only, the result image is neither drawn nor written
+        return {"output_path": None, "success": True, "skipped": True}
     try:
-        result_img = image.copy()
+        result_img = to_bgr(image)   # colour only for the annotated output
         os.makedirs(output_folder, exist_ok=True)
         if backup_output_folder:
             os.makedirs(backup_output_folder, exist_ok=True)
@@ -199,10 +208,8 @@ def save_thickness_result_image(image, thickness_data, flash_data, output_folder
         # Legacy primary save
         filename = "cam2_bmp.bmp"
         output_path = os.path.join(output_folder, filename)
-        write_ok = cv2.imwrite(output_path, result_img)
-        if not write_ok:
-            print("Annotated write failed, attempting fallback with original image")
-            write_ok = cv2.imwrite(output_path, image)
+        # atomic replace, off this thread; write errors show in the writer's "errors" metric
+        write_latest(output_path, result_img)
 
         # Timestamped backup save
         if backup_output_folder:
@@ -210,18 +217,18 @@ def save_thickness_result_image(image, thickness_data, flash_data, output_folder
                 ts = datetime.now().strftime("%Y%m%d_%H%M%S")
                 backup_name = f"cam2_bmp_{ts}.png"
                 backup_path = os.path.join(backup_output_folder, backup_name)
-                cv2.imwrite(backup_path, result_img)
+                write_async(backup_path, result_img)
                 print(f"Backup copy saved to: {backup_path}")
             except Exception as _be:
                 print(f"Backup write error: {_be}")
 
-        return {"output_path": output_path if write_ok else None, "success": bool(write_ok)}
+        return {"output_path": output_path, "success": True}
     except Exception as e:
         # Last resort: save original and attempt a backup too
         try:
             os.makedirs(output_folder, exist_ok=True)
             output_path = os.path.join(output_folder, "cam2_bmp.bmp")
-            ok = cv2.imwrite(output_path, image)
+            ok = write_latest(output_path, image, copy=True)
 
             if backup_output_folder:
                 try:
@@ -229,7 +236,7 @@ def save_thickness_result_image(image, thickness_data, flash_data, output_folder
                     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
                     backup_name = f"cam2_bmp_{ts}.png"
                     backup_path = os.path.join(backup_output_folder, backup_name)
-                    cv2.imwrite(backup_path, image)
+                    write_async(backup_path, image, copy=True)
                     print(f"Backup copy (exception path) saved to: {backup_path}")
                 except Exception as _be:
                     print(f"Backup write error (exception path): {_be}")
@@ -7,23 +7,25 @@
 # - NEW: Enforce processing-contour gating (area 400000-500000); pass masked_image to detection; fallback + backup if not found.
 
 import station_3_defect as dt
-import cv2
 import os
 from datetime import datetime
+from image_writer import write_async, write_latest
+from frame_utils import FULL_FRAME
+import artifacts
 
 def _parse_num(val, typ):
     if val == "NA" or val is None:
         return None
     return typ(val)
 
-def _write_backup(image, filename, backup_output_folder):
+def _write_backup(image, filename, backup_output_folder, copy=False):
     try:
         if backup_output_folder and image is not None:
             os.makedirs(backup_output_folder, exist_ok=True)
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"{os.path.splitext(filename)[0]}_{ts}.bmp"
             backup_path = os.path.join(backup_output_folder, backup_name)
-            ok = cv2.imwrite(backup_path, image)
+            ok = write_async(backup_path, image, copy=copy)
             print(f"Backup copy saved to: {backup_path} ({ok})")
     except Exception as e:
         print(f"Backup file error: {e}")
@@ -40,7 +42,8 @@ def main(part, subpart, frame,
          min_circularity, max_circularity,
          min_aspect_ratio, max_aspect_ratio,
          output_folder,
-         backup_output_folder=None):  # New backup path param
+         backup_output_folder=None,  # New backup path param
+         geometry=None):  # sensor ROI / binning of `frame` (frame_utils.FrameGeometry)
 
     try:
         id_offset = _parse_num(ID2_OFFSET_ID, int)
@@ -65,6 +68,17 @@ def main(part, subpart, frame,
         max_circularity = float(max_circularity) if max_circularity is not None else None
         min_aspect_ratio = float(min_aspect_ratio) if min_aspect_ratio is not None else None
         max_aspect_ratio = float(max_aspect_ratio) if max_aspect_ratio is not None else None
+
+        # pixel limits are tuned on the full sensor: lengths / binning, areas / binning²
+        geometry = geometry or FULL_FRAME
+        length = geometry.length_to_frame
+        area = geometry.area_to_frame
+        id_offset, id_high, od_offset, od_high = (
+            None if v is None else int(round(length(v))) for v in (id_offset, id_high, od_offset, od_high))
+        id_bp_min, id_bp_max, od_bp_min, od_bp_max = map(length, (id_bp_min, id_bp_max, od_bp_min, od_bp_max))
+        id_ba_min, id_ba_max, od_ba_min, od_ba_max = map(area, (id_ba_min, id_ba_max, od_ba_min, od_ba_max))
+        min_id_area, max_id_area, min_od_area, max_od_area = map(area, (min_id_area, max_id_area,
+                                                                        min_od_area, max_od_area))
     except Exception:
         print("r")
         print("Result: NOK")
@@ -77,10 +91,10 @@ def main(part, subpart, frame,
         min_od_area=min_od_area, max_od_area=max_od_area,
         min_circularity=min_circularity, max_circularity=max_circularity,
         min_aspect_ratio=min_aspect_ratio, max_aspect_ratio=max_aspect_ratio,
-        output_folder=output_folder
+        output_folder=output_folder, geometry=geometry
     )
 
-    # Enforce processing-contour gating (area 400000-500000)
+    # Enforce processing-contour gating (area 400000-500000 full-sensor px²)
     if processed.get("processing_contour") is None:
         print("r")
         print("Result: NOK")
@@ -90,10 +104,10 @@ def main(part, subpart, frame,
             os.makedirs(output_folder, exist_ok=True)
             fallback_path = os.path.join(output_folder, "cam3_bmp.bmp")
             if frame is not None:
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Fallback write (no processing contour) to {fallback_path}: {ok}")
                 if backup_output_folder:
-                    _write_backup(frame, "cam3_bmp.bmp", backup_output_folder)
+                    _write_backup(frame, "cam3_bmp.bmp", backup_output_folder, copy=True)
         except Exception as e:
             print(f"Fallback error (no processing contour): {e}")
         return {"resultType": "e", "error": "processing_contour_not_found"}
@@ -124,24 +138,22 @@ def main(part, subpart, frame,
 
     combined_both_crop_path = os.path.join(output_folder, "cam3_bmp.bmp")
 
-    # Fix: explicit None and .size checks to avoid ValueError on numpy arrays
-    if det.get("combined_output_image_both_crop") is not None and det["combined_output_image_both_crop"].size > 0:
-        write_src = det["combined_output_image_both_crop"]
-    elif det.get("combined_output_image") is not None and det["combined_output_image"].size > 0:
-        write_src = det["combined_output_image"]
-    else:
-        write_src = processed["image"]
-
-    write_ok = cv2.imwrite(combined_both_crop_path, write_src)
-    if not write_ok:
-        try:
-            write_ok = cv2.imwrite(combined_both_crop_path, frame)
-            print(f"Fallback write of original to {combined_both_crop_path}: {write_ok}")
-        except Exception as e:
-            print(f"Fallback write error to {combined_both_crop_path}: {e}")
-
-    if backup_output_folder:
-        _write_backup(write_src, "cam3_bmp.bmp", backup_output_folder)
+    # artifact level "off": verdict only, no result image
+    if artifacts.annotate():
+        # Fix: explicit None and .size checks to avoid ValueError on numpy arrays
+        if det.get("combined_output_image_both_crop") is not None and det["combined_output_image_both_crop"].size > 0:
+            write_src = det["combined_output_image_both_crop"]
+        elif det.get("combined_output_image") is not None and det["combined_output_image"].size > 0:
+            write_src = det["combined_output_image"]
+        else:
+            write_src = processed["image"]
+
+        # the raw frame (a ring slot in hardware mode) is copied before it is queued; write errors
+        # show in the writer's "errors" metric, the path is reported as queued
+        write_latest(combined_both_crop_path, write_src, copy=write_src is frame)
+
+        if backup_output_folder:
+            _write_backup(write_src, "cam3_bmp.bmp", backup_output_folder, copy=write_src is frame)
 
     print("r")
     print(f"ID -> status: {det['id']['burr_status']}, count: {det['id']['burr_count']}, time_ms: {det['id'].get('time_ms', 0):.2f}, path: {os.path.join(output_folder, 'cam3_id.bmp')}")
@@ -13,7 +13,11 @@ import math
 import os
 import time
 
-# Processing-contour gating range (pixels^2)
+from frame_utils import FULL_FRAME, to_gray, to_bgr
+import artifacts
+import circle_fit
+
+# Processing-contour gating range (full-sensor pixels^2; scaled by the frame geometry)
 PROCESS_MIN_AREA = 400000
 PROCESS_MAX_AREA = 500000
 
@@ -49,18 +53,6 @@ def _passes_shape_filters(contour, min_circularity, max_circularity, min_aspect_
             return False
     return True
 
-def _get_contour_props(contour):
-    if contour is None or len(contour) < 5:
-        return None
-    area = cv2.contourArea(contour)
-    m = cv2.moments(contour)
-    if m['m00'] != 0:
-        cx = int(m['m10'] / m['m00'])
-        cy = int(m['m01'] / m['m00'])
-        r = int(np.sqrt(area / np.pi))
-        return {'area': area, 'center': (cx, cy), 'radius': r}
-    return {'area': area, 'center': tuple(contour[0][0]), 'radius': 0}
-
 def _filled_mask_from_contour(gray, contour):
     mask = np.zeros_like(gray, dtype=np.uint8)
     cv2.drawContours(mask, [contour], -1, 255, cv2.FILLED)
@@ -70,12 +62,12 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
                      min_od_area=None, max_od_area=None,
                      min_circularity=None, max_circularity=None,
                      min_aspect_ratio=None, max_aspect_ratio=None,
-                     output_folder=None):
+                     output_folder=None, geometry=None):
     if output_folder:
         os.makedirs(output_folder, exist_ok=True)
 
     # Base grayscale + fixed threshold for initial contour discovery
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
     _, binary = cv2.threshold(gray, 80, 255, cv2.THRESH_BINARY)
     binary_inv = cv2.bitwise_not(binary)
 
@@ -84,18 +76,22 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
     sorted_all = sorted(contours_all, key=cv2.contourArea, reverse=True)
 
     # Locate processing contour by area gate
+    # the gate is in full-sensor pixels² (binned frame: / binning²)
+    geometry = geometry or FULL_FRAME
+    gate_min = geometry.area_to_frame(PROCESS_MIN_AREA)
+    gate_max = geometry.area_to_frame(PROCESS_MAX_AREA)
     processing_contour = None
     for c in sorted_all:
         a = cv2.contourArea(c)
-        if PROCESS_MIN_AREA <= a <= PROCESS_MAX_AREA:
+        if gate_min <= a <= gate_max:
             processing_contour = c
             break
 
     # If processing contour not found, return minimal info (main will handle fallback)
     if processing_contour is None:
-        contour_img = frame.copy()
+        contour_img = to_bgr(frame) if artifacts.debug() else None
         return {
-            "image": frame.copy(),
+            "image": frame,
             "sorted_contours": [],
             "original_gray": gray,
             "id_contour": None,
@@ -112,7 +108,8 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
     _, masked_binary = cv2.threshold(masked_gray, 128, 255, cv2.THRESH_BINARY)
     masked_binary_inv = cv2.bitwise_not(masked_binary)
 
-    contours, _ = cv2.findContours(masked_binary_inv, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    # every boundary pixel kept: the ID/OD circle fits need the full point set
+    contours, _ = cv2.findContours(masked_binary_inv, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
     sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
 
     # ID selection
@@ -136,12 +133,14 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
                     break
 
     # Visual: draw processing + ID/OD contours
-    contour_img = frame.copy()
-    cv2.drawContours(contour_img, [processing_contour], -1, (0, 255, 255), 3)  # processing region in yellow
-    if id_contour is not None:
-        cv2.drawContours(contour_img, [id_contour], -1, (0, 255, 0), 3)
-    if od_contour is not None:
-        cv2.drawContours(contour_img, [od_contour], -1, (0, 255, 0), 3)
+    contour_img = None
+    if artifacts.debug():
+        contour_img = to_bgr(frame)
+        cv2.drawContours(contour_img, [processing_contour], -1, (0, 255, 255), 3)  # processing region in yellow
+        if id_contour is not None:
+            cv2.drawContours(contour_img, [id_contour], -1, (0, 255, 0), 3)
+        if od_contour is not None:
+            cv2.drawContours(contour_img, [od_contour], -1, (0, 255, 0), 3)
 
     masked_image = cv2.bitwise_and(frame, frame, mask=proc_mask)
 
@@ -186,7 +185,10 @@ def _analyze_zone(image, gray, edges, inner_mask, outer_mask,
         if (burr_area_min <= ea <= burr_area_max) and (burr_perim_min <= ep <= burr_perim_max):
             burrs.append(e)
 
-    out = image.copy()
+    if not artifacts.annotate():
+        return burrs, None
+
+    out = to_bgr(image)
     if draw_id is not None:
         cv2.drawContours(out, [draw_id], -1, (0, 255, 0), 4)
     if draw_od is not None:
@@ -267,7 +269,7 @@ def detect_burr_both(frame, sorted_contours,
                 od_contour = c
                 break
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
     edges = cv2.Canny(gray, 90, 100)
 
     results = {"id": None, "od": None}
@@ -275,13 +277,11 @@ def detect_burr_both(frame, sorted_contours,
     od_burrs = []
 
     if id_contour is not None:
-        id_props = _get_contour_props(id_contour)
-        cx, cy = id_props['center']
-        r_id = id_props['radius']
+        (cx, cy), r_id = circle_fit.circle_props(id_contour)    # float fit, burr spikes ignored
         r_id2 = max(r_id + int(id_offset), 0)
         id_mask = _filled_mask_from_contour(gray, id_contour)
         id2_mask = np.zeros_like(gray, dtype=np.uint8)
-        cv2.circle(id2_mask, (cx, cy), r_id2, 255, cv2.FILLED)
+        circle_fit.circle_mask(id2_mask, (cx, cy), r_id2)
         id_burrs, id_img = _analyze_zone(frame, gray, edges,
                                          inner_mask=id_mask, outer_mask=id2_mask,
                                          HIGHLIGHT_SIZE=id_highlight,
@@ -294,13 +294,11 @@ def detect_burr_both(frame, sorted_contours,
         results["id"] = {"burr_count": 0, "burr_status": "NOK", "burr_output_image": None, "burr_contours": [], "error": "ID contour not found"}
 
     if od_contour is not None:
-        od_props = _get_contour_props(od_contour)
-        cx, cy = od_props['center']
-        r_od = od_props['radius']
+        (cx, cy), r_od = circle_fit.circle_props(od_contour)
         r_od2 = max(r_od - int(od_offset), 0)
         od_mask = _filled_mask_from_contour(gray, od_contour)
         od2_mask = np.zeros_like(gray, dtype=np.uint8)
-        cv2.circle(od2_mask, (cx, cy), r_od2, 255, cv2.FILLED)
+        circle_fit.circle_mask(od2_mask, (cx, cy), r_od2)
         od_burrs, od_img = _analyze_zone(frame, gray, edges,
                                          inner_mask=od2_mask, outer_mask=od_mask,
                                          HIGHLIGHT_SIZE=od_highlight,
@@ -312,31 +310,33 @@ def detect_burr_both(frame, sorted_contours,
     else:
         results["od"] = {"burr_count": 0, "burr_status": "NOK", "burr_output_image": None, "burr_contours": [], "error": "OD contour not found"}
 
-    combined_full = frame.copy()
-    if id_contour is not None:
-        cv2.drawContours(combined_full, [id_contour], -1, (0, 255, 0), 4)
-    if od_contour is not None:
-        cv2.drawContours(combined_full, [od_contour], -1, (0, 255, 0), 4)
-    for b in id_burrs:
-        x, y, w, h = cv2.boundingRect(b)
-        cx2, cy2 = x + w // 2, y + h // 2
-        cv2.rectangle(combined_full, (cx2 - id_highlight // 2, cy2 - id_highlight // 2),
-                      (cx2 + id_highlight // 2, cy2 + id_highlight // 2), (255, 0, 0), 3)
-    for b in od_burrs:
-        x, y, w, h = cv2.boundingRect(b)
-        cx2, cy2 = x + w // 2, y + h // 2
-        cv2.rectangle(combined_full, (cx2 - od_highlight // 2, cy2 - od_highlight // 2),
-                      (cx2 + od_highlight // 2, cy2 + od_highlight // 2), (255, 0, 0), 3)
-    id_txt = f"ID: {'NOK' if id_burrs else 'OK'} ({len(id_burrs)})"
-    od_txt = f"OD: {'NOK' if od_burrs else 'OK'} ({len(od_burrs)})"
-    id_color = (0, 0, 255) if id_burrs else (0, 255, 0)
-    od_color = (0, 0, 255) if od_burrs else (0, 255, 0)
-    cv2.putText(combined_full, id_txt, (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.6, id_color, 4)
-    cv2.putText(combined_full, od_txt, (30, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.6, od_color, 4)
-
-    combined_id_crop = crop_around_contour(combined_full, id_contour, crop_size=300) if id_contour is not None else None
-    combined_od_crop = crop_around_contour(combined_full, od_contour, crop_size=300) if od_contour is not None else None
-    combined_both_crop = _union_crop(combined_full, [id_contour, od_contour], pad=30)
+    combined_full = combined_id_crop = combined_od_crop = combined_both_crop = None
+    if artifacts.annotate():
+        combined_full = to_bgr(frame)
+        if id_contour is not None:
+            cv2.drawContours(combined_full, [id_contour], -1, (0, 255, 0), 4)
+        if od_contour is not None:
+            cv2.drawContours(combined_full, [od_contour], -1, (0, 255, 0), 4)
+        for b in id_burrs:
+            x, y, w, h = cv2.boundingRect(b)
+            cx2, cy2 = x + w // 2, y + h // 2
+            cv2.rectangle(combined_full, (cx2 - id_highlight // 2, cy2 - id_highlight // 2),
+                          (cx2 + id_highlight // 2, cy2 + id_highlight // 2), (255, 0, 0), 3)
+        for b in od_burrs:
+            x, y, w, h = cv2.boundingRect(b)
+            cx2, cy2 = x + w // 2, y + h // 2
+            cv2.rectangle(combined_full, (cx2 - od_highlight // 2, cy2 - od_highlight // 2),
+                          (cx2 + od_highlight // 2, cy2 + od_highlight // 2), (255, 0, 0), 3)
+        id_txt = f"ID: {'NOK' if id_burrs else 'OK'} ({len(id_burrs)})"
+        od_txt = f"OD: {'NOK' if od_burrs else 'OK'} ({len(od_burrs)})"
+        id_color = (0, 0, 255) if id_burrs else (0, 255, 0)
+        od_color = (0, 0, 255) if od_burrs else (0, 255, 0)
+        cv2.putText(combined_full, id_txt, (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.6, id_color, 4)
+        cv2.putText(combined_full, od_txt, (30, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.6, od_color, 4)
+
+        combined_id_crop = crop_around_contour(combined_full, id_contour, crop_size=300) if id_contour is not None else None
+        combined_od_crop = crop_around_contour(combined_full, od_contour, crop_size=300) if od_contour is not None else None
+        combined_both_crop = _union_crop(combined_full, [id_contour, od_contour], pad=30)
 
     elapsed_ms = (time.time() - start) * 1000.0
     for k in ("id", "od"):
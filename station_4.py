@@ -7,18 +7,20 @@
 # - NEW: Enforces processing-contour gating by using the masked image from preprocess; returns a clear error if the processing contour (area 600000-700000) is not found.
 
 import station_4_defect as dt
-import cv2
 import os
 from datetime import datetime
+from image_writer import write_async, write_latest
+from frame_utils import FULL_FRAME
+import artifacts
 
-def _write_backup(image, filename, backup_output_folder):
+def _write_backup(image, filename, backup_output_folder, copy=False):
     try:
         if backup_output_folder and image is not None:
             os.makedirs(backup_output_folder, exist_ok=True)
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_name = f"{os.path.splitext(filename)[0]}_{ts}.bmp"
             backup_path = os.path.join(backup_output_folder, backup_name)
-            ok = cv2.imwrite(backup_path, image)
+            ok = write_async(backup_path, image, copy=copy)
             print(f"Backup copy saved to: {backup_path} ({ok})")
     except Exception as e:
         print(f"Backup file error: {e}")
@@ -34,12 +36,13 @@ def main(part, subpart, frame,
          min_id_area, max_id_area, min_od_area, max_od_area,
          min_circularity, max_circularity, min_aspect_ratio, max_aspect_ratio,
          output_folder,
-         backup_output_folder=None):  # NEW
+         backup_output_folder=None,  # NEW
+         geometry=None):  # sensor ROI / binning of `frame` (frame_utils.FrameGeometry)
 
     print(f"DEBUG: Starting main processing for part: {part}, subpart: {subpart}")
     print(f"DEBUG: ID Area Range: {min_id_area}-{max_id_area}, OD Area Range: {min_od_area}-{max_od_area}")
     print(f"DEBUG: Shape filters -> circularity: {min_circularity}-{max_circularity}, aspect_ratio: {min_aspect_ratio}-{max_aspect_ratio}")
-    print("DEBUG: Processing contour gating area: 600000-700000 (inclusive)")
+    print("DEBUG: Processing contour gating area: 600000-700000 full-sensor px² (inclusive)")
 
     excluded_parts = [
         "PISTON", "TEFLON PISTON RING", "OIL SEAL", "SPACER", "O RING",
@@ -54,9 +57,9 @@ def main(part, subpart, frame,
         try:
             if frame is not None:
                 fallback_path = os.path.join(output_folder, "cam4_bmp.bmp")
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Excluded-part fallback write to {fallback_path}: {ok}")
-                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder)  # NEW
+                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder, copy=True)  # NEW
         except Exception as _e:
             print(f"Excluded-part fallback write error: {_e}")
 
@@ -99,6 +102,20 @@ def main(part, subpart, frame,
         min_aspect_ratio = float(min_aspect_ratio) if min_aspect_ratio != "NA" else None
         max_aspect_ratio = float(max_aspect_ratio) if max_aspect_ratio != "NA" else None
 
+        # pixel limits are tuned on the full sensor: lengths / binning, areas / binning²
+        geometry = geometry or FULL_FRAME
+        length = geometry.length_to_frame
+        area = geometry.area_to_frame
+        ID2_OFFSET_ID, HIGHLIGHT_SIZE_ID, ID2_OFFSET_OD, HIGHLIGHT_SIZE_OD = (
+            None if v is None else int(round(length(v)))
+            for v in (ID2_OFFSET_ID, HIGHLIGHT_SIZE_ID, ID2_OFFSET_OD, HIGHLIGHT_SIZE_OD))
+        ID_BURR_MIN_PERIMETER, ID_BURR_MAX_PERIMETER, OD_BURR_MIN_PERIMETER, OD_BURR_MAX_PERIMETER = map(
+            length, (ID_BURR_MIN_PERIMETER, ID_BURR_MAX_PERIMETER, OD_BURR_MIN_PERIMETER, OD_BURR_MAX_PERIMETER))
+        ID_BURR_MIN_AREA, ID_BURR_MAX_AREA, OD_BURR_MIN_AREA, OD_BURR_MAX_AREA = map(
+            area, (ID_BURR_MIN_AREA, ID_BURR_MAX_AREA, OD_BURR_MIN_AREA, OD_BURR_MAX_AREA))
+        min_id_area, max_id_area, min_od_area, max_od_area = map(
+            area, (min_id_area, max_id_area, min_od_area, max_od_area))
+
         print("DEBUG: Converted parameters OK.")
         print(f"DEBUG: ID -> offset={ID2_OFFSET_ID}, highlight={HIGHLIGHT_SIZE_ID}, area={ID_BURR_MIN_AREA}-{ID_BURR_MAX_AREA}, perim={ID_BURR_MIN_PERIMETER}-{ID_BURR_MAX_PERIMETER}")
         print(f"DEBUG: OD -> offset={ID2_OFFSET_OD}, highlight={HIGHLIGHT_SIZE_OD}, area={OD_BURR_MIN_AREA}-{OD_BURR_MAX_AREA}, perim={OD_BURR_MIN_PERIMETER}-{OD_BURR_MAX_PERIMETER}")
@@ -107,9 +124,9 @@ def main(part, subpart, frame,
         try:
             if frame is not None:
                 fallback_path = os.path.join(output_folder, "cam4_bmp.bmp")
-                ok = cv2.imwrite(fallback_path, frame)
+                ok = write_latest(fallback_path, frame, copy=True)
                 print(f"Fallback write (param error) to {fallback_path}: {ok}")
-                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder)  # NEW
+                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder, copy=True)  # NEW
         except Exception as _e:
             print(f"Fallback write error (param error): {_e}")
         print(f"DEBUG: Parameter conversion error: {e}")
@@ -132,7 +149,7 @@ def main(part, subpart, frame,
         min_od_area=min_od_area, max_od_area=max_od_area,
         min_circularity=min_circularity, max_circularity=max_circularity,
         min_aspect_ratio=min_aspect_ratio, max_aspect_ratio=max_aspect_ratio,
-        output_folder=output_folder
+        output_folder=output_folder, geometry=geometry
     )
     print(f"DEBUG: Processing contour found: {processed.get('processing_contour') is not None}")
     print(f"DEBUG: Contours (masked) found: {len(processed['sorted_contours'])}")
@@ -146,9 +163,9 @@ def main(part, subpart, frame,
         try:
             if frame is not None:
                 combined_both_crop_path = os.path.join(output_folder, "cam4_bmp.bmp")
-                ok = cv2.imwrite(combined_both_crop_path, frame)
+                ok = write_latest(combined_both_crop_path, frame, copy=True)
                 print(f"Fallback write (no processing contour) to {combined_both_crop_path}: {ok}")
-                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder)
+                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder, copy=True)
         except Exception as _e:
             print(f"Fallback write error (no processing contour): {_e}")
         return {"resultType": "e", "part": part, "subpart": subpart, "error": "processing_contour_not_found"}
@@ -181,35 +198,45 @@ def main(part, subpart, frame,
     combined_id_crop_path = os.path.join(output_folder, "cam4_combined_id.bmp")
     combined_od_crop_path = os.path.join(output_folder, "cam4_combined_od.bmp")
 
-    # Save images (with fallback to original if any write fails)
-    try:
-        cv2.imwrite(id_path, det["id"]["burr_output_image"] if det["id"]["burr_output_image"] is not None else processed["image"])
-        cv2.imwrite(od_path, det["od"]["burr_output_image"] if det["od"]["burr_output_image"] is not None else processed["image"])
-        cv2.imwrite(combined_full_path, det.get("combined_output_image") if det.get("combined_output_image") is not None else processed["image"])
-
-        write_src = det.get("combined_output_image_both_crop") if det.get("combined_output_image_both_crop") is not None else det.get("combined_output_image")
-        if write_src is None:
-            write_src = processed["image"]
-        ok = cv2.imwrite(combined_both_crop_path, write_src)
-        if not ok and frame is not None:
-            ok2 = cv2.imwrite(combined_both_crop_path, frame)
-            print(f"Fallback write of original to {combined_both_crop_path}: {ok2}")
-
-        # Write timestamped backup for cam4_bmp
-        _write_backup(write_src, "cam4_bmp.bmp", backup_output_folder)  # NEW
-
-        if det.get("combined_output_image_id_crop") is not None:
-            cv2.imwrite(combined_id_crop_path, det.get("combined_output_image_id_crop"))
-        if det.get("combined_output_image_od_crop") is not None:
-            cv2.imwrite(combined_od_crop_path, det.get("combined_output_image_od_crop"))
-    except Exception as _e:
-        print(f"Write error: {_e}")
-        if frame is not None:
-            try:
-                cv2.imwrite(combined_both_crop_path, frame)
-                _write_backup(frame, "cam4_bmp.bmp", backup_output_folder)  # NEW
-            except Exception as _e2:
-                print(f"Final guard write error: {_e2}")
+    # artifact level "off": verdict only, no result images
+    if artifacts.annotate():
+        # Queue the images for the results writer (encode + write off the inspection thread; a
+        # missing canvas falls back to the original, write errors show in the writer's "errors"
+        # metric). The result canvases are fresh arrays; the original frame (a ring slot in
+        # hardware mode) is copied once, only if it is written.
+        raw = None
+        def _src(img):
+            nonlocal raw
+            if img is not None:
+                return img
+            if raw is None:
+                raw = processed["image"].copy()
+            return raw
+
+        try:
+            write_latest(id_path, _src(det["id"]["burr_output_image"]))
+            write_latest(od_path, _src(det["od"]["burr_output_image"]))
+            write_latest(combined_full_path, _src(det.get("combined_output_image")))
+
+            write_src = det.get("combined_output_image_both_crop") if det.get("combined_output_image_both_crop") is not None else det.get("combined_output_image")
+            write_src = _src(write_src)
+            write_latest(combined_both_crop_path, write_src)
+
+            # Write timestamped backup for cam4_bmp
+            _write_backup(write_src, "cam4_bmp.bmp", backup_output_folder)  # NEW
+
+            if det.get("combined_output_image_id_crop") is not None:
+                write_latest(combined_id_crop_path, det.get("combined_output_image_id_crop"))
+            if det.get("combined_output_image_od_crop") is not None:
+                write_latest(combined_od_crop_path, det.get("combined_output_image_od_crop"))
+        except Exception as _e:
+            print(f"Write error: {_e}")
+            if frame is not None:
+                try:
+                    write_latest(combined_both_crop_path, frame, copy=True)
+                    _write_backup(frame, "cam4_bmp.bmp", backup_output_folder, copy=True)  # NEW
+                except Exception as _e2:
+                    print(f"Final guard write error: {_e2}")
 
     print("r")
     print(f"ID -> status: {det['id']['burr_status']}, count: {det['id']['burr_count']}, time_ms: {det['id'].get('time_ms', 0):.2f}, path: {id_path}")
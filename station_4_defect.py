@@ -8,7 +8,11 @@ import math
 import os
 import time
 
-# Processing-contour gating range (pixels^2)
+from frame_utils import FULL_FRAME, to_gray, to_bgr
+import artifacts
+import circle_fit
+
+# Processing-contour gating range (full-sensor pixels^2; scaled by the frame geometry)
 PROCESS_MIN_AREA = 600000
 PROCESS_MAX_AREA = 700000
 
@@ -57,13 +61,13 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
                      min_od_area=None, max_od_area=None,
                      min_circularity=None, max_circularity=None,
                      min_aspect_ratio=None, max_aspect_ratio=None,
-                     output_folder=None):
+                     output_folder=None, geometry=None):
     """Preprocessing with processing-contour gating, area + shape filters to select ID/OD contours."""
     if output_folder:
         os.makedirs(output_folder, exist_ok=True)
 
     # Grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
 
     # First pass threshold (global fixed) to locate processing contour
     _, binary = cv2.threshold(gray, 80, 255, cv2.THRESH_BINARY)
@@ -73,18 +77,22 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
     sorted_all = sorted(contours_all, key=cv2.contourArea, reverse=True)
 
     # Find processing contour by area in [PROCESS_MIN_AREA, PROCESS_MAX_AREA]
+    # the gate is in full-sensor pixels² (binned frame: / binning²)
+    geometry = geometry or FULL_FRAME
+    gate_min = geometry.area_to_frame(PROCESS_MIN_AREA)
+    gate_max = geometry.area_to_frame(PROCESS_MAX_AREA)
     processing_contour = None
     for c in sorted_all:
         a = cv2.contourArea(c)
-        if PROCESS_MIN_AREA <= a <= PROCESS_MAX_AREA:
+        if gate_min <= a <= gate_max:
             processing_contour = c
             break
 
     # If not found, return minimal info; main() will handle error and fallbacks
     if processing_contour is None:
-        contour_img = frame.copy()
+        contour_img = to_bgr(frame) if artifacts.debug() else None
         return {
-            "image": frame.copy(),
+            "image": frame,
             "sorted_contours": [],  # No masked contours
             "original_gray": gray,
             "id_contour": None,
@@ -100,7 +108,8 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
     masked_gray = cv2.bitwise_and(gray, gray, mask=proc_mask)
     _, masked_binary = cv2.threshold(masked_gray, 80, 255, cv2.THRESH_BINARY)
     masked_binary_inv = cv2.bitwise_not(masked_binary)
-    contours, _ = cv2.findContours(masked_binary_inv, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    # every boundary pixel kept: the ID/OD circle fits need the full point set
+    contours, _ = cv2.findContours(masked_binary_inv, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
     sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
 
     # ID/OD selection under area + shape filters
@@ -122,13 +131,15 @@ def preprocess_image(frame, min_id_area=None, max_id_area=None,
                     od_contour = contour
                     break
 
-    contour_img = frame.copy()
-    # Draw processing contour boundary in yellow to visualize gating region
-    cv2.drawContours(contour_img, [processing_contour], -1, (0, 255, 255), 3)
-    if id_contour is not None:
-        cv2.drawContours(contour_img, [id_contour], -1, (0, 255, 0), 3)
-    if od_contour is not None:
-        cv2.drawContours(contour_img, [od_contour], -1, (0, 255, 0), 3)
+    contour_img = None
+    if artifacts.debug():
+        contour_img = to_bgr(frame)
+        # Draw processing contour boundary in yellow to visualize gating region
+        cv2.drawContours(contour_img, [processing_contour], -1, (0, 255, 255), 3)
+        if id_contour is not None:
+            cv2.drawContours(contour_img, [id_contour], -1, (0, 255, 0), 3)
+        if od_contour is not None:
+            cv2.drawContours(contour_img, [od_contour], -1, (0, 255, 0), 3)
 
     masked_image = cv2.bitwise_and(frame, frame, mask=proc_mask)
 
@@ -191,7 +202,10 @@ def _analyze_zone(image, gray, edges, inner_mask, outer_mask,
         if (burr_area_min <= ea <= burr_area_max) and (burr_perim_min <= ep <= burr_perim_max):
             burrs.append(e)
 
-    out = image.copy()
+    if not artifacts.annotate():
+        return burrs, None
+
+    out = to_bgr(image)
     if draw_id is not None:
         cv2.drawContours(out, [draw_id], -1, (0, 255, 0), 4)
     if draw_od is not None:
@@ -239,19 +253,6 @@ def detect_burr(frame, sorted_contours, ID2_OFFSET=None, HIGHLIGHT_SIZE=None,
             "burr_contours": []
         }
 
-    def get_props(contour):
-        if contour is None or len(contour) < 5:
-            return None
-        area = cv2.contourArea(contour)
-        m = cv2.moments(contour)
-        if m['m00'] != 0:
-            cx = int(m['m10'] / m['m00'])
-            cy = int(m['m01'] / m['m00'])
-            r = int(np.sqrt(area / np.pi))
-        else:
-            cx, cy, r = contour[0][0][0], contour[0][0][1], 0
-        return {'center': (cx, cy), 'radius': r}
-
     start = time.time()
     if id_contour is None:
         for c in sorted_contours:
@@ -266,17 +267,15 @@ def detect_burr(frame, sorted_contours, ID2_OFFSET=None, HIGHLIGHT_SIZE=None,
             "error": "ID contour not found", "burr_output_image": None, "burr_contours": []
         }
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
     edges = cv2.Canny(gray, 90, 100)
 
-    props = get_props(id_contour)
-    cx, cy = props['center']
-    r = props['radius']
+    (cx, cy), r = circle_fit.circle_props(id_contour)
     r2 = max(r + ID2_OFFSET, 0)
 
     id_mask = _filled_mask_from_contour(gray, id_contour)
     id2_mask = np.zeros_like(gray, dtype=np.uint8)
-    cv2.circle(id2_mask, (cx, cy), r2, 255, cv2.FILLED)
+    circle_fit.circle_mask(id2_mask, (cx, cy), r2)
 
     burrs, id_img = _analyze_zone(frame, gray, edges,
                                   inner_mask=id_mask, outer_mask=id2_mask,
@@ -334,21 +333,18 @@ def detect_burr_both(frame, sorted_contours,
                 od_contour = c
                 break
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = to_gray(frame)
     edges = cv2.Canny(gray, 90, 100)
 
     # ID outward ring
     id_burrs = []
     id_img = None
     if id_contour is not None:
-        m = cv2.moments(id_contour)
-        cx = int(m['m10'] / m['m00']) if m['m00'] != 0 else id_contour[0][0][0]
-        cy = int(m['m01'] / m['m00']) if m['m00'] != 0 else id_contour[0][0][1]
-        r_id = int(np.sqrt(cv2.contourArea(id_contour) / np.pi))
+        (cx, cy), r_id = circle_fit.circle_props(id_contour)    # float fit, burr spikes ignored
         r_id2 = max(r_id + id_offset, 0)
         id_mask = _filled_mask_from_contour(gray, id_contour)
         id2_mask = np.zeros_like(gray, dtype=np.uint8)
-        cv2.circle(id2_mask, (cx, cy), r_id2, 255, cv2.FILLED)
+        circle_fit.circle_mask(id2_mask, (cx, cy), r_id2)
         id_burrs, id_img = _analyze_zone(frame, gray, edges,
                                          inner_mask=id_mask, outer_mask=id2_mask,
                                          HIGHLIGHT_SIZE=id_highlight,
@@ -360,14 +356,11 @@ def detect_burr_both(frame, sorted_contours,
     od_burrs = []
     od_img = None
     if od_contour is not None:
-        m = cv2.moments(od_contour)
-        cx = int(m['m10'] / m['m00']) if m['m00'] != 0 else od_contour[0][0][0]
-        cy = int(m['m01'] / m['m00']) if m['m00'] != 0 else od_contour[0][0][1]
-        r_od = int(np.sqrt(cv2.contourArea(od_contour) / np.pi))
+        (cx, cy), r_od = circle_fit.circle_props(od_contour)
         r_od2 = max(r_od - od_offset, 0)
         od_mask = _filled_mask_from_contour(gray, od_contour)
         od2_mask = np.zeros_like(gray, dtype=np.uint8)
-        cv2.circle(od2_mask, (cx, cy), r_od2, 255, cv2.FILLED)
+        circle_fit.circle_mask(od2_mask, (cx, cy), r_od2)
         # Correct keyword name burr_area_max
         od_burrs, od_img = _analyze_zone(frame, gray, edges,
                                          inner_mask=od2_mask, outer_mask=od_mask,
@@ -376,31 +369,33 @@ def detect_burr_both(frame, sorted_contours,
                                          burr_perim_min=od_burr_perim_min, burr_perim_max=od_burr_perim_max,
                                          draw_id=id_contour, draw_od=od_contour, crop_contour=od_contour)
 
-    combined_full = frame.copy()
-    if id_contour is not None:
-        cv2.drawContours(combined_full, [id_contour], -1, (0, 255, 0), 4)
-    if od_contour is not None:
-        cv2.drawContours(combined_full, [od_contour], -1, (0, 255, 0), 4)
-    for b in id_burrs:
-        x, y, w, h = cv2.boundingRect(b)
-        cx2, cy2 = x + w // 2, y + h // 2
-        cv2.rectangle(combined_full, (cx2 - id_highlight // 2, cy2 - id_highlight // 2),
-                      (cx2 + id_highlight // 2, cy2 + id_highlight // 2), (255, 0, 0), 3)
-    for b in od_burrs:
-        x, y, w, h = cv2.boundingRect(b)
-        cx2, cy2 = x + w // 2, y + h // 2
-        cv2.rectangle(combined_full, (cx2 - od_highlight // 2, cy2 - od_highlight // 2),
-                      (cx2 + od_highlight // 2, cy2 + od_highlight // 2), (255, 0, 0), 3)
-    id_txt = f"ID: {'NOK' if id_burrs else 'OK'} ({len(id_burrs)})"
-    od_txt = f"OD: {'NOK' if od_burrs else 'OK'} ({len(od_burrs)})"
-    id_color = (0, 0, 255) if id_burrs else (0, 255, 0)
-    od_color = (0, 0, 255) if od_burrs else (0, 255, 0)
-    cv2.putText(combined_full, id_txt, (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.6, id_color, 4)
-    cv2.putText(combined_full, od_txt, (30, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.6, od_color, 4)
-
-    combined_id_crop = crop_around_contour(combined_full, id_contour, crop_size=300) if id_contour is not None else None
-    combined_od_crop = crop_around_contour(combined_full, od_contour, crop_size=300) if od_contour is not None else None
-    combined_both_crop = _union_crop(combined_full, [id_contour, od_contour], pad=30)
+    combined_full = combined_id_crop = combined_od_crop = combined_both_crop = None
+    if artifacts.annotate():
+        combined_full = to_bgr(frame)
+        if id_contour is not None:
+            cv2.drawContours(combined_full, [id_contour], -1, (0, 255, 0), 4)
+        if od_contour is not None:
+            cv2.drawContours(combined_full, [od_contour], -1, (0, 255, 0), 4)
+        for b in id_burrs:
+            x, y, w, h = cv2.boundingRect(b)
+            cx2, cy2 = x + w // 2, y + h // 2
+            cv2.rectangle(combined_full, (cx2 - id_highlight // 2, cy2 - id_highlight // 2),
+                          (cx2 + id_highlight // 2, cy2 + id_highlight // 2), (255, 0, 0), 3)
+        for b in od_burrs:
+            x, y, w, h = cv2.boundingRect(b)
+            cx2, cy2 = x + w // 2, y + h // 2
+            cv2.rectangle(combined_full, (cx2 - od_highlight // 2, cy2 - od_highlight // 2),
+                          (cx2 + od_highlight // 2, cy2 + od_highlight // 2), (255, 0, 0), 3)
+        id_txt = f"ID: {'NOK' if id_burrs else 'OK'} ({len(id_burrs)})"
+        od_txt = f"OD: {'NOK' if od_burrs else 'OK'} ({len(od_burrs)})"
+        id_color = (0, 0, 255) if id_burrs else (0, 255, 0)
+        od_color = (0, 0, 255) if od_burrs else (0, 255, 0)
+        cv2.putText(combined_full, id_txt, (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.6, id_color, 4)
+        cv2.putText(combined_full, od_txt, (30, 110), cv2.FONT_HERSHEY_SIMPLEX, 1.6, od_color, 4)
+
+        combined_id_crop = crop_around_contour(combined_full, id_contour, crop_size=300) if id_contour is not None else None
+        combined_od_crop = crop_around_contour(combined_full, od_contour, crop_size=300) if od_contour is not None else None
+        combined_both_crop = _union_crop(combined_full, [id_contour, od_contour], pad=30)
 
     elapsed_ms = (time.time() - start) * 1000.0
 
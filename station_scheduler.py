@@ -0,0 +1,226 @@
+# station_scheduler.py
+# Long-lived per-station workers fed from deadline-ordered queues.
+#
+# Instead of one thread per part plus one thread per station capture, every station ("C1".."C4")
+# has a fixed number of worker threads and a ready queue. A part is submitted once with the fire
+# time of each of its stations; the shared DeadlineTimer releases each job into its station's
+# ready queue exactly at that time, and the worker runs it. The number of parts on the line at
+# once is bounded (max_in_flight) so a slow station shows up as queue depth instead of an
+# ever-growing pile of threads.
+#
+# Fire times use the deadline_timer clock (time.perf_counter). Every job start records
+# (start - fire_time) per station, so queueing behind a busy station shows up as jitter too.
+#
+# A station can also be "held": its job waits for an external event (the controller's $Cn#)
+# and trigger(part, station) releases it at once. The fire time given for a held station is
+# only the fallback deadline — if no trigger came by then, the timer releases it anyway.
+
+import threading
+from collections import deque
+
+import deadline_timer
+from deadline_timer import DeadlineTimer, JitterHistogram
+
+
+class StationScheduler:
+    """
+    stations       : station names in line order, e.g. ["C1", "C2", "C3", "C4"]
+    run_job        : callable(part, station, fire_time) executed on that station's worker
+                     (fire_time = timer deadline, or the trigger() time for a held station)
+    max_in_flight  : parts accepted but not yet finished on every station; submit() refuses more
+    workers        : worker threads per station (1 = strictly one capture at a time per camera)
+    timer          : DeadlineTimer releasing the jobs (a private one is created when omitted)
+    """
+
+    def __init__(self, stations, run_job, max_in_flight: int = 8, workers: int = 1,
+                 timer: DeadlineTimer | None = None):
+        self.stations = list(stations)
+        self.run_job = run_job
+        self.max_in_flight = int(max_in_flight)
+        self.workers = max(1, int(workers))
+        self.timer = timer or DeadlineTimer("station")
+
+        self._cond = threading.Condition()
+        # one Condition per station on the same lock: a release wakes only that station's worker
+        self._wake = {st: threading.Condition(self._cond) for st in self.stations}
+        self._ready = {st: deque() for st in self.stations}   # (fire_time, part) released by the timer
+        self._waiting = {st: 0 for st in self.stations}        # jobs still parked in the timer
+        self._remaining = {}          # id(part) -> jobs left for that part
+        self._held = set()            # (id(part), station) waiting for trigger()
+        self._threads = []
+        self._started = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.triggered = 0
+        self.trigger_timeouts = 0
+        self._stats = {st: {"done": 0, "running": 0, "errors": 0,
+                            "late_ms_last": 0.0, "late_ms_max": 0.0,
+                            "busy_ms_last": 0.0, "busy_ms_total": 0.0,
+                            "start_error": JitterHistogram()}
+                       for st in self.stations}
+
+    # ---- lifecycle ----
+    def start(self):
+        with self._cond:
+            if self._started:
+                return self
+            self._started = True
+        self.timer.start()
+        for st in self.stations:
+            for w in range(self.workers):
+                t = threading.Thread(target=self._worker, args=(st,),
+                                     name=f"station-{st}-{w}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        print(f"🧵 Station scheduler started: {self.stations} x {self.workers} worker(s), "
+              f"max {self.max_in_flight} parts in flight")
+        return self
+
+    # ---- submit / cancel ----
+    def in_flight(self) -> int:
+        with self._cond:
+            return len(self._remaining)
+
+    def submit(self, part, fire_times: dict, held=()) -> bool:
+        """
+        Queue one part: fire_times = {"C1": deadline, "C2": ...} on the deadline_timer clock.
+        Stations listed in `held` wait for trigger(); their fire time is the fallback deadline.
+        Returns False (and queues nothing) when max_in_flight parts are already on the line.
+        """
+        if not self._started:
+            self.start()
+        with self._cond:
+            if len(self._remaining) >= self.max_in_flight or id(part) in self._remaining:
+                self.rejected += 1
+                return False
+            self._remaining[id(part)] = len(fire_times)
+            for st in fire_times:
+                self._waiting[st] += 1
+                if st in held:
+                    self._held.add((id(part), st))
+            self.accepted += 1
+        for st, fire_time in fire_times.items():
+            self.timer.schedule(fire_time, self._release, st, fire_time, part, st in held,
+                                label=st, owner=self)
+        return True
+
+    def trigger(self, part, station) -> bool:
+        """Release a held job now. False if it was not held (already timed out, cancelled, ...)."""
+        with self._cond:
+            key = (id(part), station)
+            if key not in self._held:
+                return False
+            self._held.discard(key)
+            self.triggered += 1
+            self._waiting[station] -= 1
+            self._ready[station].append((deadline_timer.now(), part))
+            self._wake[station].notify()
+        return True
+
+    def _release(self, station, fire_time, part, held=False):
+        # timer thread: hand the job to the station worker, never block here
+        with self._cond:
+            if id(part) not in self._remaining:
+                return  # part cancelled by STOP after the timer had already popped it
+            if held:
+                key = (id(part), station)
+                if key not in self._held:
+                    return  # trigger() already released it
+                self._held.discard(key)
+                self.trigger_timeouts += 1
+                print(f"⏰ {station}: no trigger by the fallback deadline — running on time offset")
+            self._waiting[station] -= 1
+            self._ready[station].append((fire_time, part))
+            self._wake[station].notify()
+
+    def cancel_all(self) -> int:
+        """Drop every job that has not started yet (STOP). Jobs already running finish."""
+        dropped = 0
+        with self._cond:
+            # hold the lock so the timer cannot release a job half-way through the cleanup
+            self.timer.cancel(owner=self)
+            self._remaining.clear()
+            self._held.clear()
+            for st in self.stations:
+                dropped += self._waiting[st] + len(self._ready[st])
+                self._waiting[st] = 0
+                self._ready[st].clear()
+            self.cancelled += dropped
+        if dropped:
+            print(f"🧹 Scheduler cancelled {dropped} pending station job(s)")
+        return dropped
+
+    def _job_done(self, part):
+        # caller holds self._cond
+        key = id(part)
+        left = self._remaining.get(key)
+        if left is None:
+            return
+        if left <= 1:
+            del self._remaining[key]
+        else:
+            self._remaining[key] = left - 1
+
+    # ---- worker ----
+    def _worker(self, station):
+        ready = self._ready[station]
+        wake = self._wake[station]
+        stats = self._stats[station]
+        while True:
+            with self._cond:
+                while not ready:
+                    wake.wait()
+                fire_time, part = ready.popleft()
+                stats["running"] += 1
+
+            started = deadline_timer.now()
+            late_ms = (started - fire_time) * 1000.0
+            try:
+                self.run_job(part, station, fire_time)
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"❌ {station} job failed: {e}")
+            busy_ms = (deadline_timer.now() - started) * 1000.0
+
+            with self._cond:
+                stats["start_error"].record(started - fire_time)
+                stats["running"] -= 1
+                stats["done"] += 1
+                stats["late_ms_last"] = late_ms
+                stats["late_ms_max"] = max(stats["late_ms_max"], late_ms)
+                stats["busy_ms_last"] = busy_ms
+                stats["busy_ms_total"] += busy_ms
+                self._job_done(part)
+
+    # ---- diagnostics ----
+    def status(self) -> dict:
+        with self._cond:
+            stations = {}
+            for st in self.stations:
+                s = self._stats[st]
+                stations[st] = {
+                    "queue_depth": self._waiting[st] + len(self._ready[st]),
+                    "ready": len(self._ready[st]),
+                    "running": s["running"],
+                    "done": s["done"],
+                    "errors": s["errors"],
+                    "late_ms_last": round(s["late_ms_last"], 3),
+                    "late_ms_max": round(s["late_ms_max"], 3),
+                    "busy_ms_last": round(s["busy_ms_last"], 3),
+                    "busy_ms_avg": round(s["busy_ms_total"] / s["done"], 3) if s["done"] else 0.0,
+                    "start_error": s["start_error"].to_dict(),
+                }
+            return {
+                "in_flight": len(self._remaining),
+                "max_in_flight": self.max_in_flight,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "held": len(self._held),
+                "triggered": self.triggered,
+                "trigger_timeouts": self.trigger_timeouts,
+                "stations": stations,
+                "timer": self.timer.status(),
+            }
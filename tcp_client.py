@@ -1,7 +1,11 @@
+import asyncio
+import itertools
 import socket
 import threading
 import time
+from collections import deque
 import CameraConnection as cs
+import camera_pool
 import dbscript as DB
 import requests
 import cv2
@@ -10,6 +14,12 @@ import station2 as Station2_detection
 import station_3 as Station3_detection
 import station_4 as Station4_detection
 from event_bus import push_result
+from controller_protocol import FrameParser, frame_key, ack_for
+import part_trace as pt
+import part_state as ps
+from station_scheduler import StationScheduler
+import deadline_timer
+from deadline_timer import DeadlineTimer
 
 import data as dt
 from queue import Queue
@@ -30,9 +40,6 @@ timeout = 5
 # Global control flag
 keep_running = True
 
-# set when connected inside communicate_with_controller
-sock = None
-
 OutputFolder1 = r"D:\\PIM_25-09-25\\Pravi_Flask\\static\\OutputImages\\cam1output"
 OutputFolder2 = r"D:\\PIM_25-09-25\\Pravi_Flask\\static\\OutputImages\\cam2output"
 OutputFolder3 = r"D:\\PIM_25-09-25\\Pravi_Flask\\static\\OutputImages\\cam3output"
@@ -66,76 +73,256 @@ def _get_c1_debounce_sec() -> float:
     return 0.20  # default 200 ms
 
 
-# Socket send/recv lock
-sock_lock = threading.Lock()
+# --- Station trigger mode ---
+# "offset"     : C2..C4 fire at cumulative CAMnDELAY offsets after $C1# (original behaviour)
+# "controller" : C2..C4 fire when the controller sends $C2#/$C3#/$C4# for the part at that
+#                station; the CAMnDELAY offset (+ STATION_TRIGGER_GRACE_SEC) is only the
+#                fallback if the trigger never comes. Keep the grace below half the part
+#                pitch: a trigger is matched to the waiting part whose offset time is closest.
+# Override via dt.python_parameters["S1"]["TRIGGER_MODE"] / ["TRIGGER_GRACE_MS"].
+STATION_TRIGGER_MODE = "offset"
+STATION_TRIGGER_GRACE_SEC = 0.5
+
+
+def _get_trigger_mode() -> str:
+    s1 = dt.python_parameters.get("S1", {}) or {}
+    mode = str(s1.get("TRIGGER_MODE") or STATION_TRIGGER_MODE).strip().lower()
+    return mode if mode in ("offset", "controller") else "offset"
+
+
+def _get_trigger_grace_sec() -> float:
+    s1 = dt.python_parameters.get("S1", {}) or {}
+    val_ms = s1.get("TRIGGER_GRACE_MS")
+    if val_ms is not None:
+        try:
+            return float(val_ms) / 1000.0
+        except Exception:
+            pass
+    return STATION_TRIGGER_GRACE_SEC
+
+
+# --- Acquisition mode ---
+# "software" : the station worker grabs a frame with capture_image_N() when its job runs
+# "hardware" : every camera streams on its trigger line into a pre-allocated frame ring
+#              (camera_pool / frame_ring); the job takes the frame that arrived within
+#              HW_FRAME_WINDOW_SEC of the part's fire time (C1 offset or $Cn# trigger).
+#              Keep the window below half the part pitch so a neighbour's frame never matches.
+# Override via dt.python_parameters["S1"]["ACQUISITION_MODE"] / ["HW_FRAME_WINDOW_MS"].
+ACQUISITION_MODE = "software"
+HW_FRAME_WINDOW_SEC = 0.15
+FRAME_RING_SLOTS = 8
+
+
+def _get_acquisition_mode() -> str:
+    s1 = dt.python_parameters.get("S1", {}) or {}
+    mode = str(s1.get("ACQUISITION_MODE") or ACQUISITION_MODE).strip().lower()
+    return mode if mode in ("software", "hardware") else "software"
+
+
+def _get_hw_frame_window_sec() -> float:
+    s1 = dt.python_parameters.get("S1", {}) or {}
+    val_ms = s1.get("HW_FRAME_WINDOW_MS")
+    if val_ms is not None:
+        try:
+            return float(val_ms) / 1000.0
+        except Exception:
+            pass
+    return HW_FRAME_WINDOW_SEC
+
+
+# In-flight part FIFO per downstream station (shift register): every $C1# appends one entry
+# {"part", "part_no", "expected"} to each held station's FIFO — a refused part too, with
+# part None, because the controller still sends $C2#..$C4# for it. `expected` is the part's
+# offset time at that station (fire time without the grace). Each $Cn# first drops parts whose
+# trigger was lost (the next entry's expected time is closer to now), then takes the oldest.
+_station_fifo = {"C2": deque(), "C3": deque(), "C4": deque()}
+_fifo_lock = threading.Lock()
+_last_station_trigger = {"C2": 0.0, "C3": 0.0, "C4": 0.0}
+
+
+# --- asyncio controller session ---
+# communicate_with_controller() runs an asyncio loop in its own thread. That loop owns the
+# controller connection: one reader task parses `$...#` frames and dispatches them, and one
+# writer task drains a priority queue of outbound lines. Other threads talk to it through
+# send_until_ack(); nothing ever holds a lock around recv.
+_loop = None        # event loop of the running session (None when disconnected)
+_writer = None      # asyncio.StreamWriter of the running session
+_out_queue = None   # asyncio.PriorityQueue of (priority, seq, line, enqueued_at)
+_out_seq = itertools.count()  # FIFO order inside one priority
+_ack_waiters = {}   # "ACK_STR" -> [asyncio.Future, ...] resolved by the reader
+_verdict_queue = None  # asyncio.Queue of parts in $C1# order, drained by _verdict_loop
+_session = {"active_stations": [], "armed": False, "epoch": 0}   # epoch: bumped by every halt
+
+# Outbound priorities: the final verdict must never wait behind ACKs or recipe downloads.
+PRIORITY_VERDICT = 0   # $OK# / $NOK# / $STP#
+PRIORITY_ACK = 1       # $ACK_C1# ...
+PRIORITY_PARAM = 2     # $CAM1_HT=..# / $STR#
+_PRIORITY_NAMES = {PRIORITY_VERDICT: "verdict", PRIORITY_ACK: "ack", PRIORITY_PARAM: "param"}
+_VERDICT_KEYS = {"OK", "NOK", "STP"}
+
+
+def _priority_for(msg: str) -> int:
+    key = frame_key(msg)
+    if key in _VERDICT_KEYS:
+        return PRIORITY_VERDICT
+    if key.startswith("ACK_"):
+        return PRIORITY_ACK
+    return PRIORITY_PARAM
+
+
+# --- writer metrics (ms) ---
+# queue_wait: enqueue (in the calling thread) -> writer task picks it up (the old sock_lock wait)
+# send:       enqueue -> bytes handed to the kernel (write + drain)
+# ack_rtt:    first send -> matching ACK seen by the reader
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def _record_metric(name: str, ms: float):
+    with _metrics_lock:
+        stat = _metrics.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                          "last_ms": 0.0, "recent": deque(maxlen=512)})
+        stat["count"] += 1
+        stat["total_ms"] += ms
+        stat["last_ms"] = ms
+        stat["max_ms"] = max(stat["max_ms"], ms)
+        stat["recent"].append(ms)
+
+
+def get_controller_metrics() -> dict:
+    """Snapshot of controller link timings, e.g. {"send.verdict": {"count", "avg_ms", "p95_ms", ...}}."""
+    out = {}
+    with _metrics_lock:
+        for name, stat in _metrics.items():
+            recent = sorted(stat["recent"])
+            out[name] = {
+                "count": stat["count"],
+                "avg_ms": round(stat["total_ms"] / stat["count"], 3) if stat["count"] else 0.0,
+                "last_ms": round(stat["last_ms"], 3),
+                "max_ms": round(stat["max_ms"], 3),
+                "p95_ms": round(recent[int(0.95 * (len(recent) - 1))], 3) if recent else 0.0,
+            }
+    q = _out_queue
+    out["queue_depth"] = q.qsize() if q is not None else 0
+    out["connected"] = _writer is not None
+    return out
+
+
+def _post(msg: str, priority: int | None = None, enqueued_at: float | None = None):
+    """Queue one line for the writer task without waiting (loop thread only)."""
+    if _out_queue is None:
+        print(f"⚠️ Controller not connected, dropped {msg.strip()}")
+        return
+    if not msg.endswith("\r\n"):
+        msg = msg + "\r\n"
+    if priority is None:
+        priority = _priority_for(msg)
+    _out_queue.put_nowait((priority, next(_out_seq), msg,
+                           enqueued_at if enqueued_at is not None else time.perf_counter()))
+
+
+async def _writer_loop(writer, queue):
+    """Single owner of the transport's write side."""
+    while True:
+        priority, _, msg, enqueued_at = await queue.get()
+        kind = _PRIORITY_NAMES.get(priority, "param")
+        _record_metric(f"queue_wait.{kind}", (time.perf_counter() - enqueued_at) * 1000.0)
+        try:
+            writer.write(msg.encode())
+            await writer.drain()
+        except Exception as e:
+            print(f"❌ send error for {msg.strip()}: {e}")
+            return
+        _record_metric(f"send.{kind}", (time.perf_counter() - enqueued_at) * 1000.0)
+
+
+def _resolve_ack(key: str):
+    """Wake every sender waiting for this ACK key (loop thread only)."""
+    for fut in _ack_waiters.get(key, []):
+        if not fut.done():
+            fut.set_result(True)
+
+
+async def _send_until_ack_async(cmd: str, ack_token: str, *,
+                                timeout_per_try: float = 1.0,
+                                resend_every: float = 0.25,
+                                max_wait: float | None = None,
+                                submitted_at: float | None = None) -> bool:
+    loop = asyncio.get_running_loop()
+    key = frame_key(ack_token)
+    end_time = loop.time() + max_wait if max_wait else None
+    fut = loop.create_future()
+    _ack_waiters.setdefault(key, []).append(fut)
+    first_sent = time.perf_counter()
+    try:
+        while keep_running and (end_time is None or loop.time() < end_time):
+            if fut.done():
+                break  # ACK arrived during the back-off: never resend after it
+            if _writer is None or _writer.is_closing():
+                break
+            print(f"📤 Sending {cmd.strip()} (expect {ack_token})")
+            _post(cmd, enqueued_at=submitted_at)
+            submitted_at = None  # resends are timed from their own enqueue
+
+            # Wait for the ACK, then a short back-off before resending; both end early on it
+            for wait in (timeout_per_try, resend_every):
+                if end_time is not None:
+                    wait = max(0.0, min(wait, end_time - loop.time()))
+                try:
+                    await asyncio.wait_for(asyncio.shield(fut), wait)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        waiters = _ack_waiters.get(key, [])
+        if fut in waiters:
+            waiters.remove(fut)
+        if not waiters:
+            _ack_waiters.pop(key, None)
+
+    if fut.done() and not fut.cancelled():
+        _record_metric("ack_rtt", (time.perf_counter() - first_sent) * 1000.0)
+        print(f"✅ ACK matched: {ack_token}")
+        return True
+    print(f"⚠️ send_until_ack aborted for {cmd.strip()} (stopped or timed out)")
+    return False
+
 
-def send_until_ack(sock, cmd: str, ack_token: str, *,
+def send_until_ack(cmd: str, ack_token: str, *,
                    timeout_per_try: float = 1.0,
                    resend_every: float = 0.25,
                    max_wait: float | None = None) -> bool:
     """
-    Keep sending `cmd` until we see `ack_token` in the rx stream.
-    Returns True when ACK is seen, False if `keep_running` goes False or max_wait exceeded.
+    Keep sending `cmd` until the reader sees `ack_token`.
+    Returns True when ACK is seen, False if `keep_running` goes False, max_wait is exceeded
+    or there is no controller session.
 
     Notes:
-    - Uses a lock so other threads don't interleave on the same socket.
-    - Resends every `resend_every` seconds while waiting up to `timeout_per_try` for each try.
+    - Safe to call from any thread except the session loop itself. The line goes through the
+      writer's priority queue ($OK#/$NOK# jump ahead of ACKs and parameters) and the ACK is
+      matched by the reader task and delivered through a future.
+    - Resends every `timeout_per_try + resend_every` seconds until the ACK arrives.
     - If `max_wait` is None, it will retry indefinitely (until keep_running turns False).
     """
-    global keep_running
-    end_time = time.time() + max_wait if max_wait else None
-
-    with sock_lock:
-        while keep_running and (end_time is None or time.time() < end_time):
-            try:
-                # Send once
-                if not cmd.endswith("\r\n"):
-                    wire = (cmd + "\r\n").encode()
-                else:
-                    wire = cmd.encode()
-                print(f"📤 Sending {cmd.strip()} (expect {ack_token})")
-                sock.sendall(wire)
-
-                # Try to receive ack within timeout_per_try
-                start_try = time.time()
-                buffer = ""
-                while keep_running and (time.time() - start_try) < timeout_per_try:
-                    try:
-                        data = sock.recv(1024).decode(errors="ignore")
-                        if not data:
-                            # peer closed
-                            break
-                        buffer += data
-                        if ack_token in buffer:
-                            print(f"✅ ACK matched: {ack_token}")
-                            return True
-                    except socket.timeout:
-                        # keep looping this try
-                        continue
-                    except Exception as e:
-                        print(f"❌ recv error while waiting for {ack_token}: {e}")
-                        break  # exit inner; we will resend
-            except Exception as e:
-                print(f"❌ send error for {cmd.strip()}: {e}")
-
-            # No ack this try: short delay before resending (retry back-off)
-            time.sleep(resend_every)
-
-    print(f"⚠️ send_until_ack aborted for {cmd.strip()} (stopped or timed out)")
-    return False
+    loop = _loop
+    if loop is None or not loop.is_running():
+        print(f"⚠️ No controller session, cannot send {cmd.strip()}")
+        return False
+    fut = asyncio.run_coroutine_threadsafe(
+        _send_until_ack_async(cmd, ack_token, timeout_per_try=timeout_per_try,
+                              resend_every=resend_every, max_wait=max_wait,
+                              submitted_at=time.perf_counter()),
+        loop,
+    )
+    try:
+        return fut.result()
+    except Exception as e:
+        print(f"❌ send error for {cmd.strip()}: {e}")
+        return False
 
 # Stop coordination
 stop_event = threading.Event()
 
-def wait_until(deadline_monotonic: float):
-    """Sleep in small chunks so we can exit early when STOP arrives."""
-    while keep_running and not stop_event.is_set():
-        remaining = deadline_monotonic - time.monotonic()
-        if remaining <= 0:
-            return
-        # sleep in small slices so STOP can interrupt quickly
-        time.sleep(min(remaining, 0.05))
-
 def _get_delay_for_station(n: int) -> float:
     smap = dt.python_parameters.get(f"S{n}", {}) or {}
     raw = (
@@ -157,6 +344,98 @@ def _delays():
         _get_delay_for_station(4),
     )
 
+# --- recipe download ---
+# The whole command list is put on the wire in a sliding window instead of stop-and-wait;
+# ACKs are matched by key, and only commands whose ACK is overdue are retransmitted.
+RECIPE_WINDOW = 8          # commands in flight at once
+RECIPE_MAX_TRIES = 10      # sends per command before the start is aborted
+RECIPE_DIFF_MODE = True    # skip values the controller already acknowledged in an earlier run
+_controller_values = {}    # "CAM1_HT" -> "$CAM1_HT=12#" last acknowledged by the controller
+
+
+def invalidate_controller_cache():
+    """Forget what the controller holds, so the next start downloads the full recipe."""
+    _controller_values.clear()
+
+
+async def _download_recipe_async(command_list, *,
+                                 window: int = RECIPE_WINDOW,
+                                 timeout_per_try: float = 1.0,
+                                 max_tries: int = RECIPE_MAX_TRIES,
+                                 diff: bool = RECIPE_DIFF_MODE) -> bool:
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+
+    pending = deque()
+    skipped = 0
+    for command, ack in command_list:
+        key = frame_key(command)
+        if diff and _controller_values.get(key) == command.strip():
+            skipped += 1
+            continue
+        pending.append((command, ack))
+
+    in_flight = {}   # ack key -> {"cmd", "fut", "sent_at", "tries"}
+    resent = 0
+    ok = False
+
+    def _send(entry):
+        entry["tries"] += 1
+        entry["sent_at"] = loop.time()
+        _post(entry["cmd"], PRIORITY_PARAM)
+
+    try:
+        while keep_running:
+            # keep the window full
+            while pending and len(in_flight) < max(1, window):
+                command, ack = pending.popleft()
+                key = frame_key(ack)
+                fut = loop.create_future()
+                _ack_waiters.setdefault(key, []).append(fut)
+                entry = {"cmd": command, "fut": fut, "sent_at": 0.0, "tries": 0}
+                in_flight[key] = entry
+                print(f"📤 Sending {command.strip()} (expect {ack})")
+                _send(entry)
+
+            if not in_flight:
+                ok = True
+                break
+            if _writer is None or _writer.is_closing():
+                break
+
+            next_due = min(e["sent_at"] for e in in_flight.values()) + timeout_per_try
+            await asyncio.wait([e["fut"] for e in in_flight.values()],
+                               timeout=max(0.0, next_due - loop.time()),
+                               return_when=asyncio.FIRST_COMPLETED)
+
+            now = loop.time()
+            for key, entry in list(in_flight.items()):
+                if entry["fut"].done():
+                    _controller_values[frame_key(entry["cmd"])] = entry["cmd"].strip()
+                    del in_flight[key]
+                elif now - entry["sent_at"] >= timeout_per_try:
+                    if entry["tries"] >= max_tries:
+                        print(f"❌ No ACK for {entry['cmd'].strip()} after {entry['tries']} tries")
+                        return False
+                    print(f"🔁 Resending {entry['cmd'].strip()} (try {entry['tries'] + 1})")
+                    resent += 1
+                    _send(entry)
+    finally:
+        for key, entry in in_flight.items():
+            waiters = _ack_waiters.get(key, [])
+            if entry["fut"] in waiters:
+                waiters.remove(entry["fut"])
+            if not waiters:
+                _ack_waiters.pop(key, None)
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    if ok:
+        _record_metric("recipe_download", elapsed_ms)
+        print(f"✅ Recipe downloaded in {elapsed_ms:.1f} ms "
+              f"({len(command_list) - skipped} sent, {skipped} unchanged, {resent} resent)")
+    return ok
+
+
 def build_command_sequence(param_dict):
     # Normalize keys
     param_dict = {key.replace(" ", ""): value for key, value in param_dict.items()}
@@ -263,11 +542,141 @@ def build_command_sequence(param_dict):
     print(f"✅ Command list built with {len(command_list)} commands")
     return command_list
 
-def communicate_with_controller(param_dict):
-    global sock
-    global keep_running
-    keep_running = True
+def _ack(frame: str):
+    """Reply `$ACK_<key>#` right away; queued for the writer, never blocks the reader."""
+    try:
+        _post(ack_for(frame), PRIORITY_ACK)
+    except Exception as e:
+        print(f"❌ Failed to send {ack_for(frame)}: {e}")
+
+
+def _on_c1(frame: str):
+    global last_c1_ts
+    # Always ACK quickly so PLC/controller doesn't keep resending
+    _ack(frame)
+
+    if not _session["armed"]:
+        print("⚠️ C1 while the line is not armed (starting/paused) — ignored")
+        return
+
+    # ---- Debounce logic ----
+    # If multiple $C1# arrive within a few milliseconds, accept only the first.
+    # Anything inside the debounce window is ignored (but still ACKed above).
+    now = time.monotonic()
+    debounce = _get_c1_debounce_sec()
+    if (now - last_c1_ts) < debounce:
+        print(f"🛑 Ignored duplicate C1 (only {now - last_c1_ts:.3f}s since last). Debounce={debounce:.3f}s")
+        return  # do NOT start a new part pipeline
+
+    # This C1 is accepted; remember its time
+    last_c1_ts = now
+    print("✅ C1 accepted — starting per-part pipeline")
+
+    stop_event.clear()
+    run_part_pipeline(_session["active_stations"], pt.PartTrace())
+
+
+def _on_station_trigger(frame: str):
+    """$C2#/$C3#/$C4#: the oldest part waiting for that station is in its field of view now."""
+    _ack(frame)
+    station = frame_key(frame)
+    if not _session["armed"] or _get_trigger_mode() != "controller":
+        return
+    if station not in _session["active_stations"]:
+        return
+
+    now = time.monotonic()
+    if (now - _last_station_trigger[station]) < _get_c1_debounce_sec():
+        print(f"🛑 Ignored duplicate {station} trigger")
+        return
+    _last_station_trigger[station] = now
+
+    t = deadline_timer.now()
+    with _fifo_lock:
+        fifo = _station_fifo[station]
+        while len(fifo) > 1 and abs(fifo[1]["expected"] - t) <= abs(fifo[0]["expected"] - t):
+            stale = fifo.popleft()
+            print(f"⚠️ {station}: no trigger for part #{stale['part_no']} — dropped from the FIFO")
+        if not fifo:
+            print(f"⚠️ {station} trigger with no part waiting — ignored")
+            return
+        entry = fifo.popleft()
+        if entry["part"] is None:
+            print(f"🎯 {station} trigger → refused part #{entry['part_no']} (nothing to run)")
+        elif scheduler.trigger(entry["part"], station):
+            print(f"🎯 {station} trigger → part #{entry['part_no']}")
+        else:
+            # late trigger: the part already ran on its fallback deadline (or was cancelled)
+            print(f"⏰ {station} trigger → part #{entry['part_no']} after its fallback — consumed")
+
+
+def _clear_station_fifos():
+    with _fifo_lock:
+        for fifo in _station_fifo.values():
+            fifo.clear()
+
+
+def _on_stp(frame: str):
+    # Controller stopped the line: pause here too, cameras and this session stay up
+    _ack(frame)
+    _halt_line()
+    print("🛑 Stop received from controller (paused, session kept).")
+
+
+# Controller -> PC messages. ACK_* frames are matched against waiting senders instead.
+CONTROLLER_HANDLERS = {
+    "C1": _on_c1,
+    "C2": _on_station_trigger,
+    "C3": _on_station_trigger,
+    "C4": _on_station_trigger,
+    "STR": _ack,
+    "STP": _on_stp,
+    "OK_BIN_FULL": _ack,
+    "NOK_BIN_FULL": _ack,
+}
+
+
+def _dispatch(frame: str):
+    key = frame_key(frame)
+    if key.startswith("ACK_"):
+        _resolve_ack(key)
+        return
+    handler = CONTROLLER_HANDLERS.get(key)
+    if handler is None:
+        print(f"⚠️ Unhandled controller message: {frame}")
+        return
+    handler(frame)
 
+
+async def _reader_loop(reader):
+    """Read the stream, split it into frames and dispatch every one of them in order."""
+    parser = FrameParser()
+    while keep_running:
+        try:
+            data = await asyncio.wait_for(reader.read(1024), timeout)
+        except asyncio.TimeoutError:
+            continue
+        except Exception as e:
+            print(f"❌ Error receiving data: {e}")
+            break
+
+        if not data:
+            print("⚠️ Controller closed the connection.")
+            break
+
+        for frame in parser.feed(data):
+            print(f"📥 Received: {frame}")
+            _dispatch(frame)
+            if not keep_running:
+                break
+
+
+async def _arm_line(param_dict) -> bool:
+    """
+    Recipe download -> $STR# -> cameras -> armed. Used by a fresh session and by a warm
+    restart on a live one; only changed parameters go out and only missing cameras connect.
+    """
+    t_start = time.perf_counter()
     enabled = {
         "C1": str(param_dict.get("S1:Camera1Enable", "1")) == "1",
         "C2": str(param_dict.get("S2:Camera2Enable", "1")) == "1",
@@ -276,161 +685,162 @@ def communicate_with_controller(param_dict):
     }
     active_stations = [c for c in ["C1", "C2", "C3", "C4"] if enabled[c]]
     print(f"🔧 Active stations: {active_stations}")
+    _session["armed"] = False
+    _session["active_stations"] = active_stations
+
+    # === Step 1: Build & download init commands (pipelined, retransmit missing ACKs) ===
+    command_list = build_command_sequence(param_dict)
+    if not await _download_recipe_async(command_list, timeout_per_try=timeout):
+        print("❌ Recipe download incomplete — aborting start.")
+        invalidate_controller_cache()
+        return False
+    print("✅ All commands acknowledged.")
+
+    # === Step 2: Start request ($STR#) with retry-until-ACK ===
+    print("📤 Sending $STR# to start process")
+    if not await _send_until_ack_async(
+        "$STR#",
+        "$ACK_STR#",
+        timeout_per_try=timeout,
+        resend_every=0.2
+    ):
+        print("❌ Could not get $ACK_STR# — aborting.")
+        return False
+    print("✅ Received $ACK_STR")
+
+    # === Step 3: Connect Cameras (already connected ones are kept) ===
+    print("🔗 Connecting cameras...")
+    await asyncio.get_running_loop().run_in_executor(None, ConnectCam, param_dict)
+    stop_event.clear()
+    _session["armed"] = True
+    armed_ms = (time.perf_counter() - t_start) * 1000.0
+    _record_metric("time_to_armed", armed_ms)
+    print(f"🟢 Line armed {armed_ms:.1f} ms after start")
+    return True
+
+
+async def _controller_session(param_dict, on_armed=None):
+    """on_armed(): called once the line is armed, or arming failed."""
+    global _loop, _writer, _out_queue, _verdict_queue
+
+    _session["armed"] = False
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(CONTROLLER_IP, CONTROLLER_PORT), timeout
+    )
+    raw = writer.get_extra_info("socket")
+    if raw is not None:
+        raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    _loop = asyncio.get_running_loop()
+    _writer = writer
+    _out_queue = asyncio.PriorityQueue()
+    _verdict_queue = asyncio.Queue()
+    print("✅ Connected to controller.")
+
+    writer_task = asyncio.create_task(_writer_loop(writer, _out_queue))
+    reader_task = asyncio.create_task(_reader_loop(reader))
+    verdict_task = asyncio.create_task(_verdict_loop(_verdict_queue))
+    try:
+        armed = await _arm_line(param_dict)
+        if on_armed is not None:
+            on_armed()
+        if not armed:
+            return
 
+        # === Step 4: Triggers are handled by the reader task until shutdown ===
+        # (pause/resume keep this session; see pause_process / start_process)
+        await reader_task
+    finally:
+        if keep_running:
+            # link dropped without a shutdown — the controller may have restarted and lost its values
+            invalidate_controller_cache()
+        _session["armed"] = False
+        reader_task.cancel()
+        writer_task.cancel()
+        verdict_task.cancel()
+        for waiters in _ack_waiters.values():
+            for fut in waiters:
+                fut.cancel()
+        _ack_waiters.clear()
+        _out_queue = None
+        _verdict_queue = None
+        _writer = None
+        _loop = None
+        writer.close()
+
+
+def communicate_with_controller(param_dict, on_armed=None):
+    global keep_running
+    keep_running = True
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            sock.connect((CONTROLLER_IP, CONTROLLER_PORT))
-            print("✅ Connected to controller.")
-            globals()['sock'] = sock  # expose connected socket to other functions/threads
-
-            # === Step 1: Build & send init commands (retry until ACK) ===
-            command_list = build_command_sequence(param_dict)
-            for command, ack in command_list:
-                ok = send_until_ack(
-                    sock,
-                    command,
-                    ack_token=ack,
-                    timeout_per_try=timeout,
-                    resend_every=0.2
-                )
-                if not ok:
-                    print(f"❌ Failed to get ACK for {command.strip()} — aborting start.")
-                    return
-            print("✅ All commands acknowledged.")
-
-            # === Step 2: Start request ($STR#) with retry-until-ACK ===
-            print("📤 Sending $STR# to start process")
-            if not send_until_ack(
-                sock,
-                "$STR#",
-                "$ACK_STR#",
-                timeout_per_try=timeout,
-                resend_every=0.2
-            ):
-                print("❌ Could not get $ACK_STR# — aborting.")
-                return
-            print("✅ Received $ACK_STR")
+        asyncio.run(_controller_session(param_dict, on_armed))
+    except Exception as e:
+        print(f"❌ Error in communicate_with_controller: {e}")
 
-            # === Step 3: Connect Cameras ===
-            print("🔗 Connecting cameras...")
-            ConnectCam(param_dict)
 
-            # === Step 4: Main receive loop ===
-            while keep_running:
-                try:
-                    with sock_lock:
-                        data = sock.recv(1024).decode(errors="ignore")
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    print(f"❌ Error receiving data: {e}")
-                    break
+_start_lock = threading.Lock()
 
-                if not data:
-                    continue
-                data = data.strip()
-                if not data:
-                    continue
-                print(f"📥 Received: {data}")
-
-                # Controller -> UI triggers and commands
-                if "$C1#" in data:
-                    # Always ACK quickly so PLC/controller doesn't keep resending
-                    try:
-                        sock.sendall("$ACK_C1#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_C1#: {e}")
-
-                    # ---- Debounce logic ----
-                    # If multiple $C1# arrive within a few milliseconds, accept only the first.
-                    # Anything inside the debounce window is ignored (but still ACKed above).
-                    now = time.monotonic()
-                    debounce = _get_c1_debounce_sec()
-
-                    # Read/update a global "last accepted" timestamp
-                    global last_c1_ts
-                    if (now - last_c1_ts) < debounce:
-                        print(f"🛑 Ignored duplicate C1 (only {now - last_c1_ts:.3f}s since last). Debounce={debounce:.3f}s")
-                        continue  # do NOT start a new part pipeline
-
-                    # This C1 is accepted; remember its time
-                    last_c1_ts = now
-
-                    print("✅ C1 accepted — starting per-part pipeline")
-
-                    # Optional small pre-delay if you want (kept from your code)
-                    # delay_time = 0.8
-                    # if delay_time > 0:
-                    #     print(f"⏳ Waiting {delay_time} sec before triggering per-part pipeline...")
-                    #     wait_until(time.monotonic() + delay_time)
-                    #     if not keep_running or stop_event.is_set():
-                    #         continue
-
-                    stop_event.clear()
-                    threading.Thread(
-                        target=run_part_pipeline,
-                        args=(active_stations, sock),
-                        daemon=True
-                    ).start()
-                    continue
-
-                if "$C2#" in data:
-                    try:
-                        sock.sendall("$ACK_C2#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_C2#: {e}")
-                    # (If you ever decide to start cam2 directly, do it here)
-                    continue
-
-                if "$C3#" in data:
-                    try:
-                        sock.sendall("$ACK_C3#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_C3#: {e}")
-                    continue
-
-                if "$C4#" in data:
-                    try:
-                        sock.sendall("$ACK_C4#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_C4#: {e}")
-                    continue
-
-                if "$STR#" in data:
-                    try:
-                        sock.sendall("$ACK_STR#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_STR#: {e}")
-                    continue
-
-                if "$STP#" in data:
-                    try:
-                        sock.sendall("$ACK_STP#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_STP#: {e}")
-                    stop_event.set()
-                    keep_running = False
-                    cs.camera_disconnect()
-                    print("🛑 Stop received from controller.")
-                    break
 
-                if "$OK_BIN_FULL#" in data:
-                    try:
-                        sock.sendall("$ACK_OK_BIN_FULL#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_OK_BIN_FULL#: {e}")
-                    continue
+def _session_alive() -> bool:
+    loop, writer = _loop, _writer
+    return loop is not None and loop.is_running() and writer is not None and not writer.is_closing()
 
-                if "$NOK_BIN_FULL#" in data:
-                    try:
-                        sock.sendall("$ACK_NOK_BIN_FULL#\r\n".encode())
-                    except Exception as e:
-                        print(f"❌ Failed to send $ACK_NOK_BIN_FULL#: {e}")
-                    continue
 
-    except Exception as e:
-        print(f"❌ Error in communicate_with_controller: {e}")
+def start_process(param_dict):
+    """
+    /start: warm restart when the controller session is still open (paused line) — only
+    changed recipe values are sent and connected cameras are reused — otherwise open a new
+    session. Blocks for the lifetime of a new session, so run it in a thread.
+    """
+    if not _start_lock.acquire(blocking=False):
+        print("⚠️ Start already in progress — ignored")
+        return
+    if _session_alive():
+        try:
+            print("♻️ Warm restart on the open controller session")
+            fut = asyncio.run_coroutine_threadsafe(_arm_line(param_dict), _loop)
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"❌ Warm restart failed: {e}")
+        finally:
+            _start_lock.release()
+        return
+
+    # Cold start: keep _start_lock until the new session is armed (or failed), so a second
+    # /start cannot open another session meanwhile
+    once = threading.Lock()
+
+    def _release_start():
+        if once.acquire(blocking=False):
+            _start_lock.release()
+
+    try:
+        communicate_with_controller(param_dict, on_armed=_release_start)
+    finally:
+        _release_start()
+
+
+def _halt_line():
+    """Disarm and drop every scheduled / in-flight part (cameras and session untouched)."""
+    _session["armed"] = False
+    _session["epoch"] += 1          # parts from before the halt get no verdict (see _send_verdict)
+    stop_event.set()
+    scheduler.cancel_all()
+    _clear_station_fifos()
+    ps.cancel_all()
+
+
+def pause_process():
+    """
+    PAUSE (warm stop): stop triggering and inspection, tell the controller $STP#, but keep
+    the TCP session and the camera connections so the next /start is armed in milliseconds.
+    Use stop_process() for a full shutdown.
+    """
+    print("⏸️ Pause requested")
+    _halt_line()
+    if _session_alive():
+        ok = send_until_ack("$STP#", "$ACK_STP#", timeout_per_try=1.0, resend_every=0.1, max_wait=3.0)
+        print("✅ Controller stopped (session kept)" if ok else "⚠️ No $ACK_STP# — session kept anyway")
 
 def _send_raw_noack(s, msg: str):
     """Send one line without waiting for ACK. Safe even if peer is slow."""
@@ -443,49 +853,42 @@ def _send_raw_noack(s, msg: str):
         print(f"❌ send error (no-ACK) for {msg.strip()}: {e}")
 
 def _force_close_socket():
-    """Force-close the global socket safely."""
-    global sock
+    """Abort the controller connection; the reader task wakes up and the session ends."""
+    loop, writer = _loop, _writer
     try:
-        with sock_lock:
-            if sock is not None:
-                try:
-                    # Try to shutdown nicely first
-                    sock.shutdown(socket.SHUT_RDWR)
-                except Exception:
-                    pass  # ignore if already closed / not connected
-                try:
-                    sock.close()
-                except Exception:
-                    pass
-                sock = None
-                print("🔌 TCP socket forcibly closed.")
+        if loop is not None and writer is not None:
+            loop.call_soon_threadsafe(writer.transport.abort)
+            print("🔌 TCP socket forcibly closed.")
     except Exception as e:
         print(f"❌ Error while force-closing socket: {e}")
 
 
 def stop_process():
     """
-    HARD STOP:
+    HARD STOP / SHUTDOWN (pause_process() is the warm stop):
     1) Flip local flags (STOP everything here).
-    2) Best-effort: send 2–3 STP quickly on the current socket (no ACK wait).
+    2) Best-effort: send 2–3 STP quickly on the current session (no ACK wait).
     3) Regardless of ACK, FORCE-CLOSE the TCP connection.
     4) Optional: try a new short-lived connection to send 1 more STP, then close.
     """
-    global sock, keep_running
+    global keep_running
     print("🛑 Stop requested")
 
     # 1) Flip local flags first so all loops exit quickly
-    stop_event.set()
     keep_running = False
+    _halt_line()
     cs.camera_disconnect()  # disconnect cameras immediately
 
-    # 2) Best-effort STP spam on existing socket (no ACK wait)
+    # 2) Best-effort STP spam on existing session (no ACK wait)
     try:
-        with sock_lock:
-            if sock is not None:
-                for i in range(3):           # send 3 times fast
-                    _send_raw_noack(sock, "$STP#")
-                    time.sleep(0.15)        # small gap between sends (150 ms)
+        loop = _loop
+        if loop is not None:
+            for i in range(3):           # send 3 times fast
+                if loop.is_closed():     # controller already dropped the session
+                    break
+                loop.call_soon_threadsafe(_post, "$STP#", PRIORITY_VERDICT)
+                print("📤 Sent (no-ACK): $STP#")
+                time.sleep(0.15)        # small gap between sends (150 ms)
     except Exception as e:
         print(f"❌ Error while blasting STP on existing socket: {e}")
 
@@ -507,49 +910,87 @@ def stop_process():
 
     print("✅ Stop sequence completed (socket closed regardless of ACK).")
 
-def C_TriggeredProcess(cam_id, station, active_stations, ctx, result_queues):
-    # launch capture+process for this station in its own thread
-    t = threading.Thread(
-        target=Capture_Prosses_Triggerflask,
-        args=(cam_id, station, active_stations, ctx, result_queues),
-        daemon=True
-    )
-    t.start()
-
-def Capture_Prosses_Triggerflask(cam_id, station, active_stations, ctx, result_queues):
+def _capture_frame(cam_num, station, ctx):
+    """Frame for this part at this station: a software grab, or its hardware-triggered ring frame."""
+    dt.Geometry[f"Cam{cam_num}frame"] = camera_pool.pool.geometry(f"cam{cam_num}")
+    if _get_acquisition_mode() != "hardware":
+        return getattr(cs, f"capture_image_{cam_num}")()
+    cam = camera_pool.pool.get(f"cam{cam_num}")
+    fired = ctx.get("fired_at", {}).get(station, deadline_timer.now())
+    window = _get_hw_frame_window_sec()
+    cam.line_pulse()   # no-op on a wired trigger line
+    frame = cam.take(fired - window, fired + window)
+    if frame is None:
+        print(f"❌ {station}: no triggered frame within ±{window * 1000:.0f} ms of the part")
+        return None
+    print(f"🎞️ {station}: frame #{frame.frame_id} (+{(frame.host_ts - fired) * 1000:.1f} ms)")
+    ctx.setdefault("ring_frames", {})[station] = frame
+    return frame.data
+
+
+def _release_frame(station, ctx):
+    # ring slot goes back to the grabber once inspection is done with it
+    frame = ctx.get("ring_frames", {}).pop(station, None)
+    if frame is not None:
+        frame.release()
+
+
+def _capture_station(cam_num, station, ctx):
+    with pt.span(ctx.get("trace"), f"{station}.capture"):
+        dt.Frames[f"Cam{cam_num}frame"] = _capture_frame(cam_num, station, ctx)
+
+
+def Capture_Prosses_Triggerflask(cam_id, station, active_stations, ctx, state, captured=False):
+    # captured=True: the frame was already taken at the fire time (_run_station)
     if cam_id == "cam1":
-        dt.Frames["Cam1frame"] = cs.capture_image_1()
-        ReadPythonResult(
-            cam_id="cam1", station=station, active_stations=active_stations,
-            ctx=ctx, result_queues=result_queues
-        )
+        if not captured:
+            _capture_station(1, station, ctx)
+        try:
+            ReadPythonResult(
+                cam_id="cam1", station=station, active_stations=active_stations,
+                ctx=ctx, state=state
+            )
+        finally:
+            _release_frame(station, ctx)
         trigger_flask_camera(cam_id)
 
     elif cam_id == "cam2":
-        dt.Frames["Cam2frame"] = cs.capture_image_2()
-        ReadPythonResult(
-            cam_id="cam2", station=station, active_stations=active_stations,
-            ctx=ctx, result_queues=result_queues
-        )
+        if not captured:
+            _capture_station(2, station, ctx)
+        try:
+            ReadPythonResult(
+                cam_id="cam2", station=station, active_stations=active_stations,
+                ctx=ctx, state=state
+            )
+        finally:
+            _release_frame(station, ctx)
         trigger_flask_camera(cam_id)
 
     elif cam_id == "cam3":
-        dt.Frames["Cam3frame"] = cs.capture_image_3()
-        ReadPythonResult(
-            cam_id="cam3", station=station, active_stations=active_stations,
-            ctx=ctx, result_queues=result_queues
-        )
+        if not captured:
+            _capture_station(3, station, ctx)
+        try:
+            ReadPythonResult(
+                cam_id="cam3", station=station, active_stations=active_stations,
+                ctx=ctx, state=state
+            )
+        finally:
+            _release_frame(station, ctx)
         trigger_flask_camera(cam_id)
 
     elif cam_id == "cam4":
-        dt.Frames["Cam4frame"] = cs.capture_image_4()
-        ReadPythonResult(
-            cam_id="cam4", station=station, active_stations=active_stations,
-            ctx=ctx, result_queues=result_queues
-        )
+        if not captured:
+            _capture_station(4, station, ctx)
+        try:
+            ReadPythonResult(
+                cam_id="cam4", station=station, active_stations=active_stations,
+                ctx=ctx, state=state
+            )
+        finally:
+            _release_frame(station, ctx)
         # trigger_flask_camera(cam_id)
 
-def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
+def ReadPythonResult(cam_id, station, active_stations, ctx, state):
     part_name = "PISTON"
     subpart_name = ""
     part_id = "P1S1"
@@ -558,11 +999,12 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
     invoice_no = "I1"
 
     cam_num = int(cam_id[-1])
+    trace = ctx.get("trace")
 
     # 1️⃣ If camera is disabled, skip it and pass an OK token
     if not getattr(cs, f"isConnectedCamera{cam_num}")():
         print(f"{cam_id.upper()} is disabled. Passing OK to next stage.")
-        result_queues[station].put(True)
+        state.set_result(station, True, note="camera disabled")
         return
 
     # Initialize result variables
@@ -571,46 +1013,49 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
     # 2️⃣ Run detection and gather results
     if cam_id == "cam1":
 
-        DB.load_python_parameters(dt.StaticData["PartID"])
+        with pt.span(trace, f"{station}.params"):
+            DB.load_python_parameters(dt.StaticData["PartID"])
         params = dt.python_parameters["S1"]
         print(params)
 
         # Unpack from Station1
-        (
-            resultType,
-            result,
-            ID,
-            IDstatus,
-            OD,
-            ODstatus,
-            Concentricity,
-            ConcentricityStatus,
-            FlashDefect,
-            DefectPosition,
-            OrificeDiameter,
-            OrificeStatus,
-            dim_err,
-        ) = Station1_detection.main(
-            part=dt.StaticData["PartName"],
-            subpart=dt.StaticData["SubPartName"],
-            frame=dt.Frames["Cam1frame"],
-            id_min=params["IDMIN"],
-            id_max=params["IDMAX"],
-            od_min=params["ODMIN"],
-            od_max=params["ODMAX"],
-            concentricity_max=params["CONCENTRICITY"],
-            orifice_min=params["ORIFICEMIN"],
-            orifice_max=params["ORIFICEMAX"],
-            threshold_id2=params["THRESHOLDID2"],
-            threshold_id3=params["THRESHOLDID3"],
-            threshold_od2=params["THRESHOLDOD2"],
-            threshold_od3=params["THRESHOLDOD3"],
-            pixel_to_micron=params["PIXELTOMICRON"],
-            pixel_to_micron_id=params["PIXELTOMICRON_ID"],
-            pixel_to_micron_od=params["PIXELTOMICRON_OD"],
-            output_folder=OutputFolder1,
-            backup_output_folder=BackUpOutputFolder1
-        )
+        with pt.span(trace, f"{station}.inspect"):
+            (
+                resultType,
+                result,
+                ID,
+                IDstatus,
+                OD,
+                ODstatus,
+                Concentricity,
+                ConcentricityStatus,
+                FlashDefect,
+                DefectPosition,
+                OrificeDiameter,
+                OrificeStatus,
+                dim_err,
+            ) = Station1_detection.main(
+                part=dt.StaticData["PartName"],
+                subpart=dt.StaticData["SubPartName"],
+                frame=dt.Frames["Cam1frame"],
+                geometry=dt.Geometry["Cam1frame"],
+                id_min=params["IDMIN"],
+                id_max=params["IDMAX"],
+                od_min=params["ODMIN"],
+                od_max=params["ODMAX"],
+                concentricity_max=params["CONCENTRICITY"],
+                orifice_min=params["ORIFICEMIN"],
+                orifice_max=params["ORIFICEMAX"],
+                threshold_id2=params["THRESHOLDID2"],
+                threshold_id3=params["THRESHOLDID3"],
+                threshold_od2=params["THRESHOLDOD2"],
+                threshold_od3=params["THRESHOLDOD3"],
+                pixel_to_micron=params["PIXELTOMICRON"],
+                pixel_to_micron_id=params["PIXELTOMICRON_ID"],
+                pixel_to_micron_od=params["PIXELTOMICRON_OD"],
+                output_folder=OutputFolder1,
+                backup_output_folder=BackUpOutputFolder1
+            )
         part = dt.StaticData["PartName"]
         subpart = dt.StaticData["SubPartName"]
 
@@ -644,55 +1089,58 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
         }
         push_result(cam_id, payload)
 
-        if not ctx.get("current_part_inserted", False):
-            ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
-                date_time,
-                part_name,
-                subpart_name,
-                part_id,
-                station,
-                ID,
-                OD,
-                OrificeDiameter,
-                Concentricity,
-                ConcentricityStatus,
-                IDstatus,
-                ODstatus,
-                "NA",
-                "NA",
-                "NA",  # thickness
-                "NA",
-                "NA",
-                "NA",  # top burr
-                "NA",
-                "NA",
-                "NA",  # bottom burr
-                supplier_name,
-                invoice_no,
-            )
-            ctx["current_part_inserted"] = True
+        with pt.span(trace, f"{station}.db"):
+            if not ctx.get("current_part_inserted", False):
+                ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
+                    date_time,
+                    part_name,
+                    subpart_name,
+                    part_id,
+                    station,
+                    ID,
+                    OD,
+                    OrificeDiameter,
+                    Concentricity,
+                    ConcentricityStatus,
+                    IDstatus,
+                    ODstatus,
+                    "NA",
+                    "NA",
+                    "NA",  # thickness
+                    "NA",
+                    "NA",
+                    "NA",  # top burr
+                    "NA",
+                    "NA",
+                    "NA",  # bottom burr
+                    supplier_name,
+                    invoice_no,
+                )
+                ctx["current_part_inserted"] = True
 
     elif cam_id == "cam2":
-        (
-            resultType,
-            result,            # "OK" / "NOK"
-            error,             # general error string (if any)
-            thickness,         # numeric or computed thickness value
-            thickness_error,   # description for thickness failure
-            FlashDefect,       # (keep if you use it elsewhere)
-            outputPath,        # path to saved cam2 image
-        ) = Station2_detection.main(
-            part=dt.StaticData["PartName"],
-            subpart=dt.StaticData["SubPartName"],
-            frame=dt.Frames["Cam2frame"],
-            thick_min=dt.python_parameters["S2"]["THICKNESSMIN"],
-            thick_max=dt.python_parameters["S2"]["THICKNESSMAX"],
-            pixel_to_micron=dt.python_parameters["S2"]["PIXELTOMICRON"],
-            output_folder=OutputFolder2,
-            min_thresh=dt.python_parameters["S2"]["MINTHRESH"],
-            max_thresh=dt.python_parameters["S2"]["MAXTHRESH"],
-            backup_output_folder=BackUpOutputFolder2
-        )
+        with pt.span(trace, f"{station}.inspect"):
+            (
+                resultType,
+                result,            # "OK" / "NOK"
+                error,             # general error string (if any)
+                thickness,         # numeric or computed thickness value
+                thickness_error,   # description for thickness failure
+                FlashDefect,       # (keep if you use it elsewhere)
+                outputPath,        # path to saved cam2 image
+            ) = Station2_detection.main(
+                part=dt.StaticData["PartName"],
+                subpart=dt.StaticData["SubPartName"],
+                frame=dt.Frames["Cam2frame"],
+                geometry=dt.Geometry["Cam2frame"],
+                thick_min=dt.python_parameters["S2"]["THICKNESSMIN"],
+                thick_max=dt.python_parameters["S2"]["THICKNESSMAX"],
+                pixel_to_micron=dt.python_parameters["S2"]["PIXELTOMICRON"],
+                output_folder=OutputFolder2,
+                min_thresh=dt.python_parameters["S2"]["MINTHRESH"],
+                max_thresh=dt.python_parameters["S2"]["MAXTHRESH"],
+                backup_output_folder=BackUpOutputFolder2
+            )
 
         print(
             f"Station 2 ResultType: {resultType}, Result: {result}, "
@@ -710,70 +1158,73 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
         print("Sending payload:", payload)
         push_result(cam_id, payload)
 
-        if not ctx.get("current_part_inserted", False):
-            ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
-                date_time,
-                part_name,
-                subpart_name,
-                part_id,
-                station,
-                # S1 placeholders
-                "NA", "NA", "NA", "NA", "NA", "NA", "NA",
-                # S2
-                outputPath,          # Thickness_Cam_Image
-                thickness_status,    # Thickness_Result (OK/NOK)
-                thickness_error,     # Thickness_Cam_Error_Description
-                # S3 placeholders
-                "NA", "NA", "NA",
-                # S4 placeholders
-                "NA", "NA", "NA",
-                supplier_name,
-                invoice_no,
-            )
-            ctx["current_part_inserted"] = True
-        else:
-            DB.update_workpartdetail_2nd_Station(
-                ctx["inserted_s_no"],
-                station,
-                thickness_status,
-                thickness_error,
-            )
+        with pt.span(trace, f"{station}.db"):
+            if not ctx.get("current_part_inserted", False):
+                ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
+                    date_time,
+                    part_name,
+                    subpart_name,
+                    part_id,
+                    station,
+                    # S1 placeholders
+                    "NA", "NA", "NA", "NA", "NA", "NA", "NA",
+                    # S2
+                    outputPath,          # Thickness_Cam_Image
+                    thickness_status,    # Thickness_Result (OK/NOK)
+                    thickness_error,     # Thickness_Cam_Error_Description
+                    # S3 placeholders
+                    "NA", "NA", "NA",
+                    # S4 placeholders
+                    "NA", "NA", "NA",
+                    supplier_name,
+                    invoice_no,
+                )
+                ctx["current_part_inserted"] = True
+            else:
+                DB.update_workpartdetail_2nd_Station(
+                    ctx["inserted_s_no"],
+                    station,
+                    thickness_status,
+                    thickness_error,
+                )
 
     elif cam_id == "cam3":
-        res = Station3_detection.main(
-            part=dt.StaticData["PartName"],
-            subpart=dt.StaticData["SubPartName"],
-            frame=dt.Frames["Cam3frame"],
-
-            # ---- ID (inner) params ----
-            ID2_OFFSET_ID=dt.python_parameters["S3"]["ID2_OFFSET"],
-            HIGHLIGHT_SIZE_ID=dt.python_parameters["S3"]["HIGHLIGHT_SIZE"],
-            ID_BURR_MIN_AREA=dt.python_parameters["S3"]["id_BURR_MIN_AREA"],
-            ID_BURR_MAX_AREA=dt.python_parameters["S3"]["id_BURR_MAX_AREA"],
-            ID_BURR_MIN_PERIMETER=dt.python_parameters["S3"]["id_BURR_MIN_PERIMETER"],
-            ID_BURR_MAX_PERIMETER=dt.python_parameters["S3"]["id_BURR_MAX_PERIMETER"],
-
-            # ---- OD (outer) params ----
-            ID2_OFFSET_OD=dt.python_parameters["S3"]["ID2_OFFSET_OD3"],
-            HIGHLIGHT_SIZE_OD=dt.python_parameters["S3"]["HIGHLIGHT_SIZE_OD3"],
-            OD_BURR_MIN_AREA=dt.python_parameters["S3"]["OD_BURR_MIN_AREA3"],
-            OD_BURR_MAX_AREA=dt.python_parameters["S3"]["OD_BURR_MAX_AREA3"],
-            OD_BURR_MIN_PERIMETER=dt.python_parameters["S3"]["OD_BURR_MIN_PERIMETER3"],
-            OD_BURR_MAX_PERIMETER=dt.python_parameters["S3"]["OD_BURR_MAX_PERIMETER3"],
-
-            # ---- contour selection ----
-            min_id_area=dt.python_parameters["S3"]["min_id_area3"],
-            max_id_area=dt.python_parameters["S3"]["max_id_area3"],
-            min_od_area=dt.python_parameters["S3"]["min_od_area3"],
-            max_od_area=dt.python_parameters["S3"]["max_od_area3"],
-            min_circularity=dt.python_parameters["S3"]["min_circularity3"],
-            max_circularity=dt.python_parameters["S3"]["max_circularity3"],
-            min_aspect_ratio=dt.python_parameters["S3"]["min_aspect_ratio3"],
-            max_aspect_ratio=dt.python_parameters["S3"]["max_aspect_ratio3"],
-
-            output_folder=OutputFolder3,
-            backup_output_folder=BackUpOutputFolder3
-        )
+        with pt.span(trace, f"{station}.inspect"):
+            res = Station3_detection.main(
+                part=dt.StaticData["PartName"],
+                subpart=dt.StaticData["SubPartName"],
+                frame=dt.Frames["Cam3frame"],
+                geometry=dt.Geometry["Cam3frame"],
+
+                # ---- ID (inner) params ----
+                ID2_OFFSET_ID=dt.python_parameters["S3"]["ID2_OFFSET"],
+                HIGHLIGHT_SIZE_ID=dt.python_parameters["S3"]["HIGHLIGHT_SIZE"],
+                ID_BURR_MIN_AREA=dt.python_parameters["S3"]["id_BURR_MIN_AREA"],
+                ID_BURR_MAX_AREA=dt.python_parameters["S3"]["id_BURR_MAX_AREA"],
+                ID_BURR_MIN_PERIMETER=dt.python_parameters["S3"]["id_BURR_MIN_PERIMETER"],
+                ID_BURR_MAX_PERIMETER=dt.python_parameters["S3"]["id_BURR_MAX_PERIMETER"],
+
+                # ---- OD (outer) params ----
+                ID2_OFFSET_OD=dt.python_parameters["S3"]["ID2_OFFSET_OD3"],
+                HIGHLIGHT_SIZE_OD=dt.python_parameters["S3"]["HIGHLIGHT_SIZE_OD3"],
+                OD_BURR_MIN_AREA=dt.python_parameters["S3"]["OD_BURR_MIN_AREA3"],
+                OD_BURR_MAX_AREA=dt.python_parameters["S3"]["OD_BURR_MAX_AREA3"],
+                OD_BURR_MIN_PERIMETER=dt.python_parameters["S3"]["OD_BURR_MIN_PERIMETER3"],
+                OD_BURR_MAX_PERIMETER=dt.python_parameters["S3"]["OD_BURR_MAX_PERIMETER3"],
+
+                # ---- contour selection ----
+                min_id_area=dt.python_parameters["S3"]["min_id_area3"],
+                max_id_area=dt.python_parameters["S3"]["max_id_area3"],
+                min_od_area=dt.python_parameters["S3"]["min_od_area3"],
+                max_od_area=dt.python_parameters["S3"]["max_od_area3"],
+                min_circularity=dt.python_parameters["S3"]["min_circularity3"],
+                max_circularity=dt.python_parameters["S3"]["max_circularity3"],
+                min_aspect_ratio=dt.python_parameters["S3"]["min_aspect_ratio3"],
+                max_aspect_ratio=dt.python_parameters["S3"]["max_aspect_ratio3"],
+
+                output_folder=OutputFolder3,
+                backup_output_folder=BackUpOutputFolder3
+            )
 
         id_status = (res.get("id") or {}).get("status", "NOK")
         od_status = (res.get("od") or {}).get("status", "NOK")
@@ -793,63 +1244,66 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
         }
         push_result(cam_id, payload)
 
-        if not ctx.get("current_part_inserted", False):
-            ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
-                date_time, part_name, subpart_name, part_id, station,
-                # S1 placeholders
-                "NA", "NA", "NA", "NA", "NA", "NA", "NA",
-                # S2 placeholders
-                "NA", "NA", "NA",
-                # S3 placeholders (adjust to your schema once finalized)
-                "NA", "NA", "NA",
-                # S4 placeholders
-                "NA", "NA", "NA",
-                supplier_name, invoice_no
-            )
-            ctx["current_part_inserted"] = True
-        else:
-            DB.update_workpartdetail_3rd_Station(
-                "OK" if result_ok else "NOK",
-                None,                # Error (if you decide to surface one)
-                top_burr_status,     # Burr status summary
-                id_count + od_count  # Total burr count (example)
-            )
+        with pt.span(trace, f"{station}.db"):
+            if not ctx.get("current_part_inserted", False):
+                ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
+                    date_time, part_name, subpart_name, part_id, station,
+                    # S1 placeholders
+                    "NA", "NA", "NA", "NA", "NA", "NA", "NA",
+                    # S2 placeholders
+                    "NA", "NA", "NA",
+                    # S3 placeholders (adjust to your schema once finalized)
+                    "NA", "NA", "NA",
+                    # S4 placeholders
+                    "NA", "NA", "NA",
+                    supplier_name, invoice_no
+                )
+                ctx["current_part_inserted"] = True
+            else:
+                DB.update_workpartdetail_3rd_Station(
+                    "OK" if result_ok else "NOK",
+                    None,                # Error (if you decide to surface one)
+                    top_burr_status,     # Burr status summary
+                    id_count + od_count  # Total burr count (example)
+                )
 
     elif cam_id == "cam4":
-        res = Station4_detection.main(
-            part=dt.StaticData["PartName"],
-            subpart=dt.StaticData["SubPartName"],
-            frame=dt.Frames["Cam4frame"],
-
-            # ---- ID (inner) params ----
-            ID2_OFFSET_ID=dt.python_parameters["S4"]["ID4_OFFSET"],
-            HIGHLIGHT_SIZE_ID=dt.python_parameters["S4"]["HIGHLIGHT_SIZE"],
-            ID_BURR_MIN_AREA=dt.python_parameters["S4"]["id_BURR_MIN_AREA"],
-            ID_BURR_MAX_AREA=dt.python_parameters["S4"]["id_BURR_MAX_AREA"],
-            ID_BURR_MIN_PERIMETER=dt.python_parameters["S4"]["id_BURR_MIN_PERIMETER"],
-            ID_BURR_MAX_PERIMETER=dt.python_parameters["S4"]["id_BURR_MAX_PERIMETER"],
-
-            # ---- OD (outer) params ----
-            ID2_OFFSET_OD=dt.python_parameters["S4"]["ID2_OFFSET_OD4"],
-            HIGHLIGHT_SIZE_OD=dt.python_parameters["S4"]["HIGHLIGHT_SIZE_OD4"],
-            OD_BURR_MIN_AREA=dt.python_parameters["S4"]["OD_BURR_MIN_AREA4"],
-            OD_BURR_MAX_AREA=dt.python_parameters["S4"]["OD_BURR_MAX_AREA4"],
-            OD_BURR_MIN_PERIMETER=dt.python_parameters["S4"]["OD_BURR_MIN_PERIMETER4"],
-            OD_BURR_MAX_PERIMETER=dt.python_parameters["S4"]["OD_BURR_MAX_PERIMETER4"],
-
-            # ---- contour selection ----
-            min_id_area=dt.python_parameters["S4"]["min_id_area4"],
-            max_id_area=dt.python_parameters["S4"]["max_id_area4"],
-            min_od_area=dt.python_parameters["S4"]["min_od_area4"],
-            max_od_area=dt.python_parameters["S4"]["max_od_area4"],
-            min_circularity=dt.python_parameters["S4"]["min_circularity4"],
-            max_circularity=dt.python_parameters["S4"]["max_circularity4"],
-            min_aspect_ratio=dt.python_parameters["S4"]["min_aspect_ratio4"],
-            max_aspect_ratio=dt.python_parameters["S4"]["max_aspect_ratio4"],
-
-            output_folder=OutputFolder4,
-            backup_output_folder=BackUpOutputFolder4
-        )
+        with pt.span(trace, f"{station}.inspect"):
+            res = Station4_detection.main(
+                part=dt.StaticData["PartName"],
+                subpart=dt.StaticData["SubPartName"],
+                frame=dt.Frames["Cam4frame"],
+                geometry=dt.Geometry["Cam4frame"],
+
+                # ---- ID (inner) params ----
+                ID2_OFFSET_ID=dt.python_parameters["S4"]["ID4_OFFSET"],
+                HIGHLIGHT_SIZE_ID=dt.python_parameters["S4"]["HIGHLIGHT_SIZE"],
+                ID_BURR_MIN_AREA=dt.python_parameters["S4"]["id_BURR_MIN_AREA"],
+                ID_BURR_MAX_AREA=dt.python_parameters["S4"]["id_BURR_MAX_AREA"],
+                ID_BURR_MIN_PERIMETER=dt.python_parameters["S4"]["id_BURR_MIN_PERIMETER"],
+                ID_BURR_MAX_PERIMETER=dt.python_parameters["S4"]["id_BURR_MAX_PERIMETER"],
+
+                # ---- OD (outer) params ----
+                ID2_OFFSET_OD=dt.python_parameters["S4"]["ID2_OFFSET_OD4"],
+                HIGHLIGHT_SIZE_OD=dt.python_parameters["S4"]["HIGHLIGHT_SIZE_OD4"],
+                OD_BURR_MIN_AREA=dt.python_parameters["S4"]["OD_BURR_MIN_AREA4"],
+                OD_BURR_MAX_AREA=dt.python_parameters["S4"]["OD_BURR_MAX_AREA4"],
+                OD_BURR_MIN_PERIMETER=dt.python_parameters["S4"]["OD_BURR_MIN_PERIMETER4"],
+                OD_BURR_MAX_PERIMETER=dt.python_parameters["S4"]["OD_BURR_MAX_PERIMETER4"],
+
+                # ---- contour selection ----
+                min_id_area=dt.python_parameters["S4"]["min_id_area4"],
+                max_id_area=dt.python_parameters["S4"]["max_id_area4"],
+                min_od_area=dt.python_parameters["S4"]["min_od_area4"],
+                max_od_area=dt.python_parameters["S4"]["max_od_area4"],
+                min_circularity=dt.python_parameters["S4"]["min_circularity4"],
+                max_circularity=dt.python_parameters["S4"]["max_circularity4"],
+                min_aspect_ratio=dt.python_parameters["S4"]["min_aspect_ratio4"],
+                max_aspect_ratio=dt.python_parameters["S4"]["max_aspect_ratio4"],
+
+                output_folder=OutputFolder4,
+                backup_output_folder=BackUpOutputFolder4
+            )
 
         id_status = (res.get("id") or {}).get("status", "NOK")
         od_status = (res.get("od") or {}).get("status", "NOK")
@@ -869,56 +1323,33 @@ def ReadPythonResult(cam_id, station, active_stations, ctx, result_queues):
         }
         push_result(cam_id, payload)
 
-        if not ctx.get("current_part_inserted", False):
-            ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
-                date_time, part_name, subpart_name, part_id, station,
-                # S1
-                "NA","NA","NA","NA","NA","NA","NA",
-                # S2
-                "NA","NA","NA",
-                # S3
-                "NA","NA","NA",
-                # S4
-                "NA","NA","NA",
-                supplier_name, invoice_no
-            )
-            ctx["current_part_inserted"] = True
-        else:
-            DB.update_workpartdetail_4th_Station(
-                "OK" if result_ok else "NOK",
-                None,               # Error string if you expose one
-                bottom_burr,        # Burr status summary
-                id_count + od_count # Example count aggregation
-            )
+        with pt.span(trace, f"{station}.db"):
+            if not ctx.get("current_part_inserted", False):
+                ctx["inserted_s_no"] = DB.insert_workpartdetail_1st_Station(
+                    date_time, part_name, subpart_name, part_id, station,
+                    # S1
+                    "NA","NA","NA","NA","NA","NA","NA",
+                    # S2
+                    "NA","NA","NA",
+                    # S3
+                    "NA","NA","NA",
+                    # S4
+                    "NA","NA","NA",
+                    supplier_name, invoice_no
+                )
+                ctx["current_part_inserted"] = True
+            else:
+                DB.update_workpartdetail_4th_Station(
+                    "OK" if result_ok else "NOK",
+                    None,               # Error string if you expose one
+                    bottom_burr,        # Burr status summary
+                    id_count + od_count # Example count aggregation
+                )
         # ✅ Show image in UI immediately (DO NOT wait for PLC ACK)
         trigger_flask_camera("cam4")
 
-        # Final OK/NOK only if C4 is the last active station
-        if station == active_stations[-1]:
-            try:
-                code = "$OK#" if result_ok else "$NOK#"
-                DB.update_defect_count("OK" if result_ok else "NOK")
-                ack_token = "$ACK_" + code.strip("$#") + "#"
-                ok = send_until_ack(
-                    sock,
-                    code,
-                    ack_token,
-                    # timeout_per_try=timeout,
-                    # resend_every=0.2,
-                    # max_wait=5*timeout
-                    timeout_per_try=1.0,
-                    resend_every=0.1,
-                    max_wait=10.0
-                )
-                if ok:
-                    print(f"Sent: {code} (ACK received)")
-                else:
-                    print(f"⚠️ Sent: {code} (no ACK)")
-            except Exception as e:
-                print(f"❌ Error sending final result: {e}")
-
-    # 3️⃣ Put result in THIS part's queue for THIS station
-    result_queues[station].put(result_ok)
+    # 3️⃣ Resolve THIS station's future for THIS part (_verdict_loop sends the verdict)
+    state.set_result(station, result_ok)
     print(f"📝 Station {station} result: {result_ok}")
 
 def trigger_flask_camera(cam_id):
@@ -940,104 +1371,277 @@ def ConnectCam(param_dict):
         "cam4": str(param_dict.get("S4:Camera4Enable", "1")) == "1",
     }
 
-    if camera_enabled["cam1"]:
-        cs.camera_connect1()
-    if camera_enabled["cam2"]:
-        cs.camera_connect2()
-    if camera_enabled["cam3"]:
-        cs.camera_connect3()
-    if camera_enabled["cam4"]:
-        cs.camera_connect4()
+    # All enabled cameras connect at once (arming takes as long as the slowest camera, capped
+    # at CONNECT_TIMEOUT_SEC). Warm restart: cameras the SDK still reports connected from the
+    # previous run are reused as they are. A camera that drops later reconnects in the
+    # background (camera_health.py).
+    connected = camera_pool.pool.connect_many(name for name, enabled in camera_enabled.items() if enabled)
+    for name, ok in connected.items():
+        if not ok:
+            print(f"❌ {name.upper()} not connected — its station passes parts as OK until it is back")
+
+    # Recipe camera features (exposure, gain, format, ROI): only values that changed since the
+    # last recipe are written to the camera
+    for name, enabled in camera_enabled.items():
+        if enabled and camera_pool.pool.is_connected(name):
+            camera_pool.pool.configure(name, camera_pool.recipe_features(param_dict, f"S{name[-1]}"),
+                                       full_frame=True)
+
+    # Hardware-triggered acquisition: (re)arm the trigger and frame ring of every enabled camera
+    hardware = _get_acquisition_mode() == "hardware"
+    for name, enabled in camera_enabled.items():
+        if hardware and enabled and camera_pool.pool.is_connected(name):
+            camera_pool.pool.start_stream(name, FRAME_RING_SLOTS)
+        else:
+            camera_pool.pool.stop_stream(name)
+
+# --- station scheduler ---
+# One long-lived worker per station runs the capture+inspection jobs; the shared capture_timer
+# releases every job at its CAMnDELAY offset (spin-waits the last ~1 ms, see deadline_timer.py).
+# At most MAX_PARTS_IN_FLIGHT parts are on the line at once (extra $C1# are refused and get $NOK#).
+MAX_PARTS_IN_FLIGHT = 8
+capture_timer = DeadlineTimer("capture")
+
+
+# --- per-part state machine ---
+# A station captures at its fire time, while the part is in view, and only then waits for its
+# predecessor's result future: at most PREV_RESULT_WAIT_FRACTION of its station pitch (its
+# CAMnDELAY, never less than PREV_RESULT_WAIT_MIN_SEC) from the fire time. A predecessor that
+# is already NOK/UNKNOWN at the fire time skips the capture. If the predecessor is still
+# running at the deadline, STATION_MISS_POLICY decides:
+#   "capture" : inspect anyway; the verdict combines both results later
+#   "reject"  : mark this station NOK without inspecting
+#   "unknown" : mark this station UNKNOWN without inspecting (part is rejected as UNKNOWN)
+# Override via dt.python_parameters["S1"]["MISS_POLICY"].
+PREV_RESULT_WAIT_FRACTION = 0.25
+PREV_RESULT_WAIT_MIN_SEC = 0.1
+STATION_MISS_POLICY = "capture"
+VERDICT_WAIT_SEC = 5.0      # after the last station, wait this long for slower upstream stations
+
+
+def _get_miss_policy() -> str:
+    s1 = dt.python_parameters.get("S1", {}) or {}
+    policy = str(s1.get("MISS_POLICY") or STATION_MISS_POLICY).strip().lower()
+    return policy if policy in ("capture", "reject", "unknown") else STATION_MISS_POLICY
 
-def run_part_pipeline(active_stations, sock):
-    """
-    Run the pipeline for ONE part.
 
-    IMPORTANT: S1 is the delay from SENSOR to CAMERA-1 capture time.
-               So C1 should NOT start at 0.0 — it should start at +S1.
-               After that, C2, C3, C4 start at cumulative times:
-               C2: +S1+S2, C3: +S1+S2+S3, C4: +S1+S2+S3+S4.
-    """
+def _prev_wait_sec(station: str) -> float:
+    pitch = _get_delay_for_station(int(station[-1]))
+    return max(PREV_RESULT_WAIT_MIN_SEC, PREV_RESULT_WAIT_FRACTION * pitch)
 
-    # Per-part context (DB info, etc.)
-    ctx = {"current_part_inserted": False, "inserted_s_no": None}
 
-    # One result queue (OK/NOK) per active station — isolated to THIS part/thread
-    from queue import Queue
-    result_queues = {st: Queue() for st in active_stations}
+def _run_station(part, station):
+    active_stations = part["active_stations"]
+    state = part["state"]
+    i = active_stations.index(station)
+    cam_id = f"cam{station[-1]}"  # "C3" → "cam3"
 
-    # ---- Build absolute OFFSETS in seconds from t0 ----
-    # We now include S1 for C1 so that camera-1 fires AFTER the part reaches the FOV.
-    absolute_offsets = {}
-    acc = 0.0  # running sum of delays S1..S4
+    # If camera is disabled/not connected, skip but pass OK so line keeps moving
+    if not getattr(cs, f"isConnectedCamera{station[-1]}")():
+        print(f"⚠️ {cam_id.upper()} disabled. Skipping and marking OK.")
+        state.set_result(station, True, note="camera disabled")
+        return
 
-    for st in active_stations:
-        # station name is like "C1","C2","C3","C4" → take the last char → 1..4
-        n = int(st[-1])
+    ctx = part["ctx"]
+    fired = ctx.get("fired_at", {}).get(station, deadline_timer.now())
+    prev_station = active_stations[i - 1] if i > 0 else None
 
-        # Add THIS station's inter-stage delay (S1 for C1, S2 for C2, ...)
-        # S1 specifically means "sensor to CAM1 shutter" (your new requirement).
-        acc += _get_delay_for_station(n)
+    # From C2 onward, only run if previous station was OK. A result already known at the fire
+    # time skips the capture; otherwise capture now, while the part is under the camera.
+    ok_prev = state.wait_result(prev_station, fired) if prev_station else True
+    if ok_prev is not ps.PENDING and _skip_after(state, station, prev_station, ok_prev):
+        return
+    _capture_station(int(station[-1]), station, ctx)
+
+    if ok_prev is ps.PENDING:
+        state.mark(station, "waiting")
+        ok_prev = state.wait_result(prev_station, fired + _prev_wait_sec(station))
+        if ok_prev is ps.PENDING:
+            policy = _get_miss_policy()
+            note = f"{prev_station} still running at deadline → {policy}"
+            print(f"⏱️ Part #{state.part_no} {station}: {note}")
+            if policy in ("reject", "unknown"):
+                _release_frame(station, ctx)
+                state.set_result(station, False if policy == "reject" else None, note=note)
+                return
+            state.mark(station, "waiting", note=note)
+        elif _skip_after(state, station, prev_station, ok_prev):
+            _release_frame(station, ctx)
+            return
 
-        # The absolute start time for this station is the total we've accumulated so far.
-        absolute_offsets[st] = acc
+    # Inspection runs right here on the station worker; ReadPythonResult resolves
+    # state.futures[station] when done.
+    state.mark(station, "running")
+    print(f"✅ {station} started.")
+    Capture_Prosses_Triggerflask(cam_id, station, active_stations, ctx, state, captured=True)
+
+
+def _skip_after(state, station, prev_station, ok_prev) -> bool:
+    """Set this station's result when the previous one was NOK/UNKNOWN; True if it was skipped."""
+    if ok_prev is None:
+        print(f"❔ Skipping {station} because {prev_station} is UNKNOWN")
+        state.set_result(station, None, note=f"{prev_station} unknown")
+        return True
+    if not ok_prev:
+        print(f"❌ Skipping {station} because {prev_station} was NOK")
+        state.set_result(station, False, note=f"{prev_station} NOK")
+        return True
+    if prev_station:
+        print(f"📝 {prev_station} → {station}: prev OK")
+    return False
 
-    # Mark the start using a stable (monotonic) clock
-    t0 = time.monotonic()
 
-    # ---- Run stations in order ----
-    for i, station in enumerate(active_stations):
-        # Stop quickly if a global stop is requested
-        if not keep_running:
-            print("⛔️ Stopped by keep_running=False")
-            return
+# --- verdicts ---
+# The controller pairs $OK#/$NOK# with parts in $C1# order. Every accepted part is queued for
+# _verdict_loop (a session task) when it is created; the loop takes them one at a time, waits
+# for the part's station futures without holding any station worker, combines them and sends
+# the verdict. An UNKNOWN part is rejected ($NOK#) and counted as NOK, and so is a part refused
+# at MAX_PARTS_IN_FLIGHT: it still takes its place in the sequence so later verdicts stay paired.
+# A pause/stop (_halt_line) bumps the session epoch: parts still queued from before it, refused
+# ones included, are dropped, so nothing follows the $STP# the controller was sent.
+def _queue_verdict(part):
+    loop, queue = _loop, _verdict_queue
+    if loop is None or queue is None:
+        print(f"⚠️ No controller session, part #{part['part_no']} gets no verdict")
+        return
+    loop.call_soon_threadsafe(queue.put_nowait, part)
+
+
+async def _combine_results(state):
+    """Wait for the last station, then up to VERDICT_WAIT_SEC for slower upstream stations."""
+    await asyncio.wrap_future(state.futures[state.stations[-1]])
+    pending = [asyncio.wrap_future(f) for f in state.futures.values() if not f.done()]
+    if pending:
+        await asyncio.wait(pending, timeout=VERDICT_WAIT_SEC)
+    return state.final_result(deadline_timer.now())
+
+
+def _record_verdict(part, label: str):
+    with pt.span(part["trace"], "verdict.db"):
+        DB.update_defect_count("OK" if label == "OK" else "NOK")
+    part["state"].finish(label)
+    pt.finish(part["trace"], label)
+
+
+async def _send_verdict(part):
+    state = part["state"]
+    if part["epoch"] != _session["epoch"]:
+        return  # the line was paused / stopped after this part's $C1#: $STP# already went out
+    if part.get("refused"):
+        result, label = False, "REFUSED"   # never inspected
+    else:
+        result = await _combine_results(state)
+        if state.state != "in_flight" or part["epoch"] != _session["epoch"]:
+            return  # cancelled by STOP while it was on the line
+        label = "OK" if result is True else "NOK" if result is False else "UNKNOWN"
+    code = "$OK#" if result is True else "$NOK#"   # an UNKNOWN part is rejected
+    with pt.span(part["trace"], "verdict"):
+        ok = await _send_until_ack_async(
+            code,
+            "$ACK_" + code.strip("$#") + "#",
+            timeout_per_try=1.0,
+            resend_every=0.1,
+            max_wait=10.0,
+            submitted_at=time.perf_counter()
+        )
+    if ok:
+        print(f"Sent: {code} for part #{state.part_no} ({label}, ACK received)")
+    else:
+        print(f"⚠️ Sent: {code} for part #{state.part_no} ({label}, no ACK)")
+    # DB count and bookkeeping off the loop: the next part's verdict does not wait for SQL
+    asyncio.get_running_loop().run_in_executor(None, _record_verdict, part, label)
+
+
+async def _verdict_loop(queue):
+    """One verdict at a time, in $C1# order."""
+    while True:
+        part = await queue.get()
+        try:
+            await _send_verdict(part)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Error sending final result: {e}")
+
+
+def _run_station_job(part, station, fire_time=None):
+    """Runs on `station`'s worker at the part's fire time (or $Cn# trigger time) for that station."""
+    state = part["state"]
+    pt.end(part["trace"], f"{station}.wait")
+    part["ctx"].setdefault("fired_at", {})[station] = fire_time if fire_time is not None else deadline_timer.now()
+
+    # Stop quickly if a global stop is requested
+    if not keep_running or stop_event.is_set():
+        print(f"⛔️ {station}: stopped before start")
+        state.set_result(station, None, note="stopped")
+        return
 
-        cam_id = f"cam{station[-1]}"  # "C3" → "cam3"
+    try:
+        _run_station(part, station)
+    except Exception as e:
+        print(f"❌ {station} failed for part #{state.part_no}: {e}")
+        state.set_result(station, False, note=f"error: {e}")
 
-        # If camera is disabled/not connected, skip but pass OK so line keeps moving
-        if not getattr(cs, f"isConnectedCamera{station[-1]}")():
-            print(f"⚠️ {cam_id.upper()} disabled. Skipping and marking OK.")
-            result_queues[station].put(True)
-            continue
 
-        # Wait until the absolute time for THIS station.
-        # Example: C1 waits S1; C2 waits S1+S2; etc.
-        offset = absolute_offsets[station]
-        print(f"⏳ {station}: waiting until +{offset:.3f}s from start")
-        wait_until(t0 + offset)
+scheduler = StationScheduler(["C1", "C2", "C3", "C4"], _run_station_job,
+                             max_in_flight=MAX_PARTS_IN_FLIGHT, timer=capture_timer)
 
-        # If a stop arrived during the wait, bail out
-        if not keep_running or stop_event.is_set():
-            print("⛔️ Stopped during wait")
-            return
 
-        # From C2 onward, only run if previous station was OK
-        if i > 0:
-            prev_station = active_stations[i - 1]
-            try:
-                ok_prev = result_queues[prev_station].get(timeout=0.1)  # quick check
-                print(f"📝 {prev_station} → {station}: prev OK? {ok_prev}")
-            except Exception as e:
-                print(f"❌ No result from {prev_station} (treat NOK): {e}")
-                ok_prev = False
-
-            if not ok_prev:
-                # Mark this station NOK and, if last, notify controller now
-                print(f"❌ Skipping {station} because {prev_station} was NOK")
-                result_queues[station].put(False)
-
-                if station == active_stations[-1]:
-                    try:
-                        ok = send_until_ack(
-                            sock, "$NOK#", "$ACK_NOK#",
-                            timeout_per_try=timeout, resend_every=0.2, max_wait=5 * timeout
-                        )
-                        print("Sent $NOK# due to earlier NOK" + (" [ACK]" if ok else " [no ACK]"))
-                    except Exception as ex:
-                        print(f"❌ Error sending NOK: {ex}")
-                continue
-
-        # Start capture/processing for this station.
-        # This function should push True/False into result_queues[station] when done.
-        C_TriggeredProcess(cam_id, station, active_stations, ctx, result_queues)
-        print(f"✅ {station} started.")
+def run_part_pipeline(active_stations, trace=None):
+    """
+    Schedule the pipeline for ONE part (returns immediately).
+
+    IMPORTANT: S1 is the delay from SENSOR to CAMERA-1 capture time.
+               So C1 should NOT start at 0.0 — it should start at +S1.
+               After that, C2, C3, C4 start at cumulative times:
+               C2: +S1+S2, C3: +S1+S2+S3, C4: +S1+S2+S3+S4.
+    In "controller" trigger mode C2..C4 are held until their $Cn# arrives instead
+    (see _on_station_trigger); the offsets above plus the grace are only the fallback.
+    Returns False when the line already has MAX_PARTS_IN_FLIGHT parts in progress.
+    """
+    # One result future (OK/NOK/UNKNOWN) per active station — isolated to THIS part
+    state = ps.PartState(active_stations, trace.part_no if trace is not None else None)
+    part = {
+        "active_stations": list(active_stations),
+        "ctx": {"current_part_inserted": False, "inserted_s_no": None, "trace": trace},
+        "state": state,
+        "trace": trace,
+        "part_no": state.part_no,
+        "epoch": _session["epoch"],
+    }
+
+    # Mark the start on the capture timer's high-resolution clock
+    t0 = deadline_timer.now()
+
+    # ---- Build absolute fire times: C1 at +S1, C2 at +S1+S2, ... ----
+    fire_times = {}
+    acc = 0.0  # running sum of delays S1..S4
+    for st in active_stations:
+        # station name is like "C1","C2","C3","C4" → take the last char → 1..4
+        acc += _get_delay_for_station(int(st[-1]))
+        fire_times[st] = t0 + acc
+        print(f"⏳ {st}: scheduled at +{acc:.3f}s from start")
+        pt.begin(trace, f"{st}.wait")
+
+    held = []
+    expected = dict(fire_times)
+    if _get_trigger_mode() == "controller":
+        grace = _get_trigger_grace_sec()
+        held = [st for st in active_stations if st != "C1"]
+        for st in held:
+            fire_times[st] += grace
+
+    with _fifo_lock:
+        accepted = scheduler.submit(part, fire_times, held=held)
+        if not accepted:
+            print(f"🚫 Part refused: {MAX_PARTS_IN_FLIGHT} parts already in flight — rejected with $NOK#")
+            part["refused"] = True
+            state.finish("REFUSED")
+            pt.finish(trace, "REFUSED")
+        # a refused part keeps its FIFO place: its $C2#..$C4# must not go to the next part
+        for st in held:
+            _station_fifo[st].append({"part": part if accepted else None, "part_no": state.part_no,
+                                      "expected": expected[st]})
+    # every $C1# gets exactly one verdict, in order (a refused part's is $NOK#)
+    _queue_verdict(part)
+    return accepted
@@ -0,0 +1,97 @@
+# test_frame_analysis.py
+# Station 1 stages with one shared FrameAnalysis (as station1.main runs them) against every stage
+# building its own, on synthetic frames: contours, measurements, verdicts, flash ring masks and
+# the marked image must be identical.
+
+import numpy as np
+import cv2
+import pytest
+
+import artifacts
+import defect as dt
+from frame_utils import FrameAnalysis
+
+
+def _part(cx=1000.3, cy=800.7, r_od=300, r_id=110, flash=(), bgr=False):
+    """Bright background, dark part (OD), bright bore (ID), dark flash blobs on the OD edge."""
+    sh = 16
+    img = np.full((1600, 2000), 230, np.uint8)
+    c = (int(round(cx * sh)), int(round(cy * sh)))
+    cv2.circle(img, c, r_od * sh, 40, -1, cv2.LINE_AA, 4)
+    cv2.circle(img, c, r_id * sh, 230, -1, cv2.LINE_AA, 4)
+    for ang in flash:
+        a = np.deg2rad(ang)
+        cv2.circle(img, (int(cx + r_od * np.cos(a)), int(cy + r_od * np.sin(a))), 4, 40, -1)
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if bgr else img
+
+
+def _stages(frame, shared: bool, masks: list) -> dict:
+    """preprocess -> id_od_dimension -> concentricity -> flash_detection -> measure_orifice."""
+    analysis = FrameAnalysis(frame) if shared else None
+    processed = dt.preprocess_image(frame, analysis=analysis)
+    dims = dt.id_od_dimension(frame, processed["sorted_contours"], 0.5, 3.0, 2.0, 8.0, 10.0, 10.0,
+                              analysis=analysis)
+    conc = dt.concentricity(dims["center_x_od"], dims["center_y_od"], dims["center_x_id"],
+                            dims["center_y_id"], 0.05, 10.0)
+    flash = dt.flash_detection(frame, dims["id_contour"], dims["od_contour"], 5, 10, 5, 10,
+                               analysis=analysis)
+    orifice = dt.measure_orifice(frame, 0.5, 3.0, 10.0, analysis=analysis)
+    return {"contours": processed["sorted_contours"], "dims": dims, "conc": conc,
+            "flash": flash, "orifice": orifice, "masks": masks}
+
+
+def _assert_same(a, b, path="result"):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys(), path
+        for k in a:
+            _assert_same(a[k], b[k], f"{path}.{k}")
+    elif isinstance(a, (list, tuple)):
+        assert len(a) == len(b), path
+        for i, (x, y) in enumerate(zip(a, b)):
+            _assert_same(x, y, f"{path}[{i}]")
+    elif isinstance(a, np.ndarray):
+        assert isinstance(b, np.ndarray) and np.array_equal(a, b), path
+    else:
+        assert a == b, path
+
+
+@pytest.fixture
+def recorded_masks(monkeypatch):
+    """Copies of every flash ring mask the stages draw, in order."""
+    masks = []
+    ring_mask = dt._ring_mask
+
+    def _record(*args, **kwargs):
+        mask = ring_mask(*args, **kwargs)
+        masks.append(mask.copy())
+        return mask
+
+    monkeypatch.setattr(dt, "_ring_mask", _record)
+    monkeypatch.setattr(dt, "ENABLE_TIMING", False)
+    level = artifacts.level()
+    artifacts.set_level("verdict")           # flash_marked_image is drawn and compared too
+    yield masks
+    artifacts.set_level(level)
+
+
+@pytest.mark.parametrize("frame", [
+    _part(),
+    _part(flash=(0, 135)),
+    _part(cx=1000.0, cy=800.0, flash=(60,)),
+    _part(flash=(200,), bgr=True),
+], ids=["clean", "flash", "flash-integer-centre", "flash-bgr"])
+def test_shared_analysis_matches_per_stage(frame, recorded_masks):
+    separate = _stages(frame, False, recorded_masks)
+    separate["masks"] = list(recorded_masks)
+    recorded_masks.clear()
+    shared = _stages(frame, True, recorded_masks)
+    shared["masks"] = list(recorded_masks)
+
+    assert separate["masks"], "flash ring masks were not drawn"
+    _assert_same(separate, shared)
+
+
+def test_flash_frame_is_rejected(recorded_masks):
+    """The synthetic flash is found on the OD, so the comparison above covers a NOK verdict."""
+    result = _stages(_part(flash=(0, 135)), True, recorded_masks)
+    assert (result["flash"]["Defect_Result"], result["flash"]["defect_position"]) == ("NOK", "FOD")